@@ -0,0 +1,472 @@
+# async_core.py
+"""
+asyncio-based receiver core: one event loop serves every sensor source.
+
+A ReceiverHub runs a single asyncio loop in one background thread. Serial
+ports (gloves, foot pedals) and replayed sessions are added as sources; each
+source turns incoming bytes or recorded frames into calls on its receiver
+(SerialReceiver.handle_line / handle_frame), so all sources share the same
+frame pipeline. Adding a device adds a task, not a thread.
+
+Serial ports are opened with timeout=0 and read without blocking. On POSIX
+the loop waits on the port's file descriptor, so an idle port costs nothing;
+where ports have no selectable descriptor (Windows COM ports) all ports are
+polled from the loop every `poll_interval` seconds.
+
+WorkerSource moves a glove's read/parse stage into a separate process that
+hands frames over through a shared-memory ring (frame_ring.py); only the MIDI
+stage runs on the hub loop.
+
+TkBridge carries status callbacks from the hub back onto the Tk main loop.
+"""
+import asyncio
+import multiprocessing
+import os
+import queue
+import threading
+import time
+
+from connection_manager import Backoff
+from data_parser import SensorFrame
+from frame_ring import MSG_DISCONNECTED, RING_CAPACITY, FrameRing, glove_worker
+from latency import LATENCY
+from log_writer import LOG
+from recording import Recording
+
+OPEN_SETTLE_TIME = 2.0  # boards reset when the port opens
+TEXT_REPLAY_INTERVAL = 0.1
+REPLAY_YIELD_EVERY = 64  # frames between yields when replaying as fast as possible
+
+
+class Source:
+    """
+    Base class of a hub source. run() is the source's task on the hub loop.
+    """
+    def __init__(self, hub, receiver, name, on_status=None):
+        self.hub = hub
+        self.receiver = receiver
+        self.name = name
+        self.on_status = on_status
+        self.task = None
+
+    def report(self, text):
+        LOG.info(f"[{self.name}] {text}")
+        if self.on_status is not None:
+            self.on_status(text)
+
+    async def run(self):
+        raise NotImplementedError
+
+    def stop(self, timeout=2.0):
+        """
+        Cancels the source and waits until its port or file is closed.
+        Callable from any thread except the hub's own.
+        """
+        self.hub.remove(self, timeout)
+
+
+class SerialSource(Source):
+    def __init__(self, hub, receiver, port, baud_rate, on_status=None):
+        super().__init__(hub, receiver, getattr(receiver, "glove_name", port), on_status)
+        self.port = port
+        self.baud_rate = baud_rate
+        self.ser = None
+        self._pending = bytearray()
+        self.started_ns = None
+        self.ready_after_ms = None
+
+    def _check_ready(self):
+        """
+        Reports the time from start to the first data with a MIDI output
+        available, i.e. to the first playable note.
+        """
+        midi_handler = getattr(self.receiver, "midi_handler", None)
+        if midi_handler is not None and getattr(midi_handler, "midi_out", None) is None:
+            return
+        self.ready_after_ms = (time.perf_counter_ns() - self.started_ns) / 1e6
+        self.report(f"Playable {self.ready_after_ms:.0f} ms after start")
+
+    async def run(self):
+        """
+        Opens the port in the background and keeps it open: on failure or when
+        the device is unplugged, the port is reopened with exponential backoff.
+        The receiver (and its routing plan) stays the same across reconnects.
+        """
+        import serial
+        loop = asyncio.get_running_loop()
+        backoff = Backoff()
+        self.started_ns = time.perf_counter_ns()
+        while True:
+            try:
+                # Opening can block for a while; keep it off the loop.
+                self.ser = await loop.run_in_executor(
+                    None, lambda: serial.Serial(self.port, self.baud_rate, timeout=0))
+            except Exception as e:
+                delay = backoff.next()
+                self.report(f"Waiting for {self.port} ({e}); retry in {delay:.1f} s")
+                await asyncio.sleep(delay)
+                continue
+            backoff.reset()
+            try:
+                await asyncio.sleep(OPEN_SETTLE_TIME)
+                self.ser.reset_input_buffer()
+                self._reset_stream()
+                self.report(f"Connected to {self.port} at {self.baud_rate} baud.")
+                fd = self._fileno()
+                if fd is not None:
+                    await self._run_selectable(loop, fd)
+                else:
+                    await self._run_polled()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.report(f"Disconnected from {self.port} ({e}); reconnecting")
+                self.receiver.all_notes_off()
+                await asyncio.sleep(backoff.next())
+            finally:
+                self.ser.close()
+
+    def _reset_stream(self):
+        self._pending.clear()
+        if self.receiver.decoder is not None:
+            self.receiver.decoder.reset()
+
+    def _fileno(self):
+        if os.name != "posix":
+            return None
+        try:
+            return self.ser.fileno()
+        except Exception:
+            return None
+
+    async def _run_selectable(self, loop, fd):
+        ready = asyncio.Event()
+        loop.add_reader(fd, ready.set)
+        try:
+            while True:
+                await ready.wait()
+                ready.clear()
+                self._read()
+        finally:
+            loop.remove_reader(fd)
+
+    async def _run_polled(self):
+        while True:
+            self._read()
+            await asyncio.sleep(self.hub.poll_interval)
+
+    def _read(self):
+        data = self.ser.read(self.ser.in_waiting or 1)
+        if data:
+            self.feed(data)
+
+    def feed(self, data):
+        """
+        Runs received bytes through the receiver's pipeline.
+        """
+        if self.ready_after_ms is None:
+            self._check_ready()
+        receiver = self.receiver
+        start_ns = time.perf_counter_ns() if LATENCY.enabled else None
+        try:
+            if receiver.decoder is not None:
+                for frame in receiver.decoder.feed(data):
+                    receiver.handle_frame(frame, start_ns)
+                return
+            pending = self._pending
+            pending += data
+            start = 0
+            while True:
+                end = pending.find(b"\n", start)
+                if end < 0:
+                    break
+                line = pending[start:end].decode("utf-8", errors="replace").strip()
+                start = end + 1
+                try:
+                    receiver.handle_line(line, start_ns)
+                except Exception as e:
+                    LOG.error(f"[{self.name}] Serial read error: {e}")
+            del pending[:start]
+        except Exception as e:
+            LOG.error(f"[{self.name}] Serial read error: {e}")
+
+
+class ReplaySource(Source):
+    """
+    Replays a recording (.mmrec, original timing) or a text capture (.txt, fixed
+    spacing) without blocking the loop. speed 0 replays as fast as possible.
+    """
+    def __init__(self, hub, receiver, path, speed=1.0, on_status=None):
+        super().__init__(hub, receiver, getattr(receiver, "glove_name", path), on_status)
+        self.path = path
+        self.speed = speed
+
+    async def run(self):
+        try:
+            if self.path.endswith(".txt"):
+                await self._replay_text()
+            else:
+                await self._replay_recording()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.report(f"Replay error: {e}")
+            return
+        self.report(f"End of {self.path}")
+
+    async def _replay_text(self):
+        interval = TEXT_REPLAY_INTERVAL / self.speed if self.speed else 0
+        self.report(f"Simulating input from file: {self.path}")
+        with open(self.path, "r") as f:
+            for count, line in enumerate(f):
+                self.receiver.handle_line(line.strip())
+                if interval:
+                    await asyncio.sleep(interval)
+                elif count % REPLAY_YIELD_EVERY == 0:
+                    await asyncio.sleep(0)
+
+    async def _replay_recording(self):
+        loop = asyncio.get_running_loop()
+        frame = SensorFrame()
+        with Recording(self.path) as recording:
+            self.report(f"Replaying recording: {self.path}")
+            if not recording.count:
+                return
+            origin = recording.timestamp_ns(0) / 1e9
+            start = loop.time()
+            for record in range(recording.count):
+                if self.speed:
+                    due = start + (recording.timestamp_ns(record) / 1e9 - origin) / self.speed
+                    delay = due - loop.time()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                elif record % REPLAY_YIELD_EVERY == 0:
+                    await asyncio.sleep(0)
+                self.receiver.handle_frame(recording.read_into(record, frame))
+
+
+class WorkerSource(Source):
+    """
+    Reads and parses a glove in a worker process (frame_ring.glove_worker) and
+    runs the MIDI stage here, on frames taken from the shared-memory ring.
+    A worker that dies is restarted with backoff.
+    """
+    def __init__(self, hub, receiver, port, baud_rate, protocol="text", capacity=RING_CAPACITY,
+                 on_status=None):
+        super().__init__(hub, receiver, getattr(receiver, "glove_name", port), on_status)
+        self.port = port
+        self.baud_rate = baud_rate
+        self.protocol = protocol
+        self.capacity = capacity
+        self.ring = None
+        self.conn = None
+        self.frame = SensorFrame()
+        self._view = memoryview(self.frame.values)
+
+    @property
+    def dropped(self) -> int:
+        return self.ring.dropped if self.ring is not None else 0
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        context = multiprocessing.get_context("spawn")  # never fork the Tk/hub threads
+        backoff = Backoff()
+        while True:
+            self.ring = FrameRing(capacity=self.capacity)
+            self.conn, child_conn = context.Pipe(duplex=False)
+            stop = context.Event()
+            process = context.Process(
+                target=glove_worker, name=f"GloveWorker-{self.name}", daemon=True,
+                args=(self.ring.name, self.port, self.baud_rate, self.protocol, child_conn, stop))
+            fd = None
+            try:
+                await loop.run_in_executor(None, process.start)
+                child_conn.close()
+                fd = self.conn.fileno() if os.name == "posix" else None
+                if fd is not None:
+                    await self._run_selectable(loop, fd)
+                else:
+                    await self._run_polled()
+                self.report("Worker exited; restarting")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.report(f"Worker error ({e}); restarting")
+            finally:
+                stop.set()
+                if fd is not None:
+                    loop.remove_reader(fd)
+                if process.pid is not None:
+                    await loop.run_in_executor(None, process.join, 2)
+                    if process.is_alive():
+                        process.terminate()
+                child_conn.close()
+                self.conn.close()
+                self.ring.close()
+                self.receiver.all_notes_off()
+            await asyncio.sleep(backoff.next())
+
+    async def _run_selectable(self, loop, fd):
+        ready = asyncio.Event()
+        loop.add_reader(fd, ready.set)
+        while True:
+            await ready.wait()
+            ready.clear()
+            if not self._drain():
+                return
+
+    async def _run_polled(self):
+        while self._drain():
+            await asyncio.sleep(self.hub.poll_interval)
+
+    def _drain(self) -> bool:
+        """
+        Handles pending worker messages and frames. False once the worker is gone.
+        """
+        conn = self.conn
+        alive = True
+        try:
+            while conn.poll():
+                message = conn.recv_bytes()
+                if message:
+                    self.report(message[1:].decode("utf-8", errors="replace"))
+                    if message[:1] == MSG_DISCONNECTED:
+                        self.receiver.all_notes_off()
+        except (EOFError, OSError):
+            alive = False
+        ring, frame, view, receiver = self.ring, self.frame, self._view, self.receiver
+        while True:
+            start_ns = ring.read(view)
+            if start_ns is None:
+                break
+            try:
+                receiver.handle_frame(frame, start_ns)
+            except Exception as e:
+                LOG.error(f"[{self.name}] Frame error: {e}")
+        return alive
+
+
+class ReceiverHub:
+    """
+    Owns the event loop thread and the set of running sources.
+
+        hub = ReceiverHub()
+        hub.start()
+        SerialReceiver(port="COM5", hub=hub, ...)    # or hub.add_serial(receiver, ...)
+        ...
+        hub.stop()   # cancels every source, closes every port, joins the thread
+    """
+    def __init__(self, poll_interval=0.005):
+        self.poll_interval = poll_interval
+        self.loop = None
+        self.thread = None
+        self._sources = set()
+
+    def start(self):
+        if self.thread is not None:
+            return
+        self.loop = asyncio.new_event_loop()
+        ready = threading.Event()
+        self.thread = threading.Thread(target=self._run, args=(ready,), name="ReceiverHub", daemon=True)
+        self.thread.start()
+        ready.wait()
+
+    def _run(self, ready):
+        asyncio.set_event_loop(self.loop)
+        self.loop.call_soon(ready.set)
+        try:
+            self.loop.run_forever()
+        finally:
+            self.loop.close()
+
+    def add_serial(self, receiver, port, baud_rate=115200, on_status=None) -> SerialSource:
+        return self.add_source(SerialSource(self, receiver, port, baud_rate, on_status))
+
+    def add_worker(self, receiver, port, baud_rate=115200, protocol="text", on_status=None) -> WorkerSource:
+        return self.add_source(WorkerSource(self, receiver, port, baud_rate, protocol, on_status=on_status))
+
+    def add_replay(self, receiver, path, speed=1.0, on_status=None) -> ReplaySource:
+        return self.add_source(ReplaySource(self, receiver, path, speed, on_status))
+
+    def add_source(self, source):
+        """
+        Schedules source.run() on the loop. Returns immediately.
+        """
+        self.start()
+        self.loop.call_soon_threadsafe(self._start_source, source)
+        return source
+
+    def _start_source(self, source):
+        source.task = self.loop.create_task(source.run())
+        self._sources.add(source)
+        source.task.add_done_callback(lambda _: self._sources.discard(source))
+
+    def remove(self, source, timeout=2.0):
+        if self.loop is None or self.loop.is_closed():
+            return
+        future = asyncio.run_coroutine_threadsafe(self._cancel([source]), self.loop)
+        future.result(timeout)
+
+    async def _cancel(self, sources):
+        # Let sources scheduled with add_source() get their task first.
+        await asyncio.sleep(0)
+        tasks = [source.task for source in sources if source.task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def sources(self):
+        return list(self._sources)
+
+    def stop(self, timeout=2.0):
+        """
+        Deterministic shutdown: cancels all sources, waits for them to close
+        their ports and files, then stops the loop and joins its thread.
+        """
+        if self.thread is None:
+            return
+        try:
+            future = asyncio.run_coroutine_threadsafe(self._cancel(list(self._sources)), self.loop)
+            future.result(timeout)
+        finally:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join(timeout)
+            self.thread = None
+
+
+class TkBridge:
+    """
+    Runs callbacks posted from any thread on the Tk main loop. The Tk side
+    polls a queue with root.after, so other threads never touch Tk directly.
+    """
+    def __init__(self, root, interval_ms=50):
+        self.root = root
+        self.interval_ms = interval_ms
+        self._queue = queue.SimpleQueue()
+        self._after_id = self.root.after(self.interval_ms, self._poll)
+
+    def post(self, callback, *args):
+        self._queue.put((callback, args))
+
+    def callback(self, callback):
+        """
+        Wraps callback so calling it from any thread runs it on the Tk thread.
+        """
+        return lambda *args: self.post(callback, *args)
+
+    def _poll(self):
+        while True:
+            try:
+                callback, args = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                callback(*args)
+            except Exception as e:
+                LOG.error(f"UI callback error: {e}")
+        self._after_id = self.root.after(self.interval_ms, self._poll)
+
+    def close(self):
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
@@ -0,0 +1,78 @@
+# bench_binary_protocol.py
+"""
+Compares the text line protocol with the binary frame protocol: bytes per
+frame, the resulting sample-rate ceiling at 115200 baud, and host-side decode
+cost. Also checks that corrupted frames are counted instead of decoded.
+
+    python benchmarks/bench_binary_protocol.py
+"""
+import os
+import sys
+import time
+
+PYTHON_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, PYTHON_DIR)
+
+from binary_protocol import BinaryFrameDecoder, encode_frame  # noqa: E402
+from data_parser import FrameParser  # noqa: E402
+
+CAPTURES = ["fingers.txt", "square.txt", "percussion.txt"]
+BAUD_RATE = 115200
+BYTES_PER_SECOND = BAUD_RATE / 10  # 8N1: 10 bits on the wire per byte
+READ_SIZE = 256  # bytes returned by one bulk read
+
+
+def load_lines(file_name):
+    with open(os.path.join(PYTHON_DIR, file_name), "r") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def main():
+    for file_name in CAPTURES:
+        lines = load_lines(file_name)
+        parser = FrameParser()
+        text_stream = "".join(line + "\r\n" for line in lines).encode("utf-8")
+        binary_stream = b"\x00" + b"".join(
+            encode_frame(parser.parse(line), seq) for seq, line in enumerate(lines)
+        )
+
+        start = time.perf_counter()
+        for raw in text_stream.splitlines():
+            parser.parse(raw.decode("utf-8").strip())
+        t_text = time.perf_counter() - start
+
+        decoder = BinaryFrameDecoder()
+        start = time.perf_counter()
+        for offset in range(0, len(binary_stream), READ_SIZE):
+            for _ in decoder.feed(binary_stream[offset:offset + READ_SIZE]):
+                pass
+        t_binary = time.perf_counter() - start
+
+        n = len(lines)
+        text_bytes = len(text_stream) / n
+        binary_bytes = (len(binary_stream) - 1) / n
+        print(f"{file_name}: {n} frames")
+        print(f"  text:   {text_bytes:6.1f} B/frame, max {BYTES_PER_SECOND / text_bytes:6.0f} frames/s, "
+              f"decode {t_text / n * 1e6:5.2f} us/frame")
+        print(f"  binary: {binary_bytes:6.1f} B/frame, max {BYTES_PER_SECOND / binary_bytes:6.0f} frames/s, "
+              f"decode {t_binary / n * 1e6:5.2f} us/frame")
+        print(f"  sample-rate gain on the same link: {text_bytes / binary_bytes:.2f}x, decoder: {decoder.stats()}")
+
+    # Corrupt one byte in every 50th frame and drop every 70th frame entirely.
+    lines = load_lines("fingers.txt")
+    parser = FrameParser()
+    stream = bytearray(b"\x00")
+    for seq, line in enumerate(lines):
+        wire = bytearray(encode_frame(parser.parse(line), seq))
+        if seq % 70 == 69:
+            continue
+        if seq % 50 == 49:
+            wire[10] ^= 0x5A
+        stream += wire
+    decoder = BinaryFrameDecoder()
+    decoded = sum(1 for _ in decoder.feed(bytes(stream)))
+    print(f"corruption test: {decoded} decoded, {decoder.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# bench_calibration.py
+"""
+Throughput and memory of calibration.py on long sessions.
+
+A bundled capture is tiled into synthetic sessions of growing length (with
+a little noise so the histograms see new values): a recording written with
+RecordingWriter and a text capture. Each is calibrated, and reported are
+frames/s and the peak memory NumPy and Python allocated during the run
+(tracemalloc), which should stay flat as the session grows. The profile of the
+tiled session must match the one of the capture itself.
+
+    python benchmarks/bench_calibration.py [capture] [--frames 100000 1000000] [--text-frames 200000]
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from fakes import capture_path
+
+from calibration import calibrate, read_chunks  # noqa: E402
+from data_parser import SensorFrame  # noqa: E402
+from recording import RecordingWriter  # noqa: E402
+
+
+def tiled(frames, count, rng):
+    """
+    `count` frames cycling through `frames`, with +/-0.004 of noise.
+    """
+    for start in range(0, count, len(frames)):
+        block = frames[:min(len(frames), count - start)]
+        yield block + rng.uniform(-0.004, 0.004, block.shape)
+
+
+def write_recording(path, frames, count, rng):
+    with RecordingWriter(path) as writer:
+        for block in tiled(frames, count, rng):
+            for row in block.tolist():
+                writer.write(SensorFrame(row), writer.count * 10_000_000)
+
+
+def write_text(path, lines, count):
+    with open(path, "w") as f:
+        for start in range(0, count, len(lines)):
+            f.write("\n".join(lines[:min(len(lines), count - start)]) + "\n")
+
+
+def run(path):
+    tracemalloc.start()
+    start = time.perf_counter()
+    profile = calibrate([path])
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return profile, elapsed, peak
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("capture", nargs="?", default="fingers.txt")
+    arg_parser.add_argument("--frames", type=int, nargs="+", default=[100_000, 1_000_000])
+    arg_parser.add_argument("--text-frames", type=int, nargs="+", default=[50_000, 200_000])
+    args = arg_parser.parse_args()
+
+    path = capture_path(args.capture)
+    frames = np.concatenate([block.copy() for block in read_chunks(path)])
+    with open(path, "r") as f:
+        lines = [line.strip() for line in f if line.strip()]
+    reference = calibrate([path])["ranges"]
+    rng = np.random.default_rng(1)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sessions = []
+        for count in args.frames:
+            session = os.path.join(tmp, f"session{count}.mmrec")
+            write_recording(session, frames, count, rng)
+            sessions.append((session, count))
+        for count in args.text_frames:
+            session = os.path.join(tmp, f"session{count}.txt")
+            write_text(session, lines, count)
+            sessions.append((session, count))
+
+        for session, count in sessions:
+            profile, elapsed, peak = run(session)
+            size_mb = os.path.getsize(session) / 2 ** 20
+            drift = max(abs(a - b) for sensor, interval in reference.items()
+                        for a, b in zip(interval, profile["ranges"].get(sensor, (np.inf, np.inf))))
+            print(f"{os.path.basename(session):22s} {size_mb:7.1f} MB  {count / elapsed:11,.0f} frames/s  "
+                  f"peak {peak / 2 ** 20:6.1f} MB  max range change vs capture {drift:.4f}")
+
+
+if __name__ == "__main__":
+    main()
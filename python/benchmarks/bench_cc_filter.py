@@ -0,0 +1,73 @@
+# bench_cc_filter.py
+"""
+Replays captures through SerialReceiver with every CC sensor mapped and counts
+control changes sent versus suppressed by the change/deadband/rate filter,
+how many values held back by the deadband were sent once they settled, and how
+many controllers were still off the sensor's last value when the capture ended
+(sent by SerialReceiver.stop()).
+
+    python benchmarks/bench_cc_filter.py [--deadband 1.0] [--rate 100] [--settle 5] [--fps 100]
+"""
+import argparse
+import os
+import sys
+
+PYTHON_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, PYTHON_DIR)
+
+import serial_receiver  # noqa: E402
+from serial_receiver import SerialReceiver  # noqa: E402
+
+CAPTURES = ["square.txt", "fingers.txt", "percussion.txt"]
+CC_SENSORS = ["F1", "F2", "F3", "F4", "AccX", "AccY", "AccZ", "GyrX", "GyrY", "GyrZ"]
+BYTES_PER_CC = 3
+
+
+class CountingMidi:
+    def __init__(self):
+        self.cc_count = 0
+
+    def send_midi_note_on(self, note, velocity=None):
+        pass
+
+    def send_midi_note_off(self, note):
+        pass
+
+    def send_midi_control_change(self, controller, value):
+        self.cc_count += 1
+
+
+def run(file_name, deadband, rate, settle):
+    midi = CountingMidi()
+    config = {sensor: str(cc) for cc, sensor in enumerate(CC_SENSORS, start=20)}
+    receiver = SerialReceiver(config_dict=config, midi_handler=midi, replay_path=file_name,
+                              replay_speed=1.0, cc_deadband=deadband, cc_max_rate=rate,
+                              cc_settle_frames=settle)
+    receiver.thread.join()
+    before_stop = midi.cc_count
+    receiver.stop()
+    return midi.cc_count, midi.cc_count - before_stop, receiver.cc_filter.stats()
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("--deadband", type=float, default=1.0)
+    arg_parser.add_argument("--rate", type=float, default=100.0)
+    arg_parser.add_argument("--settle", type=int, default=5, help="settle frames (0 disables)")
+    arg_parser.add_argument("--fps", type=float, default=100.0, help="replay frame rate")
+    args = arg_parser.parse_args()
+    # Replay the text captures at the glove's frame rate so the rate limit applies.
+    serial_receiver.TEXT_REPLAY_INTERVAL = 1.0 / args.fps
+
+    for file_name in CAPTURES:
+        sent, at_stop, stats = run(file_name, args.deadband, args.rate, args.settle)
+        total = stats["sent"] + stats["suppressed"]
+        saved = stats["suppressed"] / total * 100 if total else 0.0
+        print(f"{file_name}: {total} CC candidates, {sent} sent, {stats['suppressed']} suppressed "
+              f"({saved:.1f}% / {stats['suppressed'] * BYTES_PER_CC} bytes saved)")
+        print(f"  unchanged: {stats['unchanged']}, deadband: {stats['deadband']}, rate: {stats['rate']}; "
+              f"settled: {stats['settled']}, sent at stop: {at_stop}")
+
+
+if __name__ == "__main__":
+    main()
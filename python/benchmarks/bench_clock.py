@@ -0,0 +1,101 @@
+# bench_clock.py
+"""
+Runs ClockEngine against a timestamping fake MIDI port and reports clock
+jitter, tempo accuracy over the run and the placement of quantized notes.
+
+    python benchmarks/bench_clock.py [--bpm 120] [--seconds 5] [--quantize 1/16] [--ui-load 0.3]
+"""
+import argparse
+import random
+import threading
+import time
+
+from bench_worker import busy_ui
+from fakes import RecordingPort
+
+from clock import PPQN, QUANTIZE_GRIDS, ClockEngine  # noqa: E402
+from midi_handler import MidiHandler  # noqa: E402
+
+
+class TimingPort(RecordingPort):
+    def __init__(self):
+        super().__init__()
+        self.times = []
+
+    def send(self, msg):
+        self.times.append(time.perf_counter_ns())
+        self.messages.append(msg)
+
+
+def fit_interval(times):
+    """
+    Least-squares tick interval (ns), insensitive to single late ticks.
+    """
+    n = len(times)
+    mean_k = (n - 1) / 2
+    mean_t = sum(times) / n
+    num = sum((k - mean_k) * (t - mean_t) for k, t in enumerate(times))
+    den = sum((k - mean_k) ** 2 for k in range(n))
+    return num / den
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("--bpm", type=float, default=120.0)
+    arg_parser.add_argument("--seconds", type=float, default=5.0)
+    arg_parser.add_argument("--quantize", choices=sorted(QUANTIZE_GRIDS), default="1/16")
+    arg_parser.add_argument("--ui-load", type=float, default=0.0, help="fraction of time a GIL-busy thread runs")
+    arg_parser.add_argument("--switch-interval", type=float, default=None, help="GIL switch interval (s)")
+    args = arg_parser.parse_args()
+
+    midi = MidiHandler(dispatcher=False, open_port=False)
+    port = TimingPort()
+    midi.midi_out = port
+    grid = QUANTIZE_GRIDS[args.quantize]
+    clock = ClockEngine(midi, bpm=args.bpm, quantize=grid, tolerance=0.0, switch_interval=args.switch_interval)
+
+    stop = threading.Event()
+    if args.ui_load:
+        threading.Thread(target=busy_ui, args=(stop, args.ui_load), daemon=True).start()
+
+    clock.start()
+    started = time.perf_counter()
+    rng = random.Random(1)
+    notes = 0
+    while time.perf_counter() - started < args.seconds:
+        time.sleep(rng.uniform(0.05, 0.3))
+        note = 60 + notes % 12
+        clock.send_midi_note_on(note, 100)
+        time.sleep(0.01)
+        clock.send_midi_note_off(note)
+        notes += 1
+    time.sleep(0.5)  # let held notes reach their grid point
+    clock.stop()
+    stop.set()
+
+    ticks = [t for t, m in zip(port.times, port.messages) if m.type == "clock"]
+    tick_ns = 60e9 / (args.bpm * PPQN)
+    measured_bpm = 60e9 / (fit_interval(ticks) * PPQN) if len(ticks) > 1 else 0.0
+    anchor = clock._timing[0] - clock._timing[1] * tick_ns
+    offsets = []
+    for t, m in zip(port.times, port.messages):
+        if m.type == "note_on":
+            phase = (t - anchor) % (grid * tick_ns)
+            offsets.append(min(phase, grid * tick_ns - phase) / 1000)
+
+    stats = clock.stats()
+    print(f"{len(ticks)} clocks at {args.bpm:g} BPM over {args.seconds:g} s; measured {measured_bpm:.4f} BPM")
+    print(f"tick late      p50 {stats['tick_late']['p50_us']:7.1f} us  p99 {stats['tick_late']['p99_us']:7.1f} us  "
+          f"max {stats['tick_late']['max_us']:7.1f} us")
+    print(f"tick interval  rms {stats['interval_rms_us']:7.1f} us  max {stats['interval_max_us']:7.1f} us  "
+          f"resyncs {stats['resyncs']}")
+    if offsets:
+        offsets.sort()
+        print(f"{len(offsets)} notes quantized to {args.quantize}: distance from grid median "
+              f"{offsets[len(offsets) // 2]:.1f} us, max {offsets[-1]:.1f} us")
+    first = [m.type for m in port.messages[:1]] + [m.type for m in port.messages[-1:]]
+    print(f"transport: {first[0]} ... {first[-1]}")
+
+
+if __name__ == "__main__":
+    main()
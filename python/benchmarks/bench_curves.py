@@ -0,0 +1,97 @@
+# bench_curves.py
+"""
+Per-frame cost of CC response curves.
+
+Maps a capture through SerialReceiver.process_data with every CC sensor on
+the same curve (null MIDI handler, as bench_pipeline.py's map stage), and
+compares the compiled lookup tables with evaluating the curve per value.
+
+    python benchmarks/bench_curves.py [capture]
+"""
+import argparse
+import time
+
+from bench_pipeline import RECEIVER_OPTIONS, best_rate
+from fakes import FakeHub, NullMidi, read_capture
+
+from curves import CURVES, DEFAULT_AMOUNTS, LUT_LAST  # noqa: E402
+from data_parser import FrameParser  # noqa: E402
+from routing import CC_SENSORS, cc_mapping, field_index, sensor_range  # noqa: E402
+from serial_receiver import SerialReceiver  # noqa: E402
+
+SPECS = {
+    "linear": {"curve": "linear"},
+    "exp": {"curve": "exp"},
+    "log": {"curve": "log"},
+    "s": {"curve": "s"},
+    "custom": {"curve": "custom", "points": [[0, 0], [0.2, 0.5], [0.5, 0.6], [0.8, 0.7], [1, 1]]},
+}
+
+
+def parse_frames(data):
+    parser = FrameParser()
+    return [parser.parse(line).copy() for line in data.decode("utf-8").splitlines()]
+
+
+def bench_plan(frames, spec):
+    curves = {sensor: spec for sensor in CC_SENSORS}
+
+    def run():
+        receiver = SerialReceiver(port="FAKE", midi_handler=NullMidi(), hub=FakeHub(), curves=curves,
+                                  **RECEIVER_OPTIONS)
+        start = time.perf_counter()
+        for frame in frames:
+            receiver.process_data(frame)
+        return time.perf_counter() - start
+    return best_rate(run, len(frames))
+
+
+def bench_direct(values, curve):
+    """
+    Evaluating the curve function per value instead (values/s).
+    """
+    function = CURVES[curve]
+    amount = DEFAULT_AMOUNTS[curve]
+
+    def run():
+        start = time.perf_counter()
+        for raw, r in values:
+            x = min(1.0, max(0.0, (raw + r) / (2 * r)))
+            int(127 * function(x, amount))
+        return time.perf_counter() - start
+    return best_rate(run, len(values))
+
+
+def bench_table(values, curve):
+    """
+    The compiled path for the same values (values/s).
+    """
+    mappings = {sensor_range(sensor): cc_mapping(sensor, {"curve": curve}) for sensor in CC_SENSORS}
+
+    def run():
+        start = time.perf_counter()
+        for raw, r in values:
+            scale, offset, table = mappings[r]
+            int(table[max(0, min(LUT_LAST, int(raw * scale + offset)))])
+        return time.perf_counter() - start
+    return best_rate(run, len(values))
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("capture", nargs="?", default="percussion.txt")
+    args = arg_parser.parse_args()
+
+    frames = parse_frames(read_capture(args.capture))
+    print(f"{args.capture}: {len(frames)} frames, {len(CC_SENSORS)} CC sensors")
+    for name, spec in SPECS.items():
+        print(f"  process_data {name:7s} {bench_plan(frames, spec):10,.0f} frames/s")
+
+    values = [(frame.values[field_index(sensor)], sensor_range(sensor)) for frame in frames for sensor in CC_SENSORS]
+    for curve in DEFAULT_AMOUNTS:
+        print(f"  {curve:4s} per value: evaluated {bench_direct(values, curve):11,.0f}/s  "
+              f"table {bench_table(values, curve):11,.0f}/s")
+
+
+if __name__ == "__main__":
+    main()
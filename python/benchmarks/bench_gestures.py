@@ -0,0 +1,108 @@
+# bench_gestures.py
+"""
+Per-frame cost and detections of GestureRecognizer as the library grows.
+
+The library is the "square" gesture from square.txt plus synthetic distractor
+templates (smoothed random walks with the IMU's magnitudes), so the template
+count can grow without new recordings. For each library size the captures are
+fed frame by frame; reported are the time per DTW step (p50/p99/max), the mean
+time per frame, the mean number of templates actually computed per step
+(early abandoning and the max_active cap), and the gestures that fired.
+
+    python benchmarks/bench_gestures.py [--sizes 1 8 16 32 64] [--max-active 16]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from fakes import capture_path
+
+from data_parser import FrameParser  # noqa: E402
+from gestures import FEATURES, GestureRecognizer, GestureTemplate  # noqa: E402
+
+CAPTURES = ("square.txt", "fingers.txt", "percussion.txt")
+SQUARE = (1100, 1700)  # frames of the gesture in square.txt
+THRESHOLD = 0.45
+
+
+def read_frames(file_name):
+    parser = FrameParser()
+    frames = []
+    with open(capture_path(file_name), "r") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                frames.append(parser.parse(line).copy())
+    return frames
+
+
+def distractors(count, rng):
+    templates = []
+    for k in range(count):
+        length = int(rng.integers(150, 600))
+        walk = np.cumsum(rng.normal(0, 1, (length, len(FEATURES))), axis=0)
+        walk -= walk.mean(axis=0)
+        walk /= walk.std(axis=0) + 1e-9
+        frames = walk * (0.4, 0.4, 0.4, 150, 150, 150) + (0.8, 0.0, 0.3, 0, 0, 0)
+        templates.append(GestureTemplate(f"distractor {k}", frames, threshold=THRESHOLD))
+    return templates
+
+
+def run(recognizer, frames):
+    step_ns = []
+    fired = []
+    computed_before = recognizer.templates_computed
+    steps_before = recognizer._step
+    start = time.perf_counter_ns()
+    for i, frame in enumerate(frames):
+        now = time.perf_counter_ns()
+        name = recognizer.update(frame.values, i * 10_000_000)  # 100 Hz timeline for the refractory
+        elapsed = time.perf_counter_ns() - now
+        if recognizer._pending == 0:
+            step_ns.append(elapsed)
+        if name is not None:
+            fired.append((name, i))
+    total = time.perf_counter_ns() - start
+    steps = recognizer._step - steps_before
+    computed = (recognizer.templates_computed - computed_before) / max(steps, 1)
+    return np.array(step_ns), total / len(frames), computed, fired
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("--sizes", type=int, nargs="+", default=[1, 8, 16, 32, 64])
+    arg_parser.add_argument("--max-active", type=int, default=16)
+    arg_parser.add_argument("--decimate", type=int, default=4)
+    args = arg_parser.parse_args()
+
+    captures = {name: read_frames(name) for name in CAPTURES}
+    square = GestureTemplate.from_capture("square", capture_path("square.txt"), *SQUARE, threshold=THRESHOLD)
+    rng = np.random.default_rng(1)
+    extra = distractors(max(args.sizes) - 1, rng)
+    print(f"decimate {args.decimate}, max_active {args.max_active}, square template "
+          f"{(SQUARE[1] - SQUARE[0]) // args.decimate} steps")
+    for size in args.sizes:
+        templates = [square] + extra[:size - 1]
+        steps = []
+        per_frame = []
+        computed = []
+        detections = {}
+        for name, frames in captures.items():
+            recognizer = GestureRecognizer(templates, decimate=args.decimate, max_active=args.max_active)
+            step_ns, frame_ns, mean_computed, fired = run(recognizer, frames)
+            steps.append(step_ns)
+            per_frame.append(frame_ns)
+            computed.append(mean_computed)
+            detections[name] = fired
+        step_us = np.concatenate(steps) / 1000
+        found = "; ".join(f"{name}: " + (", ".join(f"{g}@{i}" for g, i in fired) or "-")
+                          for name, fired in detections.items())
+        print(f"{size:3d} templates  step p50 {np.percentile(step_us, 50):6.1f} us  "
+              f"p99 {np.percentile(step_us, 99):6.1f} us  max {step_us.max():7.1f} us  "
+              f"frame mean {np.mean(per_frame) / 1000:5.1f} us  computed/step {np.mean(computed):5.1f}")
+        print(f"    fired: {found}")
+
+
+if __name__ == "__main__":
+    main()
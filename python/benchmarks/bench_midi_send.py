@@ -0,0 +1,177 @@
+# bench_midi_send.py
+"""
+MidiHandler's raw-bytes send path versus building a mido.Message per event.
+
+The message stream of a capture (as bench_pipeline.py's e2e run records it) is
+replayed through:
+
+    mido.Message   the previous path: a validated mido.Message per event,
+                   sent to a mido port whose backend takes one message per
+                   call (like rtmidi)
+    rtmidi         MidiHandler to the same backend through the raw-bytes path
+    stream         MidiHandler to a byte-stream port (raw device node), one
+                   write per message with running status
+    stream batch   the same port, --batch messages per write (as the
+                   dispatcher sends whatever is due at once)
+
+Reported are messages/s, the speedup over mido.Message, bytes written per
+message, and whether the port received the same messages as the mido path
+(byte streams with running status expanded).
+
+    python benchmarks/bench_midi_send.py [capture ...] [--batch 8]
+"""
+import argparse
+import threading
+import time
+
+import mido
+
+from bench_pipeline import CAPTURES, best_rate, run_e2e
+from fakes import BytePort, read_capture
+
+from midi_handler import RTMIDI_BACKEND, MidiHandler  # noqa: E402
+
+
+class MessageBackend:
+    """
+    rtmidi.MidiOut stand-in: one message (a byte sequence) per call.
+    """
+    def __init__(self):
+        self.messages = []
+
+    def send_message(self, message):
+        self.messages.append(message)
+
+
+class MessagePort(mido.ports.BaseOutput):
+    """
+    mido output port over a MessageBackend, like mido's rtmidi backend.
+    """
+    __module__ = RTMIDI_BACKEND  # so port_writer treats it as that backend's port
+
+    def __init__(self):
+        self._rt = MessageBackend()
+        super().__init__("bench")
+
+    def _send(self, msg):
+        self._rt.send_message(msg.bytes())
+
+    def stream(self) -> bytes:
+        return b"".join(bytes(message) for message in self._rt.messages)
+
+    def clear(self):
+        self._rt.messages.clear()
+
+
+def mido_calls(messages, port):
+    """
+    The previous MidiHandler send path, event by event.
+    """
+    lock = threading.Lock()
+
+    def note_on(note, velocity):
+        try:
+            msg = mido.Message('note_on', note=note, velocity=velocity)
+        except Exception:
+            return
+        with lock:
+            port.send(msg)
+
+    def note_off(note):
+        try:
+            msg = mido.Message('note_off', note=note, velocity=0)
+        except Exception:
+            return
+        with lock:
+            port.send(msg)
+
+    def control_change(controller, value):
+        try:
+            msg = mido.Message('control_change', control=controller, value=value)
+        except Exception:
+            return
+        with lock:
+            port.send(msg)
+
+    return calls(messages, note_on, note_off, control_change)
+
+
+def handler_calls(messages, midi):
+    return calls(messages, midi.send_midi_note_on, midi.send_midi_note_off, midi.send_midi_control_change)
+
+
+def calls(messages, note_on, note_off, control_change):
+    result = []
+    for msg in messages:
+        if msg.type == "note_on":
+            result.append((note_on, (msg.note, msg.velocity)))
+        elif msg.type == "note_off":
+            result.append((note_off, (msg.note,)))
+        else:
+            result.append((control_change, (msg.control, msg.value)))
+    return result
+
+
+def bench_calls(calls_, port, midi=None):
+    def run():
+        port.clear()
+        if midi is not None:
+            midi._status = None  # the port starts without running status
+        start = time.perf_counter()
+        for send, args in calls_:
+            send(*args)
+        return time.perf_counter() - start
+    return best_rate(run, len(calls_))
+
+
+def bench_batched(encoded, midi, port, batch):
+    batches = [encoded[i:i + batch] for i in range(0, len(encoded), batch)]
+
+    def run():
+        port.clear()
+        midi._status = None  # the port starts without running status
+        start = time.perf_counter()
+        for messages in batches:
+            midi._send_many(messages)
+        return time.perf_counter() - start
+    return best_rate(run, len(encoded))
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("captures", nargs="*", default=CAPTURES)
+    arg_parser.add_argument("--batch", type=int, default=8, help="messages per write in the batched run")
+    args = arg_parser.parse_args()
+
+    for name in args.captures:
+        _, recorded = run_e2e(read_capture(name))
+        messages = recorded.messages
+        expected = recorded.stream()
+        encoded = [bytes(msg.bytes()) for msg in messages]
+        print(f"{name}: {len(messages)} messages")
+
+        message_port = MessagePort()
+        base = bench_calls(mido_calls(messages, message_port), message_port)
+        results = [("mido.Message", base, 3.0, message_port.stream())]
+
+        midi = MidiHandler(dispatcher=False, open_port=False)
+        midi.midi_out = message_port
+        rate = bench_calls(handler_calls(messages, midi), message_port)
+        results.append(("rtmidi", rate, 3.0, message_port.stream()))
+
+        byte_port = BytePort()
+        midi.midi_out = byte_port
+        rate = bench_calls(handler_calls(messages, midi), byte_port, midi)
+        results.append(("stream", rate, len(byte_port.data) / len(messages), byte_port.stream()))
+
+        rate = bench_batched(encoded, midi, byte_port, args.batch)
+        results.append((f"stream batch {args.batch}", rate, len(byte_port.data) / len(messages),
+                        byte_port.stream()))
+
+        for label, rate, per_message, stream in results:
+            print(f"  {label:16s} {rate:11,.0f} msg/s  x{rate / base:4.1f}  {per_message:4.2f} bytes/msg  "
+                  f"stream {'ok' if stream == expected else 'MISMATCH'}")
+
+
+if __name__ == "__main__":
+    main()
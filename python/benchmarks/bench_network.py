@@ -0,0 +1,88 @@
+# bench_network.py
+"""
+NetworkOutput over loopback UDP: one datagram per frame versus one per message.
+
+Each capture is fed through SerialReceiver (as in bench_pipeline.py's e2e run)
+with a NetworkOutput sending to a UdpSink on 127.0.0.1. Reported per protocol
+and mode: frames/s through the pipeline, datagrams and datagrams/s, bytes per
+message on the wire (including IP and UDP headers), and whether the decoded MIDI stream matches the one the mido port
+receives for the same capture.
+
+    python benchmarks/bench_network.py [capture ...]
+"""
+import argparse
+import time
+
+from bench_pipeline import CHUNK_SIZE, RECEIVER_OPTIONS, run_e2e
+from fakes import FakeHub, UdpSink, chunks, read_capture
+
+from network_output import PROTOCOLS, NetworkOutput, NetworkSender  # noqa: E402
+from serial_receiver import SerialReceiver  # noqa: E402
+
+REPEATS = 3
+IP_UDP_HEADERS = 28  # IPv4 + UDP header bytes per datagram
+
+
+def run(data, protocol, batch, sink, sender):
+    """
+    Feeds the capture once. Returns (seconds, datagrams sent, messages, stream);
+    datagrams the sink lost (its socket buffer overflowing) are missing from the stream.
+    """
+    network = NetworkOutput(sender, "127.0.0.1", sink.port, protocol=protocol, batch=batch)
+    hub = FakeHub()
+    receiver = SerialReceiver(port="FAKE", hub=hub, network=network, **RECEIVER_OPTIONS)
+    reads = chunks(data, CHUNK_SIZE)
+    sink.clear()
+    packets_before = sender.packets
+    start = time.perf_counter()
+    for chunk in reads:
+        hub.source.feed(chunk)
+    elapsed = time.perf_counter() - start
+    receiver.stop()
+    packets = sender.packets - packets_before
+    sink.wait(packets)
+    return elapsed, packets, network.messages, sink.stream(protocol)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("captures", nargs="*", default=["square.txt", "percussion.txt"])
+    args = arg_parser.parse_args()
+
+    sink = UdpSink()
+    sender = NetworkSender()
+    try:
+        for file_name in args.captures:
+            data = read_capture(file_name)
+            frames = data.count(b"\n")
+            _, port = run_e2e(data)
+            expected = port.stream()
+            print(f"{file_name}: {frames} frames, {len(port.messages)} messages")
+            for protocol in PROTOCOLS:
+                for batch in (True, False):
+                    best = None
+                    for _ in range(REPEATS):
+                        result = run(data, protocol, batch, sink, sender)
+                        if best is None or result[0] < best[0]:
+                            best = result
+                    elapsed, packets, messages, stream = best
+                    received = len(sink.datagrams)
+                    size = sum(len(d) + IP_UDP_HEADERS for d in sink.datagrams)
+                    if received < packets:
+                        check = f"{packets - received} lost"
+                    else:
+                        check = "ok" if stream == expected else "MISMATCH"
+                    mode = "per frame" if batch else "per message"
+                    print(f"  {protocol:8s} {mode:12s} {frames / elapsed:9,.0f} frames/s  "
+                          f"{packets:6d} datagrams  {packets / elapsed:9,.0f} datagrams/s  "
+                          f"{size / max(messages, 1):5.1f} bytes/msg  stream {check}")
+    finally:
+        sender.close()
+        sink.close()
+    stats = sender.stats()
+    if stats["errors"] or stats["dropped"]:
+        print(f"send errors {stats['errors']}, dropped {stats['dropped']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+# bench_parser.py
+"""
+Compares the compiled FrameParser against parse_line_to_dict on the bundled
+captures. Run from the python/ directory:
+
+    python benchmarks/bench_parser.py
+"""
+import os
+import sys
+import time
+
+PYTHON_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, PYTHON_DIR)
+
+from data_parser import FrameParser, parse_line_to_dict  # noqa: E402
+
+CAPTURES = ["fingers.txt", "square.txt", "percussion.txt"]
+REPEATS = 5
+
+
+def load_lines(file_name):
+    with open(os.path.join(PYTHON_DIR, file_name), "r") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def best_time(func, lines):
+    best = float("inf")
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        for line in lines:
+            func(line)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def check_equivalent(parser, lines):
+    for line in lines:
+        expected = parse_line_to_dict(line)
+        frame = parser.parse(line)
+        for key, value in expected.items():
+            if frame.get(key) != value:
+                raise AssertionError(f"Mismatch on {key} for line: {line}")
+
+
+def main():
+    print(f"{'capture':<16}{'lines':>7}{'dict (us/line)':>16}{'frame (us/line)':>17}{'speedup':>9}")
+    for file_name in CAPTURES:
+        lines = load_lines(file_name)
+        parser = FrameParser()
+        check_equivalent(parser, lines)
+        t_dict = best_time(parse_line_to_dict, lines)
+        t_frame = best_time(parser.parse, lines)
+        n = len(lines)
+        print(f"{file_name:<16}{n:>7}{t_dict / n * 1e6:>16.2f}{t_frame / n * 1e6:>17.2f}{t_dict / t_frame:>8.2f}x")
+        print(f"{'':<16}fast path: {parser.fast_count}, fallback: {parser.fallback_count}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,310 @@
+# bench_pipeline.py
+"""
+Hardware-free regression benchmark of the whole receive pipeline.
+
+Each bundled capture is driven through SerialReceiver without gloves or a MIDI
+interface (see fakes.py) and measured per stage:
+
+    parse   FrameParser.parse, frames/s
+    map     SerialReceiver.process_data with a null MIDI handler, frames/s
+    send    MidiHandler.send_* into a recording port, messages/s
+    e2e     serial bytes -> SerialSource.feed -> MidiHandler -> port, frames/s,
+            plus net memory blocks retained per frame and the message stream
+
+The message stream and retained blocks do not depend on the machine and are
+checked against benchmarks/streams.json on every run: a changed stream or a
+growing block count is flagged and the exit status is 1. After an intentional
+change to the output, rewrite it with --update.
+
+Throughput depends on the machine, so it is only checked against a baseline
+file recorded on the machine you compare on (not committed): a throughput more
+than --tolerance below it is flagged too.
+
+    python benchmarks/bench_pipeline.py --record my_baseline.json
+    python benchmarks/bench_pipeline.py [--baseline my_baseline.json [--tolerance 0.25]] [--pty]
+
+--pty also plays each capture through a pseudo-terminal opened by the real
+ReceiverHub and checks it produces the same message stream (POSIX only).
+"""
+import argparse
+import gc
+import hashlib
+import json
+import os
+import sys
+import time
+
+from fakes import FakeHub, NullMidi, PtyGlove, RecordingPort, chunks, read_capture
+
+from async_core import ReceiverHub  # noqa: E402
+from data_parser import FrameParser  # noqa: E402
+from midi_handler import MidiHandler  # noqa: E402
+from serial_receiver import SerialReceiver  # noqa: E402
+
+CAPTURES = ["square.txt", "fingers.txt", "percussion.txt"]
+STREAMS = os.path.join(os.path.dirname(os.path.realpath(__file__)), "streams.json")
+REPEATS = 5
+CHUNK_SIZE = 64  # bytes per simulated serial read
+
+# Every sensor routed; the CC rate limit is off so the stream doesn't depend on timing.
+CONFIG = {"P1": "C4", "P2": "D4", "P3": "E4", "P4": "F4"}
+CONFIG.update({sensor: str(cc) for cc, sensor in enumerate(
+    ["F1", "F2", "F3", "F4", "AccX", "AccY", "AccZ", "GyrX", "GyrY", "GyrZ"], start=20)})
+RECEIVER_OPTIONS = {"config_dict": CONFIG, "cc_deadband": 1.0, "cc_max_rate": 0}
+
+THROUGHPUT_METRICS = ("parse_fps", "map_fps", "send_mps", "e2e_fps")
+STREAM_KEYS = ("frames", "messages", "stream_sha256", "net_blocks_per_frame")
+
+
+def best_rate(run, count):
+    best = float("inf")
+    for _ in range(REPEATS):
+        elapsed = run()
+        best = min(best, elapsed)
+    return count / best if best > 0 else 0.0
+
+
+def make_midi():
+    midi = MidiHandler(dispatcher=False, open_port=False)
+    port = RecordingPort()
+    midi.midi_out = port
+    return midi, port
+
+
+def make_receiver(midi_handler):
+    hub = FakeHub()
+    receiver = SerialReceiver(port="FAKE", midi_handler=midi_handler, hub=hub, **RECEIVER_OPTIONS)
+    return receiver, hub.source
+
+
+def bench_parse(lines):
+    def run():
+        parser = FrameParser()
+        start = time.perf_counter()
+        for line in lines:
+            parser.parse(line)
+        return time.perf_counter() - start
+    return best_rate(run, len(lines))
+
+
+def bench_map(lines):
+    parser = FrameParser()
+    frames = []
+    for line in lines:
+        frame = parser.parse(line)
+        frames.append(frame.copy() if hasattr(frame, "copy") else frame)
+
+    def run():
+        receiver, _ = make_receiver(NullMidi())
+        start = time.perf_counter()
+        for frame in frames:
+            receiver.process_data(frame)
+        return time.perf_counter() - start
+    return best_rate(run, len(frames))
+
+
+def bench_send(messages):
+    midi, port = make_midi()
+    calls = []
+    for msg in messages:
+        if msg.type == "note_on":
+            calls.append((midi.send_midi_note_on, (msg.note, msg.velocity)))
+        elif msg.type == "note_off":
+            calls.append((midi.send_midi_note_off, (msg.note,)))
+        else:
+            calls.append((midi.send_midi_control_change, (msg.control, msg.value)))
+
+    def run():
+        port.clear()
+        start = time.perf_counter()
+        for send, args in calls:
+            send(*args)
+        return time.perf_counter() - start
+    return best_rate(run, len(calls)) if calls else 0.0
+
+
+def run_e2e(data):
+    """
+    Feeds the capture bytes through a fresh receiver. Returns (seconds, port).
+    """
+    midi, port = make_midi()
+    receiver, source = make_receiver(midi)
+    reads = chunks(data, CHUNK_SIZE)
+    start = time.perf_counter()
+    for chunk in reads:
+        source.feed(chunk)
+    elapsed = time.perf_counter() - start
+    receiver.stop()
+    return elapsed, port
+
+
+def net_blocks_per_frame(data, frames):
+    """
+    Memory blocks still allocated after a second pass over the capture, per frame
+    (should stay near 0: the hot path reuses its frame and buffers).
+    """
+    midi, _ = make_midi()
+    receiver, source = make_receiver(midi)
+    reads = chunks(data, CHUNK_SIZE)
+    for chunk in reads:  # warm up: parser layout, filter state
+        source.feed(chunk)
+    midi.midi_out = NullPort()
+    gc.collect()
+    before = sys.getallocatedblocks()
+    for chunk in reads:
+        source.feed(chunk)
+    gc.collect()
+    after = sys.getallocatedblocks()
+    receiver.stop()
+    return (after - before) / frames
+
+
+class NullPort:
+    def send(self, msg):
+        pass
+
+
+def run_pty(data, frames, timeout=30.0):
+    """
+    Plays the capture through a pseudo-terminal and the real ReceiverHub.
+    Returns the recorded port.
+    """
+    glove = PtyGlove()
+    hub = ReceiverHub()
+    midi, port = make_midi()
+    connected = []
+    receiver = SerialReceiver(port=glove.port, midi_handler=midi, hub=hub,
+                              on_status=connected.append, **RECEIVER_OPTIONS)
+    try:
+        deadline = time.monotonic() + timeout
+        while not any(text.startswith("Connected") for text in connected):
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"{glove.port} not opened")
+            time.sleep(0.01)
+        glove.write(data)
+        while receiver.snapshot.seq < frames:
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"only {receiver.snapshot.seq}/{frames} frames received")
+            time.sleep(0.01)
+    finally:
+        receiver.stop()
+        hub.stop()
+        glove.close()
+    return port
+
+
+def measure(file_name, pty):
+    data = read_capture(file_name)
+    lines = data.decode("utf-8").splitlines()
+    frames = len(lines)
+
+    elapsed, port = run_e2e(data)
+    stream = port.stream()
+    result = {
+        "frames": frames,
+        "parse_fps": bench_parse(lines),
+        "map_fps": bench_map(lines),
+        "send_mps": bench_send(port.messages),
+        "e2e_fps": best_rate(lambda: run_e2e(data)[0], frames),
+        "net_blocks_per_frame": net_blocks_per_frame(data, frames),
+        "messages": len(port.messages),
+        "stream_sha256": hashlib.sha256(stream).hexdigest(),
+    }
+    if pty:
+        result["pty_stream_matches"] = run_pty(data, frames).stream() == stream
+    return result
+
+
+def compare_throughput(name, result, baseline, tolerance):
+    """
+    Returns a list of throughput regression descriptions for one capture.
+    """
+    problems = []
+    for metric in THROUGHPUT_METRICS:
+        expected = baseline.get(metric)
+        if expected and result[metric] < expected * (1 - tolerance):
+            problems.append(f"{name}: {metric} {result[metric]:,.0f} < baseline {expected:,.0f} "
+                            f"(-{(1 - result[metric] / expected) * 100:.0f}%)")
+    return problems
+
+
+def compare_stream(name, result, baseline):
+    """
+    Returns a list of output and memory regression descriptions for one capture.
+    """
+    problems = []
+    expected = baseline.get("net_blocks_per_frame")
+    if expected is not None and result["net_blocks_per_frame"] > expected + 0.1:
+        problems.append(f"{name}: {result['net_blocks_per_frame']:.2f} blocks retained per frame "
+                        f"(baseline {expected:.2f})")
+    if "stream_sha256" in baseline and (result["messages"] != baseline["messages"]
+                                        or result["stream_sha256"] != baseline["stream_sha256"]):
+        problems.append(f"{name}: MIDI stream changed ({result['messages']} messages, "
+                        f"baseline {baseline['messages']})")
+    if result.get("pty_stream_matches") is False:
+        problems.append(f"{name}: pty stream differs from the in-memory stream")
+    return problems
+
+
+def write_results(path, results):
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("--update", action="store_true",
+                            help=f"store the message streams as the new {os.path.basename(STREAMS)}")
+    arg_parser.add_argument("--record", metavar="FILE", help="store this machine's throughput in FILE")
+    arg_parser.add_argument("--baseline", metavar="FILE", help="compare throughput with FILE (see --record)")
+    arg_parser.add_argument("--tolerance", type=float, default=0.25,
+                            help="allowed throughput drop (fraction of the baseline)")
+    arg_parser.add_argument("--pty", action="store_true", help="also run through a pseudo-terminal")
+    args = arg_parser.parse_args()
+
+    streams = {}
+    if os.path.isfile(STREAMS):
+        with open(STREAMS, "r") as f:
+            streams = json.load(f)
+    baselines = {}
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baselines = json.load(f)
+
+    results = {}
+    problems = []
+    for file_name in CAPTURES:
+        result = measure(file_name, args.pty)
+        results[file_name] = result
+        print(f"{file_name}: {result['frames']} frames, {result['messages']} messages")
+        print(f"  parse {result['parse_fps']:>12,.0f} frames/s   map {result['map_fps']:>10,.0f} frames/s")
+        print(f"  send  {result['send_mps']:>12,.0f} msgs/s     e2e {result['e2e_fps']:>10,.0f} frames/s")
+        print(f"  {result['net_blocks_per_frame']:.3f} blocks retained/frame, "
+              f"stream {result['stream_sha256'][:12]}")
+        if "pty_stream_matches" in result:
+            print(f"  pty stream matches: {result['pty_stream_matches']}")
+        if not args.update and file_name in streams:
+            problems += compare_stream(file_name, result, streams[file_name])
+        if file_name in baselines:
+            problems += compare_throughput(file_name, result, baselines[file_name], args.tolerance)
+
+    if args.record:
+        write_results(args.record, {name: {metric: round(result[metric]) for metric in THROUGHPUT_METRICS}
+                                    for name, result in results.items()})
+        print(f"Throughput baseline written to {args.record}")
+    if args.update:
+        for result in results.values():
+            result["net_blocks_per_frame"] = round(result["net_blocks_per_frame"], 4)
+        write_results(STREAMS, {name: {key: result[key] for key in STREAM_KEYS} for name, result in results.items()})
+        print(f"Message streams written to {STREAMS}")
+    if not streams and not args.update:
+        print(f"No {os.path.basename(STREAMS)} yet; run with --update to record it.")
+    for problem in problems:
+        print(f"REGRESSION {problem}")
+    print("OK" if not problems else f"{len(problems)} regression(s)")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
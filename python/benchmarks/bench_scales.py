@@ -0,0 +1,120 @@
+# bench_scales.py
+"""
+Key changes with the precomputed scale tables (scales.py), and held notes
+across them.
+
+1. Cost of a key change: the previous compute_scale (building a scale from
+   intervals and note names per call, Major/Minor only) against the current
+   one (note names for the GUI) and key_index + scale_notes (the MIDI numbers
+   headless.py puts in the plan), over every root, mode and octave the tables
+   cover.
+2. Stuck-note check: random presses on P1-P4 and random key changes every few
+   frames are fed through SerialReceiver.process_data into a recording port.
+   After every frame the notes sounding on the port must be exactly the notes
+   the receiver holds, and nothing may sound after all_notes_off. Run for both
+   held_notes policies.
+
+    python benchmarks/bench_scales.py [--frames 200000] [--change-every 7]
+"""
+import argparse
+import random
+import time
+
+from fakes import FakeHub, RecordingPort
+
+from data_parser import FIELD_INDEX, SensorFrame  # noqa: E402
+from midi_handler import MidiHandler  # noqa: E402
+from routing import NOTE_NAME_TO_MIDI, NOTE_SENSORS, compute_scale  # noqa: E402
+from scales import MODE_NAMES, OCTAVES, ROOTS, key_index, scale_notes  # noqa: E402
+from serial_receiver import HELD_NOTE_POLICIES, SerialReceiver  # noqa: E402
+
+REPEATS = 5
+PREVIOUS_NAMES = {midi: name for name, midi in NOTE_NAME_TO_MIDI.items() if midi is not None}
+
+
+def previous_compute_scale(root, mode):
+    """
+    compute_scale as it was before the tables.
+    """
+    base_midi = NOTE_NAME_TO_MIDI[root + "3"]
+    if mode == "Major":
+        intervals = [0, 2, 4, 5, 7, 9, 11, 12]
+    else:
+        intervals = [0, 2, 3, 5, 7, 8, 10, 12]
+    return [PREVIOUS_NAMES.get(base_midi + i, str(base_midi + i)) for i in intervals]
+
+
+def per_call_us(function, calls):
+    best = float("inf")
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        for args in calls:
+            function(*args)
+        best = min(best, time.perf_counter() - start)
+    return best / len(calls) * 1e6
+
+
+def bench_key_change():
+    natural = [root for root in ROOTS if "#" not in root]
+    old = per_call_us(previous_compute_scale, [(root, mode) for root in natural for mode in ("Major", "Minor")])
+    keys = [(root, mode, octave) for root in ROOTS for mode in MODE_NAMES for octave in OCTAVES]
+    names = per_call_us(compute_scale, keys)
+    numbers = per_call_us(lambda *key: scale_notes(key_index(*key), 8), keys)
+    print(f"key change, {len(keys)} keys: previous compute_scale {old:.2f} us (14 keys), "
+          f"compute_scale {names:.2f} us, key_index + scale_notes {numbers:.2f} us")
+
+
+def stress(policy, frames, change_every, rng):
+    midi = MidiHandler(dispatcher=False, open_port=False)
+    port = RecordingPort()
+    midi.midi_out = port
+    config = dict(zip(NOTE_SENSORS, compute_scale("C", "Major")))
+    receiver = SerialReceiver(port="FAKE", midi_handler=midi, config_dict=config, hub=FakeHub(),
+                              held_notes=policy, cc_max_rate=0)
+    frame = SensorFrame()
+    indices = [FIELD_INDEX[sensor] for sensor in NOTE_SENSORS]
+    keys = [(root, mode, octave) for root in ROOTS for mode in MODE_NAMES for octave in (2, 3, 4, 5)]
+    sounding = {}
+    seen = 0
+    changes = 0
+    mismatches = 0
+    for i in range(frames):
+        if i % change_every == 0:
+            config.update(zip(NOTE_SENSORS, compute_scale(*rng.choice(keys), count=4)))
+            receiver.update_plan()
+            changes += 1
+        for index in indices:
+            if rng.random() < 0.2:
+                frame.values[index] = 1.0 - frame.values[index]
+        receiver.process_data(frame)
+        for msg in port.messages[seen:]:
+            if msg.type == "note_on":
+                sounding[msg.note] = sounding.get(msg.note, 0) + 1
+            elif sounding.get(msg.note):
+                sounding[msg.note] -= 1
+        seen = len(port.messages)
+        held = sorted(note for note in receiver.current_notes.values() if note is not None)
+        if sorted(note for note, count in sounding.items() for _ in range(count)) != held:
+            mismatches += 1
+    receiver.all_notes_off()
+    for msg in port.messages[seen:]:
+        if msg.type == "note_off" and sounding.get(msg.note):
+            sounding[msg.note] -= 1
+    stuck = sum(sounding.values())
+    print(f"{policy:8s} {frames} frames, {changes} key changes, {len(port.messages)} messages: "
+          f"{mismatches} frames with sounding != held, {stuck} stuck after all_notes_off")
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("--frames", type=int, default=200_000)
+    arg_parser.add_argument("--change-every", type=int, default=7, help="frames between key changes")
+    args = arg_parser.parse_args()
+
+    bench_key_change()
+    for policy in HELD_NOTE_POLICIES:
+        stress(policy, args.frames, args.change_every, random.Random(1))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+# bench_startup.py
+"""
+Startup time and resident memory of the headless bridge versus the Tk GUI.
+
+Each mode runs in a fresh interpreter: it starts the hub, MIDI connection
+manager and receivers (from bridge_example.json for headless, GLOVES for the
+GUI) and reports the time to ready and the RSS at that point. Without a
+display the GUI can't create its window, so only its imports are measured.
+
+    python benchmarks/bench_startup.py [--runs 5]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+PYTHON_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+HEADLESS = """
+import json, sys, time
+start = time.perf_counter()
+import headless
+from log_writer import LOG, QUIET
+LOG.set_verbosity(QUIET)
+bridge = headless.HeadlessBridge("bridge_example.json")
+bridge.start()
+ready = time.perf_counter() - start
+print(json.dumps({"ready_ms": ready * 1000, "rss_kib": headless.resident_kib(),
+                  "tkinter": "tkinter" in sys.modules, "window": False}))
+bridge.stop()
+"""
+
+GUI = """
+import json, os, sys, time
+start = time.perf_counter()
+import main
+from log_writer import LOG, QUIET
+from headless import resident_kib
+LOG.set_verbosity(QUIET)
+app = None
+try:
+    root = main.tk.Tk()
+    app = main.App(root)
+    root.update()
+except main.tk.TclError:
+    pass  # no display: imports only
+ready = time.perf_counter() - start
+print(json.dumps({"ready_ms": ready * 1000, "rss_kib": resident_kib(),
+                  "tkinter": "tkinter" in sys.modules, "window": app is not None}))
+if app is not None:
+    app.on_closing()
+"""
+
+
+def run(code):
+    start = time.perf_counter()
+    output = subprocess.run([sys.executable, "-c", code], cwd=PYTHON_DIR, capture_output=True,
+                            text=True, check=True).stdout
+    wall_ms = (time.perf_counter() - start) * 1000
+    result = json.loads(output.strip().splitlines()[-1])
+    result["wall_ms"] = wall_ms
+    return result
+
+
+def summarize(name, results):
+    ready = statistics.median(r["ready_ms"] for r in results)
+    wall = statistics.median(r["wall_ms"] for r in results)
+    rss = statistics.median(r["rss_kib"] for r in results) / 1024
+    note = "" if results[0]["window"] or name == "headless" else " (no display: imports only)"
+    print(f"{name:9s} ready {ready:6.0f} ms  process {wall:6.0f} ms  RSS {rss:5.1f} MiB  "
+          f"tkinter: {results[0]['tkinter']}{note}")
+    return ready, rss
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("--runs", type=int, default=5)
+    args = arg_parser.parse_args()
+
+    headless = [run(HEADLESS) for _ in range(args.runs)]
+    gui = [run(GUI) for _ in range(args.runs)]
+    h_ready, h_rss = summarize("headless", headless)
+    g_ready, g_rss = summarize("gui", gui)
+    print(f"headless saves {g_ready - h_ready:.0f} ms and {g_rss - h_rss:.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
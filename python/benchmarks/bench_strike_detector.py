@@ -0,0 +1,84 @@
+# bench_strike_detector.py
+"""
+Replays a capture through StrikeDetector and reports strikes, per-frame cost
+and trigger-to-MIDI latency.
+
+Trigger-to-MIDI latency is measured from the arrival of the frame that
+confirms a strike (one frame after the peak) to the return of
+send_midi_note_on; the one-frame confirmation delay is reported separately.
+
+    python benchmarks/bench_strike_detector.py [capture] [--fps 100]
+"""
+import argparse
+import os
+import sys
+import time
+
+PYTHON_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, PYTHON_DIR)
+
+from data_parser import FrameParser  # noqa: E402
+from strike_detector import StrikeDetector  # noqa: E402
+
+BUDGET_US = 1000.0
+
+
+class TimingMidi:
+    def __init__(self):
+        self.sent_ns = []
+        self.velocities = []
+        self.note_offs = 0
+
+    def send_midi_note_on(self, note, velocity=None):
+        self.sent_ns.append(time.perf_counter_ns())
+        self.velocities.append(velocity)
+
+    def send_midi_note_off(self, note):
+        self.note_offs += 1
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(p / 100 * len(sorted_values)))]
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("capture", nargs="?", default="percussion.txt")
+    arg_parser.add_argument("--fps", type=float, default=100.0, help="glove frame rate of the capture")
+    args = arg_parser.parse_args()
+
+    parser = FrameParser()
+    with open(os.path.join(PYTHON_DIR, args.capture), "r") as f:
+        frames = [parser.parse(line.strip()).copy() for line in f if line.strip()]
+
+    midi = TimingMidi()
+    detector = StrikeDetector(midi_handler=midi)
+    period_ns = int(1e9 / args.fps)
+    costs_us = []
+    latencies_us = []
+    for i, frame in enumerate(frames):
+        arrival = time.perf_counter_ns()
+        sent_before = len(midi.sent_ns)
+        detector.update(frame.values, i * period_ns)
+        done = time.perf_counter_ns()
+        costs_us.append((done - arrival) / 1000)
+        if len(midi.sent_ns) > sent_before:
+            latencies_us.append((midi.sent_ns[-1] - arrival) / 1000)
+    detector.flush()
+
+    costs_us.sort()
+    latencies_us.sort()
+    print(f"{args.capture}: {len(frames)} frames, {detector.strikes} strikes, {midi.note_offs} note-offs")
+    if midi.velocities:
+        print(f"  velocity min/median/max: {min(midi.velocities)}/"
+              f"{sorted(midi.velocities)[len(midi.velocities) // 2]}/{max(midi.velocities)}")
+    print(f"  per-frame cost p50 {percentile(costs_us, 50):.2f} us, p99 {percentile(costs_us, 99):.2f} us, "
+          f"max {costs_us[-1]:.2f} us (budget {BUDGET_US:.0f} us)")
+    print(f"  trigger-to-MIDI p50 {percentile(latencies_us, 50):.2f} us, p99 {percentile(latencies_us, 99):.2f} us"
+          f" + {period_ns / 1e6:.1f} ms peak confirmation (one frame at {args.fps:g} fps)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# bench_worker.py
+"""
+Latency from serial bytes to mapped MIDI, with the glove read in-process by
+the hub (SerialSource) versus in a worker process (WorkerSource), while a
+thread simulates a busy UI holding the GIL in the main process.
+
+A capture is played through a pseudo-terminal at --fps; latency comes from the
+"total" stage of latency.LATENCY. POSIX only. The worker can only win with a
+spare CPU core; on one core it adds latency (see frame_ring.py).
+
+    python benchmarks/bench_worker.py [capture] [--fps 200] [--seconds 3] [--ui-load 0.5]
+"""
+import argparse
+import os
+import threading
+import time
+
+from bench_pipeline import RECEIVER_OPTIONS, make_midi
+from fakes import PtyGlove, read_capture
+
+from async_core import ReceiverHub  # noqa: E402
+from latency import LATENCY, TOTAL  # noqa: E402
+from log_writer import LOG, ERROR  # noqa: E402
+from serial_receiver import SerialReceiver  # noqa: E402
+
+
+def busy_ui(stop, load, period=0.033):
+    """
+    Spends `load` of every `period` in pure-Python work, like Tk redraw callbacks.
+    """
+    while not stop.is_set():
+        end = time.perf_counter() + period * load
+        while time.perf_counter() < end:
+            sum(i * i for i in range(200))
+        time.sleep(period * (1 - load))
+
+
+def run(worker, lines, fps, seconds, load):
+    glove = PtyGlove()
+    hub = ReceiverHub()
+    midi, _ = make_midi()
+    status = []
+    receiver = SerialReceiver(port=glove.port, midi_handler=midi, hub=hub, worker=worker,
+                              on_status=status.append, **RECEIVER_OPTIONS)
+    stop = threading.Event()
+    ui = threading.Thread(target=busy_ui, args=(stop, load), daemon=True)
+    try:
+        deadline = time.monotonic() + 20
+        while not any(text.startswith("Connected") for text in status):
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"{glove.port} not opened: {status}")
+            time.sleep(0.01)
+        ui.start()
+        LATENCY.reset()
+        LATENCY.enabled = True
+        interval = 1.0 / fps
+        next_send = time.perf_counter()
+        for i in range(int(fps * seconds)):
+            glove.write(lines[i % len(lines)])
+            next_send += interval
+            delay = next_send - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        time.sleep(0.2)
+        LATENCY.enabled = False
+        return LATENCY.histograms[TOTAL].as_dict(), receiver.snapshot.seq
+    finally:
+        stop.set()
+        receiver.stop()
+        hub.stop()
+        glove.close()
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("capture", nargs="?", default="square.txt")
+    arg_parser.add_argument("--fps", type=float, default=200.0)
+    arg_parser.add_argument("--seconds", type=float, default=3.0)
+    arg_parser.add_argument("--ui-load", type=float, default=0.5, help="fraction of time the UI thread is busy")
+    args = arg_parser.parse_args()
+    LOG.set_verbosity(ERROR)
+
+    lines = read_capture(args.capture).splitlines(keepends=True)
+    print(f"{os.cpu_count()} CPU(s), UI load {args.ui_load:.0%}")
+    for worker in (False, True):
+        stats, frames = run(worker, lines, args.fps, args.seconds, args.ui_load)
+        name = "worker process" if worker else "in-process"
+        print(f"{name:15s} {frames:6d} frames  p50 {stats['p50_us']:8.1f} us  p99 {stats['p99_us']:8.1f} us  "
+              f"max {stats['max_us']:8.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+# fakes.py
+"""
+Hardware-free stand-ins for the glove serial ports and the MIDI interface.
+
+    FakeHub         hands out SerialSources without opening a port; bytes are
+                    pushed with source.feed(), i.e. the hub's read path.
+    PtyGlove        a pseudo-terminal (POSIX) a real SerialSource can open; the
+                    capture is written to the master side.
+    RecordingPort   a mido output port that keeps every message sent.
+    BytePort        a byte-stream port (raw MIDI device node) keeping what is written.
+    UdpSink         a loopback UDP receiver decoding what NetworkOutput sends.
+"""
+import os
+import socket
+import struct
+import sys
+import threading
+import time
+
+PYTHON_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, PYTHON_DIR)
+
+from async_core import SerialSource  # noqa: E402
+from network_output import message_length  # noqa: E402
+
+
+def capture_path(file_name):
+    return os.path.join(PYTHON_DIR, file_name)
+
+
+def read_capture(file_name) -> bytes:
+    """
+    A text capture as the bytes a glove would send (one line per frame, \\n).
+    """
+    with open(capture_path(file_name), "r") as f:
+        lines = [line.strip() for line in f]
+    return "".join(line + "\n" for line in lines if line).encode("utf-8")
+
+
+def chunks(data, size):
+    """
+    Splits data as a serial read would (fixed-size chunks regardless of lines).
+    """
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+class FakeHub:
+    """
+    Stands in for ReceiverHub when constructing a SerialReceiver: the returned
+    SerialSource is never run, so no port is opened.
+    """
+    poll_interval = 0.005
+
+    def __init__(self):
+        self.source = None
+
+    def add_serial(self, receiver, port, baud_rate=115200, on_status=None):
+        self.source = SerialSource(self, receiver, port, baud_rate, on_status)
+        self.source.started_ns = time.perf_counter_ns()
+        self.source.ready_after_ms = 0.0  # skip the "Playable" report
+        return self.source
+
+    def remove(self, source, timeout=2.0):
+        pass
+
+
+class PtyGlove:
+    """
+    A pseudo-terminal posing as a glove's serial port (POSIX only).
+
+        glove = PtyGlove()
+        SerialReceiver(port=glove.port, hub=hub, ...)
+        glove.write(read_capture("square.txt"))
+    """
+    def __init__(self):
+        import pty
+        import tty
+        self.master, self.slave = pty.openpty()
+        tty.setraw(self.slave)
+        self.port = os.ttyname(self.slave)
+
+    def write(self, data, chunk_size=256):
+        for chunk in chunks(data, chunk_size):
+            view = memoryview(chunk)
+            while view:
+                written = os.write(self.master, view)
+                view = view[written:]
+
+    def close(self):
+        os.close(self.master)
+        os.close(self.slave)
+
+
+class RecordingPort:
+    """
+    mido output port recording what MidiHandler sends. Assign it to
+    MidiHandler.midi_out (the handler created with open_port=False).
+    """
+    closed = False
+
+    def __init__(self):
+        self.messages = []
+
+    def send(self, msg):
+        self.messages.append(msg)
+
+    def stream(self) -> bytes:
+        return b"".join(bytes(msg.bytes()) for msg in self.messages)
+
+    def clear(self):
+        self.messages.clear()
+
+    def close(self):
+        self.closed = True
+
+
+class BytePort:
+    """
+    Byte-stream output port, as RawMidiPort: MidiHandler writes encoded
+    messages to it, with running status.
+    """
+    closed = False
+
+    def __init__(self):
+        self.data = bytearray()
+        self.writes = 0
+
+    def write(self, data):
+        self.data += data
+        self.writes += 1
+
+    def stream(self) -> bytes:
+        return decode_stream(self.data)
+
+    def clear(self):
+        self.data.clear()
+        self.writes = 0
+
+    def close(self):
+        self.closed = True
+
+
+def decode_stream(data) -> bytes:
+    """
+    MIDI bytes of a byte stream with running status expanded (channel and
+    real-time messages).
+    """
+    midi = bytearray()
+    status = None
+    i = 0
+    while i < len(data):
+        if data[i] >= 0xF8:
+            midi.append(data[i])
+            i += 1
+            continue
+        if data[i] & 0x80:
+            status = data[i]
+            i += 1
+        length = message_length(status) - 1
+        midi.append(status)
+        midi += data[i:i + length]
+        i += length
+    return bytes(midi)
+
+
+class NullMidi:
+    """
+    MidiHandler stand-in that only counts calls (mapping cost without sending).
+    """
+    midi_out = True
+
+    def __init__(self):
+        self.calls = 0
+
+    def send_midi_note_on(self, note, velocity=None):
+        self.calls += 1
+
+    def send_midi_note_off(self, note):
+        self.calls += 1
+
+    def send_midi_control_change(self, controller, value):
+        self.calls += 1
+
+
+def decode_osc(datagram) -> bytes:
+    """
+    MIDI bytes of an OSC message or bundle of ",m" messages.
+    """
+    if datagram.startswith(b"#bundle\x00"):
+        midi = bytearray()
+        pos = 16
+        while pos < len(datagram):
+            size, = struct.unpack_from(">i", datagram, pos)
+            midi += decode_osc(datagram[pos + 4:pos + 4 + size])
+            pos += 4 + size
+        return bytes(midi)
+    tags = datagram.index(b",")
+    if datagram[tags:tags + 2] != b",m":
+        raise ValueError(f"not a MIDI message: {datagram!r}")
+    midi = datagram[tags + 5:tags + 8]  # skip ",m\0\0" and the port id byte
+    return midi[:message_length(midi[0])]
+
+
+def decode_rtp(datagram) -> bytes:
+    """
+    MIDI bytes of an RTP-MIDI packet (no journal), running status expanded.
+    """
+    flags = datagram[12]
+    if flags & 0x80:
+        length = (flags & 0x0F) << 8 | datagram[13]
+        pos = 14
+    else:
+        length = flags & 0x0F
+        pos = 13
+    commands = datagram[pos:pos + length]
+    midi = bytearray()
+    status = None
+    i = 0
+    first = not flags & 0x20  # Z clear: no delta time before the first command
+    while i < len(commands):
+        if not first:
+            while commands[i] & 0x80:  # delta time (variable length)
+                i += 1
+            i += 1
+        first = False
+        if commands[i] & 0x80:
+            status = commands[i]
+            i += 1
+        length = message_length(status) - 1
+        midi.append(status)
+        midi += commands[i:i + length]
+        i += length
+    return bytes(midi)
+
+
+class UdpSink:
+    """
+    Loopback UDP receiver for NetworkOutput; a thread stores every datagram.
+
+        sink = UdpSink()
+        NetworkOutput(sender, "127.0.0.1", sink.port, protocol="osc")
+    """
+    def __init__(self):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 22)
+        self.sock.bind(("127.0.0.1", 0))
+        self.sock.settimeout(0.1)
+        self.port = self.sock.getsockname()[1]
+        self.datagrams = []
+        self._running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while self._running:
+            try:
+                datagram = self.sock.recv(65536)
+            except socket.timeout:
+                continue
+            self.datagrams.append(datagram)  # after recv: clear() may swap the list meanwhile
+
+    def wait(self, count, timeout=5.0) -> bool:
+        deadline = time.monotonic() + timeout
+        while len(self.datagrams) < count:
+            if time.monotonic() > deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def stream(self, protocol) -> bytes:
+        decode = decode_osc if protocol == "osc" else decode_rtp
+        return b"".join(decode(datagram) for datagram in self.datagrams)
+
+    def clear(self):
+        self.datagrams = []
+
+    def close(self):
+        self._running = False
+        self.thread.join(timeout=1)
+        self.sock.close()
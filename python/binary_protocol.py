@@ -0,0 +1,183 @@
+# binary_protocol.py
+"""
+Compact binary frame protocol for gloves that don't send text lines.
+
+Each frame is a fixed-size little-endian record:
+
+    offset  size  field
+    0       1     version (FRAME_VERSION)
+    1       2     sequence number (uint16, wraps)
+    3       1     finger bitmask (bit 0 = F1 ... bit 3 = F4)
+    4       24    AccX, AccY, AccZ, GyroX, GyroY, GyroZ (float32)
+    28      2     CRC-16/CCITT (init 0xFFFF) over bytes 0..27
+
+The record is COBS-encoded and terminated by a 0x00 delimiter, so a receiver
+can always resynchronise on the next zero byte. On the wire a frame takes
+FRAME_WIRE_SIZE (32) bytes instead of ~100 for a text line.
+"""
+import struct
+from array import array
+from binascii import crc_hqx
+
+from data_parser import FIELD_INDEX, SensorFrame
+
+FRAME_VERSION = 1
+DELIMITER = b"\x00"
+
+_BODY = struct.Struct("<BHB6f")
+_CRC = struct.Struct("<H")
+FRAME_SIZE = _BODY.size + _CRC.size
+FRAME_WIRE_SIZE = FRAME_SIZE + 2  # COBS overhead byte + delimiter
+
+FINGER_FIELDS = ("F1", "F2", "F3", "F4")
+MOTION_FIELDS = ("AccX", "AccY", "AccZ", "GyroX", "GyroY", "GyroZ")
+_FINGER_INDICES = tuple(FIELD_INDEX[name] for name in FINGER_FIELDS)
+_MOTION_START = FIELD_INDEX["AccX"]
+_MOTION_STOP = FIELD_INDEX["GyroZ"] + 1
+
+
+def cobs_encode(data: bytes) -> bytes:
+    """
+    Consistent Overhead Byte Stuffing: returns `data` with all zero bytes removed
+    (the delimiter is not appended).
+    """
+    out = bytearray()
+    for block in bytes(data).split(b"\x00"):
+        # Blocks longer than 254 bytes are split without an implied zero.
+        while len(block) >= 0xFE:
+            out.append(0xFF)
+            out += block[:0xFE]
+            block = block[0xFE:]
+        out.append(len(block) + 1)
+        out += block
+    return bytes(out)
+
+
+def cobs_decode(data) -> bytes:
+    """
+    Reverses cobs_encode. Raises ValueError on a malformed packet.
+    """
+    out = bytearray()
+    index = 0
+    length = len(data)
+    while index < length:
+        code = data[index]
+        end = index + code
+        if code == 0 or end > length:
+            raise ValueError("Malformed COBS packet")
+        out += data[index + 1:end]
+        index = end
+        if code < 0xFF and index < length:
+            out.append(0)
+    return bytes(out)
+
+
+def encode_frame(frame, seq: int) -> bytes:
+    """
+    Encodes a SensorFrame (or dict) into a delimited wire frame. This is the
+    reference for the firmware side and for feeding recordings to the decoder.
+    """
+    fingers = 0
+    for bit, name in enumerate(FINGER_FIELDS):
+        if frame.get(name, 0):
+            fingers |= 1 << bit
+    motion = [float(frame.get(name, 0.0)) for name in MOTION_FIELDS]
+    body = _BODY.pack(FRAME_VERSION, seq & 0xFFFF, fingers, *motion)
+    return cobs_encode(body + _CRC.pack(crc_hqx(body, 0xFFFF))) + DELIMITER
+
+
+class BinaryFrameDecoder:
+    """
+    Incremental decoder for the binary frame stream.
+
+    feed() takes whatever bytes the serial port returned and yields one decoded
+    SensorFrame per complete frame. The same frame object is reused for every
+    yield, so process it before advancing the iterator (or copy() it).
+
+    Corrupted frames are never yielded; they are counted instead:
+        crc_errors - frames whose checksum didn't match
+        malformed  - bad COBS, wrong length or unknown version
+        dropped    - frames missing according to the sequence numbers, not
+                     counting the corrupted ones above
+    """
+    def __init__(self, max_buffer=4096):
+        self.frame = SensorFrame()
+        self.max_buffer = max_buffer
+        self._buffer = bytearray()
+        self._synced = False
+        self._expected_seq = None
+        self._corrupt_in_gap = 0
+        self.frames = 0
+        self.crc_errors = 0
+        self.malformed = 0
+        self.dropped = 0
+
+    def reset(self):
+        self._buffer.clear()
+        self._synced = False
+        self._expected_seq = None
+        self._corrupt_in_gap = 0
+
+    def stats(self) -> dict:
+        return {
+            "frames": self.frames,
+            "crc_errors": self.crc_errors,
+            "malformed": self.malformed,
+            "dropped": self.dropped,
+        }
+
+    def feed(self, data):
+        buffer = self._buffer
+        buffer += data
+        while True:
+            end = buffer.find(0)
+            if end < 0:
+                break
+            packet = buffer[:end]
+            # Consumed before the frame is yielded, so a caller that raises
+            # while processing it doesn't see it again on the next feed().
+            del buffer[:end + 1]
+            if not self._synced:
+                # Bytes before the first delimiter are the tail of a frame
+                # that started before we opened the port.
+                self._synced = True
+                continue
+            if packet and self._decode_packet(packet):
+                yield self.frame
+        if len(buffer) > self.max_buffer:
+            # No delimiter for a long time: line noise or wrong baud rate.
+            self.malformed += 1
+            buffer.clear()
+            self._synced = False
+
+    def _decode_packet(self, packet) -> bool:
+        try:
+            record = cobs_decode(packet)
+        except ValueError:
+            self.malformed += 1
+            self._corrupt_in_gap += 1
+            return False
+        if len(record) != FRAME_SIZE or record[0] != FRAME_VERSION:
+            self.malformed += 1
+            self._corrupt_in_gap += 1
+            return False
+        body = record[:_BODY.size]
+        if _CRC.unpack_from(record, _BODY.size)[0] != crc_hqx(body, 0xFFFF):
+            self.crc_errors += 1
+            self._corrupt_in_gap += 1
+            return False
+
+        _, seq, fingers, acc_x, acc_y, acc_z, gyro_x, gyro_y, gyro_z = _BODY.unpack(body)
+        if self._expected_seq is not None and seq != self._expected_seq:
+            # Frames that arrived corrupted are already counted.
+            gap = (seq - self._expected_seq) & 0xFFFF
+            self.dropped += max(0, gap - self._corrupt_in_gap)
+        self._expected_seq = (seq + 1) & 0xFFFF
+        self._corrupt_in_gap = 0
+
+        values = self.frame.values
+        for bit, index in enumerate(_FINGER_INDICES):
+            values[index] = 1.0 if fingers & (1 << bit) else 0.0
+        values[_MOTION_START:_MOTION_STOP] = array('d', (acc_x, acc_y, acc_z, gyro_x, gyro_y, gyro_z))
+        self.frames += 1
+        return True
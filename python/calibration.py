@@ -0,0 +1,239 @@
+# calibration.py
+"""
+Per-glove calibration profiles computed from recorded sessions.
+
+The CC ranges in routing.SENSOR_RANGES are guesses (+/-2 for flex and
+acceleration, +/-500 for gyro); a real glove uses a fraction of them, so its
+CCs barely move. This tool streams text captures (.txt) and recordings
+(.mmrec) and writes a profile of the raw interval each CC sensor actually
+covers:
+
+    python calibration.py fingers.txt session.mmrec -o glove1_calibration.json
+                          [--percentiles 1 99] [--chunk-frames 65536]
+
+Frames are read CHUNK_FRAMES at a time into a NumPy block and binned into
+fixed per-sensor histograms (HISTOGRAM_BINS bins over +/-HISTOGRAM_SPAN * R),
+so memory stays the same whatever the session length. Bins also sum their
+values, and a percentile is the mean of the values in its bin (exact for the
+firmware's fixed-decimal readings). From the histograms come each sensor's
+percentiles and its resting value, the median over frames where
+the glove is still (every |gyro| below REST_GYRO). The profile's "ranges" map
+the low to the high percentile onto CC 0-127; accelerometer and gyro ranges are
+widened to be centered on the resting value, so a glove at rest sends CC 64.
+
+A SerialReceiver given the profile (calibration=...) compiles these ranges into
+its routing plan's scale and offset, so the per-frame cost is unchanged. A
+curve spec's own "range" (curves.py) still takes precedence. Profiles are
+loaded with calibration_profile.py, which doesn't need NumPy.
+"""
+import argparse
+import json
+import os
+
+from calibration_profile import PROFILE_VERSION
+from data_parser import FIELD_INDEX
+from lazy_imports import lazy_import
+from routing import CC_SENSORS, field_index, sensor_range
+
+# Loading a profile (calibration_profile.py) needs neither.
+np = lazy_import("numpy")
+offline_render = lazy_import("offline_render")  # capture readers
+
+CHUNK_FRAMES = 65536
+HISTOGRAM_BINS = 65536
+HISTOGRAM_SPAN = 4.0  # the histogram covers +/- HISTOGRAM_SPAN * R
+PERCENTILES = (1.0, 99.0)
+
+REST_GYRO = 10.0  # deg/s; a frame is at rest while every |gyro| is below this
+GYRO_FIELDS = ("GyroX", "GyroY", "GyroZ")
+CENTERED = ("Acc", "Gyr")  # sensor prefixes whose range is centered on rest
+
+# Ranges narrower than this fraction of the default +/-R are left out of the
+# profile: the sensor barely moved (or is an unused switch).
+MIN_SPAN = 0.01
+
+
+# -------------------------------
+# Reading sessions
+# -------------------------------
+def read_chunks(path, chunk_frames=CHUNK_FRAMES):
+    """
+    Yields the frames of a text capture or recording as (n, NUM_FIELDS)
+    blocks in SENSOR_FIELDS order, through offline_render's capture readers.
+    """
+    if path.endswith(".mmrec"):
+        chunks = offline_render.read_recording_chunks(path, chunk_frames)
+    else:
+        chunks = offline_render.read_text_chunks(path, chunk_frames=chunk_frames)
+    for _, values in chunks:
+        yield values
+
+
+# -------------------------------
+# Statistics
+# -------------------------------
+class SensorStats:
+    """
+    Streaming per-sensor statistics in fixed memory: exact min/max and
+    histograms (counts and value sums per bin) of all frames and of the
+    frames at rest.
+    """
+    def __init__(self, sensors=CC_SENSORS, bins=HISTOGRAM_BINS, span=HISTOGRAM_SPAN):
+        """
+        :param sensors: UI sensor names to calibrate.
+        :param bins: Histogram bins per sensor; sets the percentile resolution.
+        :param span: The histograms cover +/- span * the sensor's default range.
+        """
+        self.sensors = tuple(sensors)
+        self.bins = bins
+        self.columns = np.array([field_index(sensor) for sensor in self.sensors])
+        r = np.array([sensor_range(sensor) for sensor in self.sensors])
+        self.low = -span * r
+        self.width = 2 * span * r / bins
+        self.counts = np.zeros(len(self.sensors) * bins, dtype=np.int64)
+        self.sums = np.zeros(self.counts.size)
+        self.rest_counts = np.zeros_like(self.counts)
+        self.rest_sums = np.zeros_like(self.sums)
+        self.minimum = np.full(len(self.sensors), np.inf)
+        self.maximum = np.full(len(self.sensors), -np.inf)
+        self.frames = 0
+        self.rest_frames = 0
+        self._offsets = np.arange(len(self.sensors)) * bins
+        self._gyro = [FIELD_INDEX[name] for name in GYRO_FIELDS]
+
+    def add(self, block):
+        """
+        Adds a (n, NUM_FIELDS) block of frames.
+        """
+        if not len(block):
+            return
+        values = block[:, self.columns]
+        valid = np.isfinite(values)
+        np.fmin(self.minimum, np.where(valid, values, np.inf).min(axis=0), out=self.minimum)
+        np.fmax(self.maximum, np.where(valid, values, -np.inf).max(axis=0), out=self.maximum)
+        position = (np.where(valid, values, 0.0) - self.low) / self.width
+        index = np.clip(position, 0, self.bins - 1).astype(np.int64) + self._offsets
+        size = self.counts.size
+        self.counts += np.bincount(index[valid], minlength=size)
+        self.sums += np.bincount(index[valid], weights=values[valid], minlength=size)
+        with np.errstate(invalid="ignore"):
+            rest = (np.abs(block[:, self._gyro]) < REST_GYRO).all(axis=1)
+        if rest.any():
+            rest_valid = valid & rest[:, None]
+            self.rest_counts += np.bincount(index[rest_valid], minlength=size)
+            self.rest_sums += np.bincount(index[rest_valid], weights=values[rest_valid], minlength=size)
+        self.frames += len(block)
+        self.rest_frames += int(rest.sum())
+
+    def percentile(self, q, rest=False):
+        """
+        Per-sensor q-th percentile (0-100): the mean of the values in the bin
+        holding it. NaN for a sensor without values.
+        """
+        shape = (len(self.sensors), self.bins)
+        counts = (self.rest_counts if rest else self.counts).reshape(shape)
+        sums = (self.rest_sums if rest else self.sums).reshape(shape)
+        cumulative = counts.cumsum(axis=1)
+        total = cumulative[:, -1]
+        target = np.maximum(q / 100 * total, 1)  # the first value for q = 0
+        rows = np.arange(len(self.sensors))
+        i = (cumulative >= target[:, None]).argmax(axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            value = sums[rows, i] / counts[rows, i]
+        return np.where(total > 0, value, np.nan)
+
+    def profile(self, percentiles=PERCENTILES, sources=()) -> dict:
+        """
+        The calibration profile (see calibration_profile.load_profile) of the
+        frames added so far.
+        """
+        low_q, high_q = percentiles
+        low = self.percentile(low_q)
+        high = self.percentile(high_q)
+        median = self.percentile(50.0)
+        rest = self.percentile(50.0, rest=True)
+        rest = np.where(np.isnan(rest), median, rest)
+        ranges = {}
+        sensors = {}
+        for k, sensor in enumerate(self.sensors):
+            if np.isnan(median[k]):
+                continue
+            sensors[sensor] = {
+                "min": _round(self.minimum[k]), "max": _round(self.maximum[k]),
+                _percentile_key(low_q): _round(low[k]), "p50": _round(median[k]),
+                _percentile_key(high_q): _round(high[k]), "rest": _round(rest[k]),
+            }
+            lo, hi = float(low[k]), float(high[k])
+            if sensor.startswith(CENTERED):
+                half = max(rest[k] - lo, hi - rest[k])
+                lo, hi = float(rest[k] - half), float(rest[k] + half)
+            if hi - lo >= MIN_SPAN * 2 * sensor_range(sensor):
+                ranges[sensor] = [_round(lo), _round(hi)]
+        return {
+            "version": PROFILE_VERSION,
+            "sources": [os.path.basename(path) for path in sources],
+            "frames": self.frames,
+            "rest_frames": self.rest_frames,
+            "percentiles": [low_q, high_q],
+            "ranges": ranges,
+            "sensors": sensors,
+        }
+
+
+def _round(value) -> float:
+    return float(f"{float(value):.6g}")
+
+
+def _percentile_key(q) -> str:
+    return f"p{q:g}"
+
+
+def calibrate(paths, percentiles=PERCENTILES, chunk_frames=CHUNK_FRAMES) -> dict:
+    """
+    Streams the given captures/recordings and returns their calibration profile.
+    """
+    stats = SensorStats()
+    for path in paths:
+        for block in read_chunks(path, chunk_frames):
+            stats.add(block)
+    return stats.profile(percentiles, sources=paths)
+
+
+# -------------------------------
+# Profiles
+# -------------------------------
+def cc_span(low, high, r) -> float:
+    """
+    How many CC steps the interval [low, high] covers when +/-r maps onto 0-127.
+    """
+    return 127 * (high - low) / (2 * r)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Compute a glove calibration profile from recorded sessions.")
+    arg_parser.add_argument("sessions", nargs="+", help="text captures (.txt) or recordings (.mmrec)")
+    arg_parser.add_argument("-o", "--output", required=True, help="profile file to write (JSON)")
+    arg_parser.add_argument("--percentiles", type=float, nargs=2, default=list(PERCENTILES),
+                            metavar=("LOW", "HIGH"), help="percentiles mapped onto CC 0 and 127")
+    arg_parser.add_argument("--chunk-frames", type=int, default=CHUNK_FRAMES)
+    args = arg_parser.parse_args()
+    if not 0 <= args.percentiles[0] < args.percentiles[1] <= 100:
+        arg_parser.error("percentiles must satisfy 0 <= LOW < HIGH <= 100")
+
+    profile = calibrate(args.sessions, tuple(args.percentiles), args.chunk_frames)
+    with open(args.output, "w") as f:
+        json.dump(profile, f, indent=2)
+        f.write("\n")
+
+    print(f"{profile['frames']} frames ({profile['rest_frames']} at rest) -> {args.output}")
+    for sensor, stats in profile["sensors"].items():
+        r = sensor_range(sensor)
+        used = cc_span(stats[_percentile_key(args.percentiles[0])], stats[_percentile_key(args.percentiles[1])], r)
+        interval = profile["ranges"].get(sensor)
+        applied = f"[{interval[0]:g}, {interval[1]:g}]" if interval else "default (barely moves)"
+        print(f"  {sensor:5s} rest {stats['rest']:9.4g}  used {used:5.1f} of 127 CC steps at +/-{r:g}  "
+                 f"-> range {applied}")
+
+
+if __name__ == "__main__":
+    main()
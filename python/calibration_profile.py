@@ -0,0 +1,44 @@
+# calibration_profile.py
+"""
+Loading the calibration profiles written by calibration.py.
+
+Kept apart from calibration.py, which needs NumPy to compute a profile, so the
+GUI, the headless bridge and SerialReceiver can apply one without it.
+"""
+import json
+
+from routing import CC_SENSORS
+
+PROFILE_VERSION = 1
+
+
+def load_profile(path) -> dict:
+    """
+    Reads a calibration profile. Raises OSError or ValueError if it can't be
+    used. Only "ranges" ({sensor: [low, high]}) is applied; "sensors" holds
+    the statistics it was derived from.
+    """
+    with open(path, "r") as f:
+        profile = json.load(f)
+    if not isinstance(profile, dict) or profile.get("version") != PROFILE_VERSION:
+        raise ValueError(f"{path} is not a version {PROFILE_VERSION} calibration profile")
+    ranges = profile.get("ranges", {})
+    for sensor, interval in ranges.items():
+        if sensor not in CC_SENSORS:
+            raise ValueError(f"{path}: unknown CC sensor {sensor!r}")
+        try:
+            low, high = (float(value) for value in interval)
+        except (TypeError, ValueError):
+            raise ValueError(f"{path}: range of {sensor} must be [low, high]") from None
+        if not low < high:
+            raise ValueError(f"{path}: empty range [{low}, {high}] for {sensor}")
+    return profile
+
+
+def profile_ranges(profile) -> dict:
+    """
+    {sensor: (low, high)} of a loaded profile (empty for None).
+    """
+    if not profile:
+        return {}
+    return {sensor: (float(low), float(high)) for sensor, (low, high) in profile.get("ranges", {}).items()}
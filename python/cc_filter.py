@@ -0,0 +1,114 @@
+# cc_filter.py
+"""
+Change detection, hysteresis deadband and rate limiting for continuous
+controllers, so unchanged or noisy sensor values don't flood the MIDI link.
+"""
+
+
+class ControllerFilter:
+    """
+    Per-controller state deciding whether a mapped CC value is worth sending.
+
+    A value is sent only if
+      - it differs from the last value sent for that controller,
+      - the unrounded level moved at least `deadband` CC steps since the last
+        send (hysteresis: noise around a step boundary doesn't toggle between
+        adjacent values; the 0 and 127 end points are always reachable), and
+      - at least 1 / max_rate_hz seconds passed since the last send.
+    A value suppressed by the rate limit is compared again on the next frame,
+    so it goes out as soon as the interval has passed. A value held back by
+    the deadband settles: once the sensor has reported it for `settle_frames`
+    frames in a row it is sent anyway, so a controller that stops moving
+    doesn't rest on a stale value. flush() returns what is still held back
+    when frames stop.
+    """
+    def __init__(self, deadband=1.0, max_rate_hz=100.0, settle_frames=5):
+        """
+        :param deadband: Minimum movement in CC steps (0 disables hysteresis).
+        :param max_rate_hz: Maximum messages per second per controller (None disables).
+        :param settle_frames: Frames a value held back by the deadband must be
+                              reported in a row before it is sent (0 never sends it).
+        """
+        self.deadband = deadband
+        self.min_interval_ns = int(1e9 / max_rate_hz) if max_rate_hz else 0
+        self.settle_frames = settle_frames
+        self._last_value = {}
+        self._last_level = {}
+        self._last_sent_ns = {}
+        self._held = {}  # key -> (value, level, frames reported in a row), not sent yet
+        self.sent = 0
+        self.settled = 0
+        self.suppressed_unchanged = 0
+        self.suppressed_deadband = 0
+        self.suppressed_rate = 0
+
+    def allow(self, key, value, level, now_ns) -> bool:
+        """
+        :param key: Controller identity, e.g. (sensor, cc_number).
+        :param value: Mapped 0-127 value that would be sent.
+        :param level: Unrounded mapped value the deadband is applied to.
+        :param now_ns: Current time.perf_counter_ns().
+        """
+        last_value = self._last_value.get(key)
+        if last_value is not None:
+            if value == last_value:
+                if self._held:
+                    self._held.pop(key, None)
+                self.suppressed_unchanged += 1
+                return False
+            held = self._held.get(key)
+            frames = held[2] + 1 if held is not None and held[0] == value else 1
+            if (abs(level - self._last_level[key]) < self.deadband
+                    and value != 0 and value != 127):
+                if not self.settle_frames or frames < self.settle_frames:
+                    self._held[key] = (value, level, frames)
+                    self.suppressed_deadband += 1
+                    return False
+                self.settled += 1
+            if now_ns - self._last_sent_ns[key] < self.min_interval_ns:
+                self._held[key] = (value, level, frames)
+                self.suppressed_rate += 1
+                return False
+            if held is not None:
+                del self._held[key]
+        self._last_value[key] = value
+        self._last_level[key] = level
+        self._last_sent_ns[key] = now_ns
+        self.sent += 1
+        return True
+
+    def flush(self, now_ns) -> list:
+        """
+        Marks the values still held back (by the deadband or the rate limit)
+        as sent and returns them as [(key, value)] in key order, for a final
+        send when frames stop.
+        """
+        pending = []
+        for key, (value, level, _) in sorted(self._held.items()):
+            self._last_value[key] = value
+            self._last_level[key] = level
+            self._last_sent_ns[key] = now_ns
+            pending.append((key, value))
+        self.sent += len(pending)
+        self._held.clear()
+        return pending
+
+    def reset(self):
+        self._last_value.clear()
+        self._last_level.clear()
+        self._last_sent_ns.clear()
+        self._held.clear()
+
+    @property
+    def suppressed(self) -> int:
+        return self.suppressed_unchanged + self.suppressed_deadband + self.suppressed_rate
+
+    def stats(self) -> dict:
+        return {
+            "sent": self.sent,
+            "settled": self.settled,
+            "suppressed": self.suppressed,
+            "unchanged": self.suppressed_unchanged,
+            "deadband": self.suppressed_deadband,
+            "rate": self.suppressed_rate,
+        }
@@ -0,0 +1,290 @@
+# clock.py
+"""
+MIDI clock and quantized note scheduling.
+
+ClockEngine runs one thread on time.perf_counter_ns(). Tick k is due at
+    anchor_ns + (k - anchor_tick) * tick_ns
+an absolute schedule, so sleep overshoot never accumulates into tempo drift;
+tempo changes move the anchor to the next tick. The thread sleeps until
+`lookahead` before the next due time (waking early for new events), then
+sleeps precisely until the due time itself, and sends 24-PPQN MIDI clock (plus Start/Stop) directly to the
+port, bypassing the MidiDispatcher queue.
+
+Quantization: note-ons sent through the engine (SerialReceiver(clock=...))
+are held until the next grid point, unless the previous grid point was less
+than `tolerance` seconds ago, in which case they go out at once. A note-off
+for a note whose note-on is still held is scheduled right after it, so short
+taps still sound.
+
+Jitter (send time - due time) of clock ticks and quantized notes, and the
+deviation of tick intervals from nominal, are collected for stats().
+"""
+import heapq
+import itertools
+import math
+import sys
+import threading
+import time
+
+from latency import LatencyHistogram
+from log_writer import LOG
+
+PPQN = 24
+
+# Grid name -> ticks at 24 PPQN
+QUANTIZE_GRIDS = {"off": 0, "1/4": 24, "1/8": 12, "1/8T": 8, "1/16": 6, "1/16T": 4, "1/32": 3}
+
+_NOTE_ON = 0
+_NOTE_OFF = 1
+
+
+class ClockEngine:
+    def __init__(self, midi_handler, bpm=120.0, quantize=0, tolerance=0.03, lookahead=0.002,
+                 send_clock=True, switch_interval=None):
+        """
+        :param midi_handler: MidiHandler the clock and notes are sent to.
+        :param bpm: Tempo in quarter notes per minute.
+        :param quantize: Note-on grid in ticks (see QUANTIZE_GRIDS); 0 sends notes at once.
+        :param tolerance: Seconds after a grid point within which a note-on still
+                          counts as on that grid point and is sent at once.
+        :param lookahead: Seconds before a due time at which the thread stops
+                          sleeping and spins (sleep overshoot margin).
+        :param send_clock: Send MIDI clock/Start/Stop; False keeps only the grid.
+        :param switch_interval: If set, sys.setswitchinterval() while the clock runs.
+                                Another thread holding the GIL can delay a tick by up
+                                to this long (Python's default is 5 ms).
+        """
+        self.midi_handler = midi_handler
+        self.quantize = quantize
+        self.tolerance_ns = int(tolerance * 1e9)
+        self.lookahead_ns = int(lookahead * 1e9)
+        self.send_clock = send_clock
+        self.bpm = bpm
+        self._timing = (0, 0, self._tick_ns(bpm))   # (anchor_ns, anchor_tick, tick_ns)
+        self._tick = 0                              # next tick to send
+        self._events = []                           # heap of (due_ns, seq, kind, note, velocity)
+        self._pending_on = {}                       # note -> due_ns of a held note-on
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._running = False
+        self.switch_interval = switch_interval
+        self._saved_switch_interval = None
+        self.thread = None
+
+        self.tick_jitter = LatencyHistogram()
+        self.note_jitter = LatencyHistogram()
+        self.resyncs = 0
+        self._last_tick_ns = None
+        self._interval_count = 0
+        self._interval_sum = 0.0
+        self._interval_sum_sq = 0.0
+        self._interval_max = 0
+
+    @staticmethod
+    def _tick_ns(bpm):
+        return int(60e9 / (bpm * PPQN))
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    def _tick_time(self, tick):
+        anchor_ns, anchor_tick, tick_ns = self._timing
+        return anchor_ns + (tick - anchor_tick) * tick_ns
+
+    # -------------------------------
+    # Transport
+    # -------------------------------
+    def start(self):
+        """
+        Starts the clock at tick 0 (sends MIDI Start, then clock from the first tick).
+        """
+        if self._running:
+            return
+        if self.send_clock:
+            self.midi_handler.send_midi_realtime("start")
+        if self.switch_interval is not None:
+            self._saved_switch_interval = sys.getswitchinterval()
+            sys.setswitchinterval(self.switch_interval)
+        # The first clock after Start is beat 1.
+        self._timing = (time.perf_counter_ns() + self.lookahead_ns, 0, self._tick_ns(self.bpm))
+        self._tick = 0
+        self._last_tick_ns = None
+        self._running = True
+        self.thread = threading.Thread(target=self._run, name="ClockEngine", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """
+        Sends MIDI Stop and flushes held notes immediately.
+        """
+        if not self._running:
+            return
+        self._running = False
+        self._wake.set()
+        self.thread.join(timeout=1)
+        self.thread = None
+        if self._saved_switch_interval is not None:
+            sys.setswitchinterval(self._saved_switch_interval)
+            self._saved_switch_interval = None
+        if self.send_clock:
+            self.midi_handler.send_midi_realtime("stop")
+        with self._lock:
+            events, self._events = sorted(self._events), []
+        for event in events:
+            self._send_event(event)
+
+    def set_bpm(self, bpm):
+        """
+        Changes the tempo from the next tick on, without a jump in the tick count.
+        """
+        self.bpm = bpm
+        if not self._running:
+            return
+        with self._lock:
+            next_tick = self._tick
+            self._timing = (self._tick_time(next_tick), next_tick, self._tick_ns(bpm))
+        self._wake.set()
+
+    def set_quantize(self, ticks):
+        self.quantize = ticks
+
+    # -------------------------------
+    # Note output (same interface as MidiHandler)
+    # -------------------------------
+    def send_midi_note_on(self, note, velocity=None):
+        grid = self.quantize
+        if not grid or not self._running:
+            self.midi_handler.send_midi_note_on(note, velocity)
+            return
+        now = time.perf_counter_ns()
+        anchor_ns, anchor_tick, tick_ns = self._timing
+        grid_ns = grid * tick_ns
+        # Grid points are the ticks divisible by the grid, whatever tick the
+        # anchor was moved to.
+        since = (now - anchor_ns + (anchor_tick % grid) * tick_ns) % grid_ns
+        if since <= self.tolerance_ns:
+            self.midi_handler.send_midi_note_on(note, velocity)
+            return
+        due = now - since + grid_ns
+        with self._lock:
+            self._pending_on[note] = due
+            heapq.heappush(self._events, (due, next(self._seq), _NOTE_ON, note, velocity))
+        self._wake.set()
+
+    def send_midi_note_off(self, note):
+        with self._lock:
+            due = self._pending_on.get(note)
+            if due is not None:
+                heapq.heappush(self._events, (due, next(self._seq), _NOTE_OFF, note, None))
+                return
+        self.midi_handler.send_midi_note_off(note)
+
+    def send_midi_control_change(self, controller, value):
+        self.midi_handler.send_midi_control_change(controller, value)
+
+    # -------------------------------
+    # Clock thread
+    # -------------------------------
+    def _send_event(self, event):
+        due, _, kind, note, velocity = event
+        if kind == _NOTE_ON:
+            self.midi_handler.send_midi_note_on(note, velocity)
+            # Only now may a note-off bypass the queue.
+            with self._lock:
+                if self._pending_on.get(note) == due:
+                    del self._pending_on[note]
+        else:
+            self.midi_handler.send_midi_note_off(note)
+
+    def _run(self):
+        perf = time.perf_counter_ns
+        while self._running:
+            due = self._tick_time(self._tick) if self.send_clock else math.inf
+            with self._lock:
+                if self._events and self._events[0][0] < due:
+                    due = self._events[0][0]
+            if due == math.inf:
+                self._wake.wait(0.1)
+                self._wake.clear()
+                continue
+            wait_ns = due - perf() - self.lookahead_ns
+            if wait_ns > 0:
+                # New events or a tempo change wake us up to re-plan.
+                self._wake.wait(wait_ns / 1e9)
+                self._wake.clear()
+                continue
+            remaining = due - perf()
+            if remaining > 0:
+                time.sleep(remaining / 1e9)
+            now = perf()
+            if self.send_clock:
+                tick_due = self._tick_time(self._tick)
+                if tick_due <= now:
+                    self.midi_handler.send_midi_realtime("clock")
+                    sent = perf()
+                    self._record_tick(tick_due, sent)
+                    self._tick += 1
+                    if sent - self._tick_time(self._tick) > self._timing[2]:
+                        self._resync(sent)
+            while True:
+                with self._lock:
+                    if not self._events or self._events[0][0] > now:
+                        break
+                    event = heapq.heappop(self._events)
+                self._send_event(event)
+                self.note_jitter.add(perf() - event[0])
+
+    def _resync(self, now):
+        """
+        More than a tick behind (e.g. the machine stalled): continue from now
+        instead of sending a burst of late clocks.
+        """
+        with self._lock:
+            self._timing = (now + self.lookahead_ns, self._tick, self._timing[2])
+        self.resyncs += 1
+        self._last_tick_ns = None
+        LOG.error(f"[Clock] Fell behind; resynchronized at tick {self._tick}")
+
+    def _record_tick(self, due, sent):
+        self.tick_jitter.add(sent - due)
+        if self._last_tick_ns is not None:
+            deviation = (sent - self._last_tick_ns) - self._timing[2]
+            self._interval_count += 1
+            self._interval_sum += deviation
+            self._interval_sum_sq += deviation * deviation
+            if abs(deviation) > self._interval_max:
+                self._interval_max = abs(deviation)
+        self._last_tick_ns = sent
+
+    def reset_stats(self):
+        self.tick_jitter.reset()
+        self.note_jitter.reset()
+        self._interval_count = 0
+        self._interval_sum = 0.0
+        self._interval_sum_sq = 0.0
+        self._interval_max = 0
+
+    def stats(self) -> dict:
+        """
+        Tick and note lateness (p50/p99/max), tick interval deviation from
+        nominal (rms, max) in microseconds, and the number of resyncs.
+        """
+        n = self._interval_count
+        rms = math.sqrt(self._interval_sum_sq / n) if n else 0.0
+        return {
+            "bpm": self.bpm,
+            "ticks": self._tick,
+            "tick_late": self.tick_jitter.as_dict(),
+            "note_late": self.note_jitter.as_dict(),
+            "interval_rms_us": rms / 1000,
+            "interval_max_us": self._interval_max / 1000,
+            "resyncs": self.resyncs,
+        }
+
+    def summary(self) -> str:
+        s = self.stats()
+        tick = s["tick_late"]
+        return (f"{s['bpm']:g} BPM, tick late p50 {tick['p50_us']:.0f} / p99 {tick['p99_us']:.0f} / "
+                f"max {tick['max_us']:.0f} us, interval jitter rms {s['interval_rms_us']:.0f} us")
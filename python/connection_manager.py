@@ -0,0 +1,143 @@
+# connection_manager.py
+"""
+Background connection handling: ports are opened off the Tk thread, unplugged
+devices are detected, and they are reopened with exponential backoff without
+restarting the app or touching the routing config.
+
+Serial ports are reconnected by the ReceiverHub's SerialSource (async_core.py)
+using Backoff. The MIDI output is managed by ConnectionManager, which owns a
+MidiHandler's port: it opens it in a background thread, watches for the port
+disappearing and reopens it when it comes back.
+"""
+import os
+import threading
+import time
+
+from log_writer import LOG
+from midi_handler import RAW_PREFIX
+
+
+class Backoff:
+    """
+    Exponential reconnect delay: initial, initial * factor, ... up to maximum.
+    """
+    def __init__(self, initial=0.5, maximum=10.0, factor=2.0):
+        self.initial = initial
+        self.maximum = maximum
+        self.factor = factor
+        self._next = initial
+
+    def next(self) -> float:
+        delay = self._next
+        self._next = min(self.maximum, self._next * self.factor)
+        return delay
+
+    def reset(self):
+        self._next = self.initial
+
+
+class ConnectionManager:
+    """
+    Keeps a MidiHandler connected to its output port.
+
+        manager = ConnectionManager(midi_handler, on_status=print)
+        manager.start()     # returns immediately
+        ...
+        manager.stop()
+    """
+    def __init__(self, midi_handler, port_name=None, on_status=None, poll_interval=1.0, backoff=None):
+        """
+        :param midi_handler: MidiHandler created with open_port=False.
+        :param port_name: Output port to open; defaults to midi_handler.port_name.
+                          A port whose name starts with it also matches (backends
+                          often append a client/port number).
+        :param on_status: Callback(text) for status changes (may run on any thread).
+        :param poll_interval: Seconds between checks that the port is still present.
+        """
+        self.midi_handler = midi_handler
+        self.port_name = port_name or midi_handler.port_name
+        self.on_status = on_status
+        self.poll_interval = poll_interval
+        self.backoff = backoff or Backoff()
+        self.started_ns = None
+        self.connected_after_ms = None
+        self._running = False
+        self._wake = threading.Event()
+        self.thread = None
+
+    def report(self, text):
+        LOG.info(f"[MIDI] {text}")
+        if self.on_status is not None:
+            self.on_status(text)
+
+    def start(self):
+        if self.thread is not None:
+            return
+        self._running = True
+        self.started_ns = time.perf_counter_ns()
+        self.midi_handler.on_send_error = self._wake.set
+        self.thread = threading.Thread(target=self._run, name="ConnectionManager", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self._running = False
+        self._wake.set()
+        if self.thread is not None:
+            self.thread.join(timeout=2)
+            self.thread = None
+
+    @property
+    def connected(self) -> bool:
+        return self.midi_handler.midi_out is not None
+
+    def _find_port(self):
+        if self.port_name.startswith(RAW_PREFIX):
+            # Raw device nodes aren't listed by mido; present while the node exists.
+            present = os.path.exists(self.port_name[len(RAW_PREFIX):])
+            return (self.port_name, [self.port_name]) if present else (None, [])
+        import mido
+        names = mido.get_output_names()
+        for name in names:
+            if name == self.port_name:
+                return name, names
+        for name in names:
+            if name.startswith(self.port_name):
+                return name, names
+        return None, names
+
+    def _run(self):
+        self.report(f"Connecting to {self.port_name}...")
+        while self._running:
+            if not self.connected:
+                self._try_connect()
+            else:
+                self._check_connected()
+            wait = self.poll_interval if self.connected else self.backoff.next()
+            self._wake.wait(wait)
+            self._wake.clear()
+
+    def _try_connect(self):
+        try:
+            name, names = self._find_port()
+            if name is None:
+                self.report(f"Waiting for {self.port_name} (available: {', '.join(names) or 'none'})")
+                return
+            self.midi_handler.open(name)
+        except Exception as e:
+            self.report(f"Error opening {self.port_name}: {e}")
+            return
+        self.backoff.reset()
+        elapsed_ms = (time.perf_counter_ns() - self.started_ns) / 1e6
+        if self.connected_after_ms is None:
+            self.connected_after_ms = elapsed_ms
+        self.report(f"Connected to {name} ({elapsed_ms:.0f} ms after start)")
+
+    def _check_connected(self):
+        try:
+            name, _ = self._find_port()
+        except Exception as e:
+            name = None
+            LOG.error(f"[MIDI] Error listing ports: {e}")
+        if name is None or self.midi_handler.send_errors_since_open:
+            self.midi_handler.close_port()
+            self.report(f"Lost {self.port_name}; reconnecting")
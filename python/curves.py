@@ -0,0 +1,121 @@
+# curves.py
+"""
+Response curves for sensor-to-CC mapping, compiled into lookup tables.
+
+A curve spec (per sensor, from the GUI or a config file) looks like
+    {"curve": "exp", "amount": 3.0, "range": [-1.0, 1.0]}
+    {"curve": "custom", "points": [[0, 0], [0.3, 0.6], [1, 1]]}
+`range` is the raw sensor interval mapped onto CC 0-127 (defaults to the
+sensor's +/-R, see routing.SENSOR_RANGES); `amount` sets how strongly exp,
+log and s bend; custom `points` are (x, y) pairs in 0-1, interpolated
+linearly.
+
+curve_table() evaluates a curve once at LUT_SIZE evenly spaced inputs and
+returns the CC levels as an array('d'); compile_plan() stores it in the
+routing plan, so the per-frame cost is one index computation and one table
+read whatever the curve. Tables are cached by spec.
+"""
+import math
+from array import array
+from functools import lru_cache
+
+LUT_SIZE = 1024
+LUT_LAST = LUT_SIZE - 1
+
+DEFAULT_AMOUNTS = {"exp": 3.0, "log": 3.0, "s": 6.0}
+
+
+def _exp(x, k):
+    return math.expm1(k * x) / math.expm1(k)
+
+
+def _log(x, k):
+    return math.log1p(math.expm1(k) * x) / k
+
+
+def _s(x, k):
+    # Logistic around the middle, stretched so 0 -> 0 and 1 -> 1.
+    low = 1 / (1 + math.exp(k / 2))
+    return (1 / (1 + math.exp(-k * (x - 0.5))) - low) / (1 - 2 * low)
+
+
+CURVES = {
+    "linear": None,
+    "exp": _exp,
+    "log": _log,
+    "s": _s,
+    "custom": None,
+}
+CURVE_NAMES = tuple(CURVES)
+
+
+def _interpolate(points, x):
+    if x <= points[0][0]:
+        return points[0][1]
+    for (x0, y0), (x1, y1) in zip(points, points[1:]):
+        if x <= x1:
+            return y0 + (y1 - y0) * (x - x0) / (x1 - x0) if x1 > x0 else y1
+    return points[-1][1]
+
+
+@lru_cache(maxsize=64)
+def _table(curve, amount, points) -> array:
+    table = array("d", bytes(8 * LUT_SIZE))
+    function = CURVES[curve]
+    for i in range(LUT_SIZE):
+        x = i / LUT_LAST
+        if curve == "custom":
+            y = _interpolate(points, x)
+        elif function is None:
+            y = x
+        else:
+            y = function(x, amount)
+        table[i] = 127.0 * min(1.0, max(0.0, y))
+    return table
+
+
+def _spec(spec) -> dict:
+    if spec is None:
+        return {}
+    if not isinstance(spec, dict):
+        raise ValueError(f"curve spec must be an object, got {spec!r}")
+    return spec
+
+
+def curve_name(spec) -> str:
+    """
+    The curve of a spec. Raises ValueError if the spec is not a dict.
+    """
+    return _spec(spec).get("curve", "linear")
+
+
+def curve_range(spec, default):
+    """
+    The raw (low, high) interval of a spec, or `default`. Raises ValueError
+    for an empty interval or a spec that is not a dict.
+    """
+    low, high = _spec(spec).get("range", default)
+    low, high = float(low), float(high)
+    if high == low:
+        raise ValueError(f"empty sensor range [{low}, {high}]")
+    return low, high
+
+
+def curve_table(spec) -> array:
+    """
+    The LUT_SIZE-entry table of CC levels (0-127) for a curve spec. Tables
+    are shared between identical specs and must not be modified. Raises
+    ValueError for an invalid spec.
+    """
+    curve = curve_name(spec)
+    if curve not in CURVES:
+        raise ValueError(f"unknown curve {curve!r}; expected one of {CURVE_NAMES}")
+    amount = float(spec.get("amount", DEFAULT_AMOUNTS.get(curve, 0.0)))
+    if curve in DEFAULT_AMOUNTS and amount <= 0:
+        raise ValueError(f"{curve} curve needs a positive amount, got {amount}")
+    points = None
+    if curve == "custom":
+        points = tuple(sorted((float(x), float(y)) for x, y in spec.get("points", ())))
+        if len(points) < 2:
+            raise ValueError("custom curve needs at least two points")
+    return _table(curve, amount, points)
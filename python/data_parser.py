@@ -1,4 +1,20 @@
 # data_parser.py
+import re
+from array import array
+
+# Canonical sensor layout of a SensorFrame. The glove firmware currently sends
+# "F1..F4 | AccX..GyroZ"; P1..P4 are kept for the older "F1:0,P1:1,..." format.
+SENSOR_FIELDS = (
+    "F1", "F2", "F3", "F4",
+    "P1", "P2", "P3", "P4",
+    "AccX", "AccY", "AccZ",
+    "GyroX", "GyroY", "GyroZ",
+)
+FIELD_INDEX = {name: i for i, name in enumerate(SENSOR_FIELDS)}
+NUM_FIELDS = len(SENSOR_FIELDS)
+
+# ON/OFF switch values as sent by the firmware for the finger sensors.
+FLAG_VALUES = {"ON": 1.0, "OFF": 0.0, "on": 1.0, "off": 0.0}
 
 class SensorData:
     """
@@ -13,29 +29,6 @@ class SensorData:
             # Convert spaces or punctuation if needed, but typically F1, P1, etc. are fine
             setattr(self, key, value)
 
-def parse_line_to_dict(line: str) -> dict:
-    """
-    Parses a line like:
-        "F1:0,P1:1,AccX:0.4,GyrZ:-0.2"
-    into a dictionary:
-        {"F1": 0, "P1": 1, "AccX": 0.4, "GyrZ": -0.2}
-    """
-    print(line)
-    
-    with open('percussion.txt', 'a') as file:
-        file.write(line + '\n')
-    data_dict = {}
-    # Split by commas
-    parts = line.split(',')
-    for part in parts:
-        kv = part.split(':')
-        if len(kv) == 2:
-            key = kv[0].strip()
-            val_str = kv[1].strip()
-            # Attempt type conversion
-            data_dict[key] = try_convert(val_str)
-    return data_dict
-
 def try_convert(value_str: str):
     """
     Converts a string to int or float if possible, otherwise returns the original string.
@@ -115,3 +108,210 @@ def parse_line_to_dict(line):
             data_dict[sensor] = 0
 
     return data_dict
+
+
+# -------------------------------
+# Compiled frame parser
+# -------------------------------
+class SensorFrame:
+    """
+    A fixed-layout sensor frame backed by a preallocated array('d').
+    Values are indexed by SENSOR_FIELDS; fields missing from a line read as 0.0.
+    Supports .get() so it can be used wherever a parsed dict was used before.
+    """
+    __slots__ = ("values",)
+
+    def __init__(self, values=None):
+        self.values = array('d', bytes(8 * NUM_FIELDS))
+        if values is not None:
+            self.values[:] = array('d', values)
+
+    def get(self, key, default=None):
+        index = FIELD_INDEX.get(key)
+        if index is None:
+            return default
+        return self.values[index]
+
+    def __getitem__(self, key):
+        return self.values[FIELD_INDEX[key]]
+
+    def copy(self):
+        frame = SensorFrame()
+        frame.values[:] = self.values
+        return frame
+
+    def copy_from(self, other):
+        self.values[:] = other.values
+
+    def clear(self):
+        values = self.values
+        for i in range(NUM_FIELDS):
+            values[i] = 0.0
+
+    def to_dict(self):
+        return dict(zip(SENSOR_FIELDS, self.values))
+
+    @classmethod
+    def from_dict(cls, data_dict):
+        frame = cls()
+        for key, value in data_dict.items():
+            index = FIELD_INDEX.get(key)
+            if index is not None:
+                frame.values[index] = value
+        return frame
+
+    def __repr__(self):
+        fields = ", ".join(f"{k}:{v:g}" for k, v in zip(SENSOR_FIELDS, self.values))
+        return f"SensorFrame({fields})"
+
+
+class FrameSnapshot:
+    """
+    Latest frame of one receiver, for readers on other threads (the monitor UI).
+    Double-buffered: the receiver fills the back buffer and flips an index, so
+    publishing is one slice copy and never takes a lock. `notes` is a reference
+    to the receiver's current_notes dict, not a copy.
+    """
+    __slots__ = ("_buffers", "_front", "seq", "notes")
+
+    def __init__(self, notes=None):
+        self._buffers = (array('d', bytes(8 * NUM_FIELDS)), array('d', bytes(8 * NUM_FIELDS)))
+        self._front = 0
+        self.seq = 0
+        self.notes = notes if notes is not None else {}
+
+    def publish(self, values):
+        back = 1 - self._front
+        self._buffers[back][:] = values
+        self._front = back
+        self.seq += 1
+
+    def read(self, out) -> int:
+        """
+        Copies the latest frame into `out` (an array('d')) and returns its
+        sequence number, 0 if nothing was published yet. Retries if a publish
+        raced the copy.
+        """
+        for _ in range(3):
+            seq = self.seq
+            out[:] = self._buffers[self._front]
+            if seq == self.seq:
+                break
+        return seq
+
+    def active_notes(self):
+        # notes is the receiver's live dict; list() copies it in one step.
+        return sorted(note for note in list(self.notes.values()) if note is not None)
+
+
+def _flag_to_float(val_str):
+    value = FLAG_VALUES.get(val_str)
+    if value is None:
+        value = float(val_str)
+    return value
+
+
+# One "Key:Value" chunk of a glove line
+_CHUNK_RE = re.compile(r"([A-Za-z][A-Za-z0-9]*)\s*:\s*([^,|\s]+)")
+_VALUE_GROUP = r"([^,|\s]+)"
+
+
+class FrameParser:
+    """
+    Schema-driven parser for glove lines.
+
+    The first well-formed line is used to learn the field layout
+    (e.g. "F1..F4 | AccX..GyroZ") including its exact separators. The layout is
+    compiled into a single regular expression plus a generated decode function
+    that writes every captured value straight into its slot of a preallocated
+    SensorFrame. Lines that don't match the learned layout fall back to
+    parse_line_to_dict and are returned as a plain dict.
+
+    The returned frame is reused by the next call; use frame.copy() to keep it.
+    """
+    def __init__(self):
+        self.frame = SensorFrame()
+        self.fields = None          # learned field names, in line order
+        self._match = None          # compiled fullmatch of the learned layout
+        self._decode = None         # generated decode(values, groups)
+        self.fast_count = 0
+        self.fallback_count = 0
+
+    def learn(self, line: str) -> bool:
+        """
+        Learns the field layout from a well-formed line. Returns True on success.
+        """
+        pattern = []
+        fields = []
+        statements = []
+        pos = 0
+        for chunk in _CHUNK_RE.finditer(line):
+            separator = line[pos:chunk.start()]
+            # Only commas, one "|" and whitespace are allowed between chunks.
+            if separator.strip(" \t,|") or separator.count("|") > 1:
+                return False
+            in_flag_part = "|" not in line[:chunk.start()]
+            sensor, val = chunk.group(1), chunk.group(2)
+            if sensor not in FIELD_INDEX or sensor in fields:
+                return False
+            if in_flag_part and val in FLAG_VALUES:
+                converter = "flags[{}]"
+            elif in_flag_part:
+                converter = "flag_to_float({})"
+            else:
+                converter = "float({})"
+            try:
+                _flag_to_float(val) if in_flag_part else float(val)
+            except ValueError:
+                return False
+            group = f"g{len(fields)}"
+            statements.append(f"    values[{FIELD_INDEX[sensor]}] = {converter.format(group)}")
+            pattern.append(re.escape(separator))
+            pattern.append(re.escape(line[chunk.start():chunk.start(2)]))
+            pattern.append(_VALUE_GROUP)
+            fields.append(sensor)
+            pos = chunk.end()
+        if not fields or line[pos:].strip():
+            return False
+        if self.fields is not None and len(fields) < len(self.fields):
+            # Don't trade a complete layout for a truncated line.
+            return False
+        pattern.append(re.escape(line[pos:]))
+
+        # Generate a straight-line decoder for this layout, e.g.
+        #   def decode(values, groups):
+        #       g0, g1, ... = groups
+        #       values[0] = flags[g0]
+        #       values[8] = float(g4)
+        groups = ", ".join(f"g{i}" for i in range(len(fields)))
+        source = (
+            "def decode(values, groups):\n"
+            f"    {groups}, = groups\n" + "\n".join(statements) + "\n"
+        )
+        namespace = {"flags": FLAG_VALUES, "flag_to_float": _flag_to_float}
+        exec(source, namespace)
+
+        self.fields = tuple(fields)
+        self._match = re.compile("".join(pattern)).fullmatch
+        self._decode = namespace["decode"]
+        return True
+
+    def parse(self, line: str, out=None):
+        """
+        Parses a line into `out` (or the parser's own frame) and returns it.
+        Returns a dict from parse_line_to_dict if the line doesn't fit the layout.
+        """
+        match = self._match(line) if self._match is not None else None
+        if match is None and self.learn(line):
+            match = self._match(line)
+        if match is not None:
+            frame = self.frame if out is None else out
+            try:
+                self._decode(frame.values, match.groups())
+            except (KeyError, ValueError):
+                pass
+            else:
+                self.fast_count += 1
+                return frame
+        self.fallback_count += 1
+        return parse_line_to_dict(line)
@@ -0,0 +1,189 @@
+# frame_ring.py
+"""
+Shared-memory frame ring and the per-glove worker process that fills it.
+
+In worker mode a glove's read/parse stage runs in its own process
+(glove_worker), so parsing doesn't compete with the Tk main loop for the GIL.
+It costs a process hop per frame (a pipe wake-up and a copy out of the ring),
+so it only pays off with a CPU core to spare for the worker and a main
+process busy enough to delay reads. On a single core it is slower on every
+measure (benchmarks/bench_worker.py, 1 CPU: p50 0.3-0.4 ms vs 0.1-0.16 ms,
+p99 ~10 ms vs 0.3-0.9 ms), which is why it is off by default. Check with
+bench_worker.py on the target machine before enabling it. The worker writes every decoded frame
+into a FrameRing in multiprocessing.shared_memory; the main process
+(async_core.WorkerSource) copies frames out of it straight into a reused
+SensorFrame and runs the MIDI stage. Frames are never pickled.
+
+Ring layout (all 8-byte words):
+    header  write_seq, capacity, slot_words
+    slot    seq, start_ns, NUM_FIELDS doubles     (capacity slots)
+
+Single producer, single consumer. The writer fills a slot and then stores its
+seq and the header's write_seq; the reader copies a slot and re-checks the
+slot's seq, so a slot overwritten during the copy is detected and skipped.
+A reader that falls more than `capacity` frames behind skips ahead and counts
+the lost frames in `dropped`.
+
+The worker reports over a one-way Pipe: an empty message after each batch of
+frames (a wake-up for the consumer), b"S<text>" for status and b"D<text>" when
+the port is lost.
+"""
+import time
+from multiprocessing import shared_memory
+
+from connection_manager import Backoff
+from data_parser import NUM_FIELDS, FrameParser, SensorFrame
+
+HEADER_WORDS = 3
+SLOT_WORDS = 2 + NUM_FIELDS
+RING_CAPACITY = 1024
+OPEN_SETTLE_TIME = 2.0  # boards reset when the port opens
+
+MSG_WAKE = b""
+MSG_STATUS = b"S"
+MSG_DISCONNECTED = b"D"
+
+
+class FrameRing:
+    def __init__(self, name=None, capacity=RING_CAPACITY):
+        """
+        :param name: Attach to an existing ring (worker side); None creates one.
+        :param capacity: Number of frame slots (when creating).
+        """
+        if name is None:
+            size = 8 * (HEADER_WORDS + capacity * SLOT_WORDS)
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+            self.owner = True
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            self.owner = False
+        self._words = self.shm.buf.cast('q')
+        self._doubles = self.shm.buf.cast('d')
+        if self.owner:
+            self._words[0] = 0
+            self._words[1] = capacity
+            self._words[2] = SLOT_WORDS
+        self.capacity = self._words[1]
+        self._seq = self._words[0]   # next seq to write (writer) or read (reader)
+        self.dropped = 0
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def write(self, values, start_ns):
+        """
+        Stores one frame (SensorFrame.values) and its read timestamp.
+        """
+        seq = self._seq
+        base = HEADER_WORDS + (seq % self.capacity) * SLOT_WORDS
+        words = self._words
+        words[base] = -1  # in progress
+        self._doubles[base + 2:base + 2 + NUM_FIELDS] = values
+        words[base + 1] = start_ns
+        words[base] = seq
+        self._seq = seq + 1
+        words[0] = seq + 1
+
+    def read(self, out):
+        """
+        Copies the next frame into `out` (a memoryview of SensorFrame.values).
+        Returns the frame's start_ns, or None when the ring is empty.
+        """
+        words = self._words
+        while True:
+            seq = self._seq
+            head = words[0]
+            if seq >= head:
+                return None
+            if head - seq > self.capacity:
+                self.dropped += head - self.capacity - seq
+                seq = head - self.capacity
+            base = HEADER_WORDS + (seq % self.capacity) * SLOT_WORDS
+            out[:] = self._doubles[base + 2:base + 2 + NUM_FIELDS]
+            start_ns = words[base + 1]
+            self._seq = seq + 1
+            if words[base] == seq:
+                return start_ns
+            self.dropped += 1  # overwritten while copying
+
+    def pending(self) -> int:
+        return self._words[0] - self._seq
+
+    def close(self):
+        self._words.release()
+        self._doubles.release()
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def glove_worker(ring_name, port, baud_rate, protocol, conn, stop):
+    """
+    Worker process body: keeps `port` open (reconnecting with backoff), parses
+    everything it receives and writes the frames into the ring.
+    """
+    import serial
+    from binary_protocol import BinaryFrameDecoder
+    from routing import frame_from_dict
+
+    ring = FrameRing(name=ring_name)
+    parser = FrameParser()
+    decoder = BinaryFrameDecoder() if protocol == "binary" else None
+    backoff = Backoff()
+    try:
+        while not stop.is_set():
+            try:
+                ser = serial.Serial(port, baud_rate, timeout=0.05)
+            except Exception as e:
+                delay = backoff.next()
+                conn.send_bytes(MSG_STATUS + f"Waiting for {port} ({e}); retry in {delay:.1f} s".encode())
+                stop.wait(delay)
+                continue
+            backoff.reset()
+            try:
+                if stop.wait(OPEN_SETTLE_TIME):
+                    break
+                ser.reset_input_buffer()
+                if decoder is not None:
+                    decoder.reset()
+                conn.send_bytes(MSG_STATUS + f"Connected to {port} at {baud_rate} baud (worker).".encode())
+                pending = bytearray()
+                while not stop.is_set():
+                    data = ser.read(ser.in_waiting or 1)
+                    if not data:
+                        continue
+                    start_ns = time.perf_counter_ns()
+                    if decoder is not None:
+                        for frame in decoder.feed(data):
+                            ring.write(frame.values, start_ns)
+                    else:
+                        pending += data
+                        start = 0
+                        while True:
+                            end = pending.find(b"\n", start)
+                            if end < 0:
+                                break
+                            line = pending[start:end].decode("utf-8", errors="replace").strip()
+                            start = end + 1
+                            if not line:
+                                continue
+                            try:
+                                frame = parser.parse(line)
+                            except Exception:
+                                continue
+                            if not isinstance(frame, SensorFrame):
+                                frame = frame_from_dict(frame)
+                            ring.write(frame.values, start_ns)
+                        del pending[:start]
+                    conn.send_bytes(MSG_WAKE)
+            except Exception as e:
+                conn.send_bytes(MSG_DISCONNECTED + f"Disconnected from {port} ({e}); reconnecting".encode())
+                stop.wait(backoff.next())
+            finally:
+                ser.close()
+    except (BrokenPipeError, EOFError, KeyboardInterrupt):
+        pass  # main process went away
+    finally:
+        ring.close()
+        conn.close()
@@ -0,0 +1,387 @@
+# gestures.py
+"""
+Real-time gesture recognition on the IMU stream.
+
+Incoming Acc/Gyro frames are low-passed (exponential moving average over about
+`decimate` frames) and sampled every `decimate` frames; every sample is one
+step of an incremental subsequence DTW against each template of a library
+(templates are smoothed and sampled the same way when loaded). Smoothing
+before sampling keeps the match insensitive to where the sampling phase falls. A match fires a
+MIDI action: a program change, a note, or a snapshot of CC values.
+
+Per step, for all templates at once (NumPy, templates padded to one length):
+
+    D[j] = |x - T[j]|^2 + min(D'[j], D'[j-1], D'[j-2])
+
+where D' is the previous step's column and a path may start at j = 0 on any
+step. The step pattern lets the template advance 0, 1 or 2 positions per
+input step. Each cell depends only on the previous column, so the update is
+one vectorized expression instead of a loop over template positions. Each
+cell also keeps its path's start step, and a Sakoe-Chiba band (relative to
+that start) rejects paths that drift more than `band` * template length off
+the diagonal.
+
+Early abandoning: a cell whose cumulative cost already exceeds the
+template's threshold * length can never match and is dropped (set to inf), as
+is one whose cost per step so far exceeds `abandon` times the threshold (a
+heuristic: such a path would have to be nearly perfect from there on).
+Templates with no live cell are not computed at all unless their first
+position is within reach of the current input. At most `max_active`
+templates (the most promising ones) are updated per step, so the per-step
+cost stays bounded however large the library grows.
+
+A template matches when the cost of a path through its last position, divided
+by its length, falls below its threshold. The best match of a step fires;
+then all paths are reset and nothing fires for `refractory` seconds.
+
+Library file (JSON, paths relative to the file):
+    {
+      "decimate": 4,
+      "templates": [
+        {"name": "square", "capture": "square.txt", "start": 1100, "end": 1700,
+         "threshold": 0.45, "action": {"type": "program_change", "program": 5}},
+        {"name": "flick", "frames": [[0.9, 0.1, 0.3, -20.0, 4.0, 1.0], ...],
+         "action": {"type": "note", "note": 60, "velocity": 110}},
+        {"name": "wave", "capture": "wave.txt",
+         "action": {"type": "cc_snapshot", "values": {"20": 127, "21": 0}}}
+      ]
+    }
+"frames" rows are AccX, AccY, AccZ, GyroX, GyroY, GyroZ. Capture lines that
+can't be read, or lack one of those fields, are skipped. Thresholds depend on
+the gesture; benchmarks/bench_gestures.py prints what fires on the bundled
+captures. The square template fires on square.txt as soon as its cost drops
+below 0.45 (at about 0.42; it reaches 0 where the template was cut out), while
+the best the other captures score is about 0.55 (fingers.txt) and 0.60
+(percussion.txt), so 0.45 leaves little margin on either side.
+"""
+import json
+import math
+import os
+
+import numpy as np
+
+from data_parser import FIELD_INDEX, FrameParser
+from log_writer import LOG
+from routing import SENSOR_ALIASES, frame_from_dict
+
+FEATURES = ("AccX", "AccY", "AccZ", "GyroX", "GyroY", "GyroZ")
+_FEATURE_INDEX = tuple(FIELD_INDEX[name] for name in FEATURES)
+
+# Brings accelerometer (g) and gyroscope (deg/s) to comparable magnitudes.
+FEATURE_SCALE = (1.0, 1.0, 1.0, 1 / 200, 1 / 200, 1 / 200)
+
+ACTION_TYPES = ("program_change", "note", "cc_snapshot")
+
+
+class GestureTemplate:
+    def __init__(self, name, frames, threshold=0.5, action=None):
+        """
+        :param name: Gesture name (logged on a match).
+        :param frames: Sequence of raw (AccX..GyroZ) rows at the input frame rate.
+        :param threshold: Maximum mean squared distance per template step (in
+                          FEATURE_SCALE units) for a match.
+        :param action: MIDI action dict, see the module docstring.
+        """
+        self.name = name
+        self.frames = np.asarray(frames, dtype=np.float64).reshape(-1, len(FEATURES))
+        self.threshold = threshold
+        self.action = _check_action(name, action if action is not None else {})
+
+    @classmethod
+    def from_capture(cls, name, path, start=0, end=None, **kwargs):
+        """
+        Builds a template from frames start..end of a text capture.
+        """
+        parser = FrameParser()
+        rows = []
+        skipped = 0
+        with open(path, "r") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    frame = parser.parse(line)
+                except ValueError:
+                    skipped += 1
+                    continue
+                if isinstance(frame, dict):
+                    # The fallback parser: keep the line only if it has every feature.
+                    if not {SENSOR_ALIASES.get(key, key) for key in frame}.issuperset(FEATURES):
+                        skipped += 1
+                        continue
+                    frame = frame_from_dict(frame)
+                values = frame.values
+                rows.append([values[i] for i in _FEATURE_INDEX])
+        if skipped:
+            LOG.error(f"{name}: skipped {skipped} unreadable lines of {path}")
+        frames = rows[start:end]
+        if len(frames) < 2:
+            raise ValueError(f"{name}: {path}[{start}:{end}] has fewer than 2 frames")
+        return cls(name, frames, **kwargs)
+
+    def decimated(self, decimate) -> np.ndarray:
+        """
+        The frames smoothed and sampled as GestureRecognizer.update() does,
+        scaled by FEATURE_SCALE.
+        """
+        alpha = 1.0 / decimate
+        smoothed = np.empty_like(self.frames)
+        level = self.frames[0]
+        for i, frame in enumerate(self.frames):
+            level = level + alpha * (frame - level)
+            smoothed[i] = level
+        return smoothed[decimate - 1::decimate] * np.asarray(FEATURE_SCALE)
+
+
+def _midi_number(name, action, key, default=None) -> int:
+    value = action.get(key, default)
+    if value is None:
+        raise ValueError(f"{name}: {action['type']} action needs {key!r}")
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name}: {key} must be an integer, got {value!r}") from None
+    if not 0 <= number <= 127:
+        raise ValueError(f"{name}: {key} {number} out of range 0..127")
+    return number
+
+
+def _check_action(name, action) -> dict:
+    """
+    Validates an action dict and returns it with its MIDI numbers as ints, so
+    a bad library fails when it is loaded rather than on every match.
+    """
+    if not isinstance(action, dict):
+        raise ValueError(f"{name}: action must be an object, got {action!r}")
+    action_type = action.get("type")
+    if action_type is None:
+        return action
+    if action_type not in ACTION_TYPES:
+        raise ValueError(f"{name}: unknown action {action_type!r}; expected one of {ACTION_TYPES}")
+    checked = dict(action)
+    if action_type == "program_change":
+        checked["program"] = _midi_number(name, action, "program")
+    elif action_type == "note":
+        checked["note"] = _midi_number(name, action, "note")
+        if action.get("velocity") is not None:
+            checked["velocity"] = _midi_number(name, action, "velocity")
+    else:
+        values = action.get("values")
+        if not isinstance(values, dict):
+            raise ValueError(f"{name}: cc_snapshot action needs \"values\": {{controller: value}}")
+        checked["values"] = {_midi_number(name, {"controller": controller}, "controller"):
+                             _midi_number(name, values, controller) for controller in values}
+    return checked
+
+
+def load_library(path):
+    """
+    Returns (templates, options) from a library file; options holds the
+    recognizer settings given in the file (e.g. "decimate").
+    """
+    with open(path, "r") as f:
+        library = json.load(f)
+    base_dir = os.path.dirname(os.path.abspath(path))
+    templates = []
+    for entry in library.get("templates", []):
+        kwargs = {"threshold": entry.get("threshold", 0.5), "action": entry.get("action")}
+        try:
+            if "capture" in entry:
+                templates.append(GestureTemplate.from_capture(
+                    entry["name"], os.path.join(base_dir, entry["capture"]),
+                    entry.get("start", 0), entry.get("end"), **kwargs))
+            else:
+                templates.append(GestureTemplate(entry["name"], entry["frames"], **kwargs))
+        except KeyError as e:
+            raise ValueError(f"{path}: template {entry.get('name', '?')!r} needs {e}") from None
+    if not templates:
+        raise ValueError(f"{path}: no templates")
+    options = {key: library[key] for key in ("decimate", "band", "max_active", "refractory") if key in library}
+    return templates, options
+
+
+class GestureRecognizer:
+    def __init__(self, templates, midi_handler=None, decimate=4, band=0.3, max_active=32,
+                 refractory=1.0, note_length=0.2, abandon=3.0):
+        """
+        :param templates: GestureTemplates to match.
+        :param midi_handler: MidiHandler to send to (SerialReceiver fills it in if None).
+        :param decimate: Input frames per DTW step.
+        :param band: Band half-width as a fraction of each template's length (at least 2 steps).
+        :param max_active: Most templates updated per step (the per-step cost bound).
+        :param refractory: Seconds after a match during which nothing fires.
+        :param note_length: Seconds until the note_off of a "note" action.
+        :param abandon: Drop a partial path once its cost per step exceeds this
+                        many times the template's threshold.
+        """
+        self.templates = list(templates)
+        self.midi_handler = midi_handler
+        self.decimate = decimate
+        self.max_active = max_active
+        self.refractory_ns = int(refractory * 1e9)
+        self.note_length_ns = int(note_length * 1e9)
+
+        if decimate < 1:
+            raise ValueError(f"decimate must be at least 1, got {decimate}")
+        series = [template.decimated(decimate) for template in self.templates]
+        for template, s in zip(self.templates, series):
+            if len(s) < 2:
+                raise ValueError(f"{template.name}: {len(template.frames)} frames give {len(s)} DTW steps "
+                                 f"at decimate={decimate}; need at least 2 (at least {2 * decimate} frames)")
+        count = len(series)
+        self.lengths = np.array([len(s) for s in series])
+        width = int(self.lengths.max())
+        self._templates = np.zeros((count, width, len(FEATURES)))
+        for k, s in enumerate(series):
+            self._templates[k, :len(s)] = s
+        self._thresholds = np.array([t.threshold for t in self.templates], dtype=np.float64)
+        self._band = np.maximum(2, np.ceil(band * self.lengths)).astype(np.int64)[:, None]
+        self._steps = np.arange(1, width + 1)  # template steps covered at each position
+        # Early abandoning: the cost of a path reaching position j may not exceed
+        # threshold * length (it could never match), nor `abandon` times the
+        # threshold per step so far. Padding positions are never reachable.
+        thresholds = self._thresholds[:, None]
+        self._bounds = np.minimum(thresholds * self.lengths[:, None], abandon * thresholds * self._steps)
+        self._bounds[self._steps[None, :] > self.lengths[:, None]] = -1.0
+
+        self._cost = np.full((count, width), np.inf)
+        self._start = np.zeros((count, width), dtype=np.int64)
+        self._live = np.zeros(count, dtype=bool)
+        self._step = 0
+
+        self._alpha = 1.0 / decimate
+        self._level = None  # low-passed features, sampled every `decimate` frames
+        self._scale = np.asarray(FEATURE_SCALE)
+        self._pending = 0
+        self._quiet_until_ns = 0
+        self._note_off = None  # (note, due ns)
+
+        self.matches = 0
+        self.last_match = None
+        self.last_cost = math.inf
+        self.templates_computed = 0  # summed over steps (early-abandoning statistics)
+
+    def update(self, values, now_ns):
+        """
+        Feeds one frame (SensorFrame.values). Returns the name of a gesture
+        matched on this frame, or None.
+        """
+        if self._note_off is not None and now_ns >= self._note_off[1]:
+            self._release()
+        level = self._level
+        if level is None:
+            level = self._level = [values[index] for index in _FEATURE_INDEX]
+        alpha = self._alpha
+        for k, index in enumerate(_FEATURE_INDEX):
+            level[k] += alpha * (values[index] - level[k])
+        self._pending += 1
+        if self._pending < self.decimate:
+            return None
+        self._pending = 0
+        return self.step(np.array(level) * self._scale, now_ns)
+
+    def step(self, x, now_ns=0):
+        """
+        One DTW step with a decimated, scaled feature vector.
+        """
+        self._step += 1
+        t = self._step
+        first = ((self._templates[:, 0] - x) ** 2).sum(axis=1)
+        rows = np.flatnonzero(self._live | (first <= self._bounds[:, 0]))
+        if len(rows) > self.max_active:
+            # Keep the most promising: lowest cost per step of a live path, or a fresh start.
+            cost = self._cost[rows]
+            finite = np.isfinite(cost)
+            per_step = np.where(finite, cost / self._steps, np.inf).min(axis=1)
+            score = np.minimum(per_step, first[rows])
+            order = np.argpartition(score, self.max_active)
+            # A skipped step would break a path's timeline: drop the others' paths.
+            dropped = rows[order[self.max_active:]]
+            self._cost[dropped] = np.inf
+            self._live[dropped] = False
+            rows = rows[order[:self.max_active]]
+        self.templates_computed += len(rows)
+        if not len(rows):
+            return None
+
+        if len(rows) == len(self.templates):
+            rows = slice(None)  # a view instead of a copy
+        local = ((self._templates[rows] - x) ** 2).sum(axis=2)
+        previous = self._cost[rows]
+        starts = self._start[rows]
+        n = len(previous)
+        # Best predecessor among (i-1, j), (i-1, j-1), (i-1, j-2), keeping the
+        # path's start step along; a new path may start at j = 0.
+        best = previous.copy()
+        start = starts.copy()
+        best[:, 0] = 0.0
+        start[:, 0] = t
+        for shift in (1, 2):
+            moved = previous[:, :-shift]
+            better = moved < best[:, shift:]
+            np.copyto(best[:, shift:], moved, where=better)
+            np.copyto(start[:, shift:], starts[:, :-shift], where=better)
+
+        cost = local + best
+        elapsed = t - start + 1
+        dropped = np.abs(elapsed - self._steps) > self._band[rows]
+        dropped |= cost > self._bounds[rows]
+        cost[dropped] = np.inf
+        self._cost[rows] = cost
+        self._start[rows] = start
+        self._live[rows] = np.isfinite(cost).any(axis=1)
+
+        lengths = self.lengths[rows]
+        final = cost[np.arange(n), lengths - 1] / lengths
+        best_row = int(np.argmin(final))
+        self.last_cost = float(final[best_row])
+        index = np.arange(len(self.templates))[rows][best_row]
+        if final[best_row] > self._thresholds[index] or now_ns < self._quiet_until_ns:
+            return None
+        template = self.templates[index]
+        self._fire(template, now_ns)
+        self.reset()
+        return template.name
+
+    def reset(self):
+        """
+        Drops all partial matches.
+        """
+        self._cost.fill(np.inf)
+        self._live.fill(False)
+
+    def _fire(self, template, now_ns):
+        self.matches += 1
+        self.last_match = template.name
+        self._quiet_until_ns = now_ns + self.refractory_ns
+        LOG.info(f"[Gesture] {template.name} (cost {self.last_cost:.3f})")
+        midi = self.midi_handler
+        action = template.action
+        action_type = action.get("type")
+        if midi is None or action_type is None:
+            return
+        if action_type == "program_change":
+            midi.send_midi_program_change(action["program"])
+        elif action_type == "note":
+            if self._note_off is not None:
+                self._release()
+            note = action["note"]
+            midi.send_midi_note_on(note, action.get("velocity"))
+            self._note_off = (note, now_ns + self.note_length_ns)
+        else:
+            for controller, value in action["values"].items():
+                midi.send_midi_control_change(controller, value)
+
+    def _release(self):
+        note, _ = self._note_off
+        self._note_off = None
+        if self.midi_handler is not None:
+            self.midi_handler.send_midi_note_off(note)
+
+    def flush(self):
+        """
+        Sends the pending note_off, if any (e.g. when the receiver stops).
+        """
+        if self._note_off is not None:
+            self._release()
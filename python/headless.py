@@ -0,0 +1,326 @@
+# headless.py
+"""
+Headless glove-to-MIDI bridge for machines without a display.
+
+Runs the same receivers, hub and MidiHandler as the GUI, configured from a JSON
+file instead of comboboxes. tkinter is never imported, and pyserial/mido (and
+the rtmidi backend) load only when a port is actually opened.
+
+    python headless.py bridge.json [--verbosity info] [--check]
+
+Config file:
+    {
+      "midi_port": "ESI MIDIMATE eX 2",
+      "scale": {"root": "C", "mode": "Major", "octave": 3, "held_notes": "retune"},
+      "clock": {"bpm": 120, "quantize": "1/16", "send_clock": true},
+      "gloves": [
+        {"name": "Glove 1", "port": "/dev/ttyACM0", "protocol": "text",
+         "sensors": {"F1": "20", "AccX": "7", "GyrZ": "10"},
+         "curves": {"F1": {"curve": "exp", "amount": 3, "range": [-1, 2]},
+                    "AccX": {"curve": "custom", "points": [[0, 0], [0.4, 0.7], [1, 1]]}}},
+        {"name": "Glove 2", "port": "/dev/ttyACM1",
+         "gestures": "gestures_example.json", "calibration": "calibration_example.json"},
+        {"name": "Replay", "replay": "square.txt",
+         "network": {"host": "192.168.1.20", "port": 9000, "protocol": "osc"},
+         "strikes": {"note": 38, "k": 3.0}}
+      ]
+    }
+
+Top-level keys:
+    midi_port   output port name, or "raw:<device>" (e.g. "raw:/dev/snd/midiC1D0")
+                to write straight to a raw MIDI device node with running status
+    scale       "root": any of the twelve roots, sharps or flats; "mode": any of
+                scales.MODE_NAMES; "octave" of the root; "held_notes": what a
+                scale change does to held notes, "retune" (move them to their
+                new pitch) or "release". Glove N plays scale notes 4N+1..4N+4
+                on P1-P4 unless its "sensors" assign them, as in the GUI.
+    clock       a ClockEngine sends MIDI clock and quantizes note-ons to the
+                "quantize" grid (clock.QUANTIZE_GRIDS; see clock.py)
+    gloves      one entry per sensor source
+
+Glove keys (all optional):
+    name, port, baud_rate, protocol ("text" or "binary")
+    replay, replay_speed
+                play a capture (.txt) or recording (.mmrec) instead of a port
+    worker      true reads and parses the glove in its own process; only helps
+                with a spare CPU core (frame_ring.py, benchmarks/bench_worker.py)
+    sensors     {sensor: note name or MIDI number for P1-P4, CC number otherwise}
+    curves      {CC sensor: response curve and raw range} (curves.py)
+    calibration profile whose measured ranges replace the default +/-R
+                (calibration.py)
+    gestures    gesture library firing program changes, notes or CC snapshots
+                (gestures.py; NumPy is only imported when a glove has one)
+    network     send the glove's notes and CCs over UDP as OSC bundles or
+                RTP-MIDI packets, one datagram per frame, instead of to the
+                MIDI port (network_output.py)
+    strikes     StrikeDetector parameters ({} or true for the defaults) to
+                trigger a drum note on IMU strikes (strike_detector.py)
+
+On POSIX, SIGHUP reloads the file and swaps in each glove's new "sensors",
+"curves", "calibration" and the scale without reopening any port.
+
+--check starts everything, prints the startup time and resident memory, and
+exits (see benchmarks/bench_startup.py for the comparison with the GUI).
+"""
+import argparse
+import json
+import os
+import signal
+import sys
+import threading
+import time
+
+_START = time.perf_counter()
+
+from async_core import ReceiverHub  # noqa: E402
+from calibration_profile import load_profile  # noqa: E402
+from clock import QUANTIZE_GRIDS, ClockEngine  # noqa: E402
+from connection_manager import ConnectionManager  # noqa: E402
+from lazy_imports import lazy_import  # noqa: E402
+from log_writer import LEVEL_NAMES, LOG  # noqa: E402
+from midi_handler import DEFAULT_PORT_NAME, MidiHandler  # noqa: E402
+from network_output import NetworkOutput, NetworkSender  # noqa: E402
+from routing import CC_SENSORS, NOTE_NAME_TO_MIDI, NOTE_SENSORS  # noqa: E402
+from scales import SCALE_DEGREES, key_index, scale_notes  # noqa: E402
+from serial_receiver import HELD_NOTE_POLICIES, SerialReceiver  # noqa: E402
+from strike_detector import StrikeDetector  # noqa: E402
+
+gestures = lazy_import("gestures")  # pulls in NumPy
+
+
+def load_config(path) -> dict:
+    with open(path, "r") as f:
+        config = json.load(f)
+    if not config.get("gloves"):
+        raise ValueError(f"{path}: no gloves configured")
+    return config
+
+
+def glove_configs(config) -> list:
+    """
+    Returns one sensor config dict per glove, in the form GlovePanel builds
+    ({"P1": "C4", "F1": "20", ...}), with the scale notes filled in as MIDI
+    numbers.
+    """
+    scale = config.get("scale", {})
+    count = min(4 * len(config["gloves"]), SCALE_DEGREES)
+    key = key_index(scale.get("root", "C"), scale.get("mode", "Major"), scale.get("octave", 3))
+    notes = scale_notes(key, count)
+    result = []
+    for i, glove in enumerate(config["gloves"]):
+        glove_notes = notes[4 * i:4 * i + 4]
+        sensors = {}
+        if len(glove_notes) == 4:
+            sensors.update(zip(NOTE_SENSORS, glove_notes))
+        name = glove.get("name", f"Glove {i + 1}")
+        sensors.update({sensor: sensor_value(name, sensor, value)
+                        for sensor, value in glove.get("sensors", {}).items()})
+        result.append(sensors)
+    return result
+
+
+def sensor_value(glove_name, sensor, value):
+    """
+    A "sensors" entry as compile_plan takes it: a note name or MIDI number for
+    P1-P4, a CC number (as a string) otherwise, or "None". Raises ValueError
+    for anything else instead of leaving the sensor silently unmapped.
+    """
+    if value is None or value == "None":
+        return "None"
+    if sensor in NOTE_SENSORS:
+        if isinstance(value, int) and not isinstance(value, bool) and 0 <= value <= 127:
+            return value
+        if isinstance(value, str) and value in NOTE_NAME_TO_MIDI:
+            return value
+        raise ValueError(f"{glove_name}: {sensor} must be a note name (e.g. \"C4\") or MIDI number 0-127, "
+                         f"got {value!r}")
+    if sensor not in CC_SENSORS:
+        raise ValueError(f"{glove_name}: unknown sensor {sensor!r}")
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        number = -1
+    if isinstance(value, bool) or not 0 <= number <= 127:
+        raise ValueError(f"{glove_name}: {sensor} must be a CC number 0-127, got {value!r}")
+    return str(number)
+
+
+def resident_kib() -> int:
+    """
+    Current resident set size in KiB (peak RSS where /proc is not available).
+    """
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    import resource
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == "darwin" else rss
+
+
+def startup_report(mode, start=_START) -> str:
+    return (f"{mode}: startup {(time.perf_counter() - start) * 1000:.0f} ms, "
+            f"RSS {resident_kib() / 1024:.1f} MiB, tkinter loaded: {'tkinter' in sys.modules}")
+
+
+class HeadlessBridge:
+    def __init__(self, config_path):
+        self.config_path = config_path
+        self.config = load_config(config_path)
+        self.midi_handler = MidiHandler(default_velocity=100, dispatcher=True, open_port=False,
+                                        port_name=self.config.get("midi_port", DEFAULT_PORT_NAME))
+        self.hub = ReceiverHub()
+        self.connection = ConnectionManager(self.midi_handler)
+        self.clock = None
+        clock = self.config.get("clock")
+        if clock is not None:
+            self.clock = ClockEngine(self.midi_handler, bpm=clock.get("bpm", 120.0),
+                                     quantize=QUANTIZE_GRIDS[clock.get("quantize", "off")],
+                                     tolerance=clock.get("tolerance", 0.03),
+                                     send_clock=clock.get("send_clock", True))
+        self.network_sender = None  # one UDP socket for every networked glove
+        self.receivers = []
+        self._stopped = threading.Event()
+
+    def start(self):
+        self.hub.start()
+        self.connection.start()
+        if self.clock is not None:
+            self.clock.start()
+        base_dir = os.path.dirname(os.path.abspath(self.config_path))
+        for glove, sensors in zip(self.config["gloves"], glove_configs(self.config)):
+            replay = glove.get("replay")
+            network = self.network_output(glove.get("network"))
+            recognizer = None
+            calibration = self.calibration_profile(glove, base_dir)
+            if glove.get("gestures"):
+                templates, options = gestures.load_library(os.path.join(base_dir, glove["gestures"]))
+                recognizer = gestures.GestureRecognizer(templates, **options)
+            self.receivers.append(SerialReceiver(
+                port=glove.get("port", "COM4"),
+                baud_rate=glove.get("baud_rate", 115200),
+                config_dict=sensors,
+                curves=glove.get("curves"),
+                calibration=calibration,
+                glove_name=glove.get("name", f"Glove {len(self.receivers) + 1}"),
+                midi_handler=self.midi_handler,
+                protocol=glove.get("protocol", "text"),
+                replay_path=os.path.join(base_dir, replay) if replay else None,
+                replay_speed=glove.get("replay_speed", 1.0),
+                hub=self.hub,
+                worker=glove.get("worker", False),
+                clock=self.clock,
+                network=network,
+                gestures=recognizer,
+                strike_detector=self.strike_detector(glove.get("strikes")),
+                held_notes=self.config.get("scale", {}).get("held_notes", "retune"),
+            ))
+
+    @staticmethod
+    def calibration_profile(glove, base_dir):
+        """
+        The glove's calibration profile, or None.
+        """
+        if not glove.get("calibration"):
+            return None
+        return load_profile(os.path.join(base_dir, glove["calibration"]))
+
+    @staticmethod
+    def strike_detector(options):
+        """
+        A StrikeDetector for a glove's "strikes" option, or None.
+        """
+        if options is None or options is False:
+            return None
+        return StrikeDetector(**(options if isinstance(options, dict) else {}))
+
+    def network_output(self, options):
+        if options is None:
+            return None
+        if self.network_sender is None:
+            self.network_sender = NetworkSender()
+        return NetworkOutput(self.network_sender, **options)
+
+    def reload(self):
+        """
+        Re-reads the config file and swaps each glove's routing plan.
+        """
+        try:
+            self.config = load_config(self.config_path)
+            configs = glove_configs(self.config)
+        except (OSError, ValueError) as e:
+            LOG.error(f"Config reload failed: {e}")
+            return
+        base_dir = os.path.dirname(os.path.abspath(self.config_path))
+        held_notes = self.config.get("scale", {}).get("held_notes", "retune")
+        if held_notes not in HELD_NOTE_POLICIES:
+            LOG.error(f"held_notes must be one of {HELD_NOTE_POLICIES}; keeping the current policy")
+            held_notes = None
+        for receiver, glove, sensors in zip(self.receivers, self.config["gloves"], configs):
+            try:
+                profile = self.calibration_profile(glove, base_dir)
+            except (OSError, ValueError) as e:
+                LOG.error(f"Calibration of {receiver.glove_name} not reloaded: {e}")
+                profile = None
+            else:
+                profile = profile or {}  # an empty profile drops a removed calibration
+            if held_notes is not None:
+                receiver.held_notes = held_notes
+            receiver.config_dict.clear()
+            receiver.config_dict.update(sensors)
+            receiver.update_plan(curves=glove.get("curves", {}), calibration=profile)
+        LOG.info(f"Reloaded {self.config_path}")
+
+    def wait(self):
+        # Short timeouts keep the main thread responsive to signals on Windows.
+        while not self._stopped.wait(0.5):
+            pass
+
+    def request_stop(self, *_):
+        self._stopped.set()
+
+    def stop(self):
+        for receiver in self.receivers:
+            receiver.stop()
+        if self.clock is not None:
+            self.clock.stop()
+            LOG.info(f"[Clock] {self.clock.summary()}")
+        self.hub.stop()
+        self.connection.stop()
+        self.midi_handler.close()
+        if self.network_sender is not None:
+            LOG.info(f"[Network] {self.network_sender.stats()}")
+            self.network_sender.close()
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Glove-to-MIDI bridge without a GUI")
+    arg_parser.add_argument("config", help="JSON config file")
+    arg_parser.add_argument("--verbosity", choices=sorted(LEVEL_NAMES), default="info")
+    arg_parser.add_argument("--check", action="store_true",
+                            help="start, report startup time and memory, and exit")
+    args = arg_parser.parse_args()
+    LOG.set_verbosity(LEVEL_NAMES[args.verbosity])
+
+    bridge = HeadlessBridge(args.config)
+    bridge.start()
+    LOG.info(startup_report("headless"))
+    if args.check:
+        bridge.stop()
+        LOG.flush()
+        return
+    signal.signal(signal.SIGINT, bridge.request_stop)
+    signal.signal(signal.SIGTERM, bridge.request_stop)
+    if hasattr(signal, "SIGHUP"):
+        signal.signal(signal.SIGHUP, lambda *_: bridge.reload())
+    try:
+        bridge.wait()
+    finally:
+        bridge.stop()
+
+
+if __name__ == "__main__":
+    main()
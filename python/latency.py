@@ -0,0 +1,190 @@
+# latency.py
+"""
+Optional end-to-end latency instrumentation: serial bytes -> MIDI send.
+
+Each frame is stamped with time.perf_counter_ns() at a few points and the
+differences are folded into fixed-memory histograms, one per stage:
+
+    read   bytes taken from the port -> line/frame ready (decode, framing)
+    parse  text line -> SensorFrame
+    map    routing plan + filters (includes MIDI sends without a dispatcher)
+    send   MIDI send: port write, or enqueue -> port write with a dispatcher
+    total  bytes taken from the port -> frame fully mapped
+
+Instrumentation is off by default. Hot-path callers guard with
+`if LATENCY.enabled:` (like `LOG.verbosity >= DEBUG`), so when disabled it
+costs one attribute check per frame.
+
+Usage:
+    from latency import LATENCY
+    LATENCY.enable(dump_path="latency.log", dump_interval=10.0)
+    ...
+    print(LATENCY.summary())
+"""
+import threading
+import time
+from array import array
+
+from log_writer import LOG
+
+READ = "read"
+PARSE = "parse"
+MAP = "map"
+SEND = "send"
+TOTAL = "total"
+STAGES = (READ, PARSE, MAP, SEND, TOTAL)
+
+_SUB_BITS = 2                 # 4 sub-buckets per power of two (<= 25% error)
+_SUB_BUCKETS = 1 << _SUB_BITS
+_NUM_BUCKETS = 64 * _SUB_BUCKETS
+
+
+def _bucket(ns):
+    bits = ns.bit_length()
+    if bits <= _SUB_BITS:
+        return ns
+    return ((bits - _SUB_BITS) << _SUB_BITS) + ((ns >> (bits - _SUB_BITS - 1)) & (_SUB_BUCKETS - 1))
+
+
+def _bucket_upper(index):
+    """
+    Largest value (ns) falling into bucket `index`.
+    """
+    if index < _SUB_BUCKETS:
+        return index
+    shift = (index >> _SUB_BITS) - 1
+    sub = index & (_SUB_BUCKETS - 1)
+    return ((_SUB_BUCKETS + sub + 1) << shift) - 1
+
+
+class LatencyHistogram:
+    """
+    Log-linear histogram of nanosecond durations in a fixed array of counters.
+    Percentiles are bucket upper bounds; max is exact.
+    """
+    __slots__ = ("counts", "count", "max_ns")
+
+    def __init__(self):
+        self.counts = array('Q', bytes(8 * _NUM_BUCKETS))
+        self.count = 0
+        self.max_ns = 0
+
+    def add(self, ns):
+        if ns < 0:
+            ns = 0
+        self.counts[_bucket(ns)] += 1
+        self.count += 1
+        if ns > self.max_ns:
+            self.max_ns = ns
+
+    def percentile(self, p) -> int:
+        """
+        :param p: Percentile between 0 and 100.
+        :return: Upper bound (ns) of the bucket holding the p-th percentile.
+        """
+        if not self.count:
+            return 0
+        rank = max(1, int(self.count * p / 100 + 0.5))
+        seen = 0
+        for index, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return min(_bucket_upper(index), self.max_ns)
+        return self.max_ns
+
+    def reset(self):
+        for i in range(_NUM_BUCKETS):
+            self.counts[i] = 0
+        self.count = 0
+        self.max_ns = 0
+
+    def as_dict(self) -> dict:
+        return {"count": self.count, "p50_us": self.percentile(50) / 1000,
+                "p99_us": self.percentile(99) / 1000, "max_us": self.max_ns / 1000}
+
+
+class LatencyTracker:
+    def __init__(self):
+        self.enabled = False
+        self.histograms = {stage: LatencyHistogram() for stage in STAGES}
+        self.dump_path = None
+        self.dump_interval = 10.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def enable(self, dump_path=None, dump_interval=10.0):
+        """
+        Turns instrumentation on.
+
+        :param dump_path: File the summary is appended to every dump_interval
+                          seconds (None: no dump).
+        """
+        self.enabled = True
+        self.dump_path = dump_path
+        self.dump_interval = dump_interval
+        if dump_path and self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._dump_loop, name="LatencyDump", daemon=True)
+            self._thread.start()
+
+    def disable(self):
+        self.enabled = False
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join(timeout=2)
+            self._thread = None
+            self.dump()
+
+    def add(self, stage, ns):
+        self.histograms[stage].add(ns)
+
+    def add_frame(self, read_ns, parsed_ns, mapped_ns, start_ns=None):
+        """
+        Records one frame from its stamps: start_ns (bytes taken from the port),
+        read_ns (line/frame ready), parsed_ns and mapped_ns. Pass
+        parsed_ns == read_ns for frames that need no parsing (binary, replay).
+        """
+        histograms = self.histograms
+        if start_ns is None:
+            start_ns = read_ns
+        histograms[READ].add(read_ns - start_ns)
+        if parsed_ns != read_ns:
+            histograms[PARSE].add(parsed_ns - read_ns)
+        histograms[MAP].add(mapped_ns - parsed_ns)
+        histograms[TOTAL].add(mapped_ns - start_ns)
+
+    def stats(self) -> dict:
+        return {stage: hist.as_dict() for stage, hist in self.histograms.items()}
+
+    def summary(self) -> str:
+        """
+        One line per stage: count, p50/p99/max in microseconds.
+        """
+        lines = []
+        for stage, hist in self.histograms.items():
+            if hist.count:
+                s = hist.as_dict()
+                lines.append(f"{stage:5s} n={s['count']:<8d} p50={s['p50_us']:8.1f}us "
+                             f"p99={s['p99_us']:8.1f}us max={s['max_us']:8.1f}us")
+        return "\n".join(lines) if lines else "no samples"
+
+    def reset(self):
+        for hist in self.histograms.values():
+            hist.reset()
+
+    def dump(self):
+        if not self.dump_path:
+            return
+        try:
+            with open(self.dump_path, "a", encoding="utf-8") as f:
+                f.write(f"# {time.strftime('%Y-%m-%d %H:%M:%S')}\n{self.summary()}\n")
+        except OSError as e:
+            LOG.error(f"Latency dump error: {e}")
+
+    def _dump_loop(self):
+        while not self._stop.wait(self.dump_interval):
+            self.dump()
+
+
+# Process-wide tracker
+LATENCY = LatencyTracker()
@@ -0,0 +1,31 @@
+# lazy_imports.py
+"""
+Deferred imports for heavy optional backends (mido/rtmidi, pyserial).
+
+    mido = lazy_import("mido")   # nothing is loaded yet
+    mido.Message(...)            # first attribute access imports the module
+
+Headless runs and tools that never open a port or send MIDI don't pay for
+these imports; after the first access the module behaves like a normal one.
+"""
+import importlib.util
+import sys
+
+
+def lazy_import(name):
+    """
+    Returns module `name`, loaded on first attribute access. An already
+    imported module is returned as is; a missing one raises ImportError now.
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ImportError(f"No module named '{name}'", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
@@ -0,0 +1,175 @@
+# log_writer.py
+"""
+Non-blocking console logging and sensor capture.
+
+Receiver threads only append to a bounded in-memory ring; a single background
+thread drains it and does batched writes to the console and to the per-glove
+capture files. When the ring is full new entries are dropped and counted, so
+logging can never stall parsing or MIDI output.
+
+Usage:
+    from log_writer import LOG, DEBUG
+    LOG.info("Connected")
+    if LOG.verbosity >= DEBUG:          # skip formatting when not needed
+        LOG.debug(f"[Glove 1] {line}")
+    LOG.capture("Glove 1", line)       # appended to captures/Glove_1.txt
+"""
+import atexit
+import os
+import re
+import sys
+import threading
+from collections import deque
+
+# Verbosity levels
+QUIET = 0
+ERROR = 1
+INFO = 2
+DEBUG = 3
+
+LEVEL_NAMES = {"quiet": QUIET, "error": ERROR, "info": INFO, "debug": DEBUG}
+
+_CONSOLE = None  # target key for console entries
+
+
+class LogWriter:
+    def __init__(self, verbosity=INFO, capacity=8192, flush_interval=0.05,
+                 capture_dir=None, stream=None):
+        """
+        :param verbosity: QUIET, ERROR, INFO or DEBUG (DEBUG logs every frame).
+        :param capacity: Maximum number of pending entries before dropping.
+        :param flush_interval: Seconds between batched writes.
+        :param capture_dir: Directory for per-glove capture files; None disables capture.
+        :param stream: Console stream (defaults to sys.stdout).
+        """
+        self.verbosity = verbosity
+        self.capacity = capacity
+        self.flush_interval = flush_interval
+        self.capture_dir = capture_dir
+        self.stream = stream
+        self.dropped = 0
+        self.written = 0
+        self._entries = deque()
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._capture_files = {}
+        self._thread = None
+        self._running = False
+
+    # -------------------------------
+    # Producer side (any thread)
+    # -------------------------------
+    def _push(self, target, text):
+        if len(self._entries) >= self.capacity:
+            self.dropped += 1
+            return
+        self._entries.append((target, text))
+        if self._thread is None:
+            self.start()
+
+    def log(self, level, message):
+        if level <= self.verbosity:
+            self._push(_CONSOLE, message)
+
+    def error(self, message):
+        if self.verbosity >= ERROR:
+            self._push(_CONSOLE, message)
+
+    def info(self, message):
+        if self.verbosity >= INFO:
+            self._push(_CONSOLE, message)
+
+    def debug(self, message):
+        if self.verbosity >= DEBUG:
+            self._push(_CONSOLE, message)
+
+    def capture(self, name, line):
+        """
+        Appends a raw sensor line to the capture file of `name` (e.g. the glove name).
+        """
+        if self.capture_dir is not None:
+            self._push(name, line)
+
+    def set_verbosity(self, verbosity):
+        if isinstance(verbosity, str):
+            verbosity = LEVEL_NAMES[verbosity.lower()]
+        self.verbosity = verbosity
+
+    def stats(self) -> dict:
+        return {"pending": len(self._entries), "written": self.written, "dropped": self.dropped}
+
+    # -------------------------------
+    # Writer thread
+    # -------------------------------
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._running = True
+            self._thread = threading.Thread(target=self._writer_loop, name="LogWriter", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """
+        Stops the writer thread after writing everything still pending.
+        """
+        with self._lock:
+            thread = self._thread
+            self._running = False
+        if thread is not None:
+            self._wake.set()
+            thread.join(timeout=2)
+        self._write_pending()
+        for f in self._capture_files.values():
+            f.close()
+        self._capture_files.clear()
+        with self._lock:
+            self._thread = None
+
+    def flush(self):
+        self._wake.set()
+
+    def _writer_loop(self):
+        while self._running:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self._write_pending()
+            except Exception as e:
+                # Never let a broken file or stream kill the writer.
+                sys.stderr.write(f"LogWriter error: {e}\n")
+
+    def _write_pending(self):
+        entries = self._entries
+        batches = {}
+        # popleft() is atomic, so producers can keep appending meanwhile.
+        for _ in range(len(entries)):
+            target, text = entries.popleft()
+            batch = batches.get(target)
+            if batch is None:
+                batches[target] = batch = []
+            batch.append(text)
+        for target, batch in batches.items():
+            if target is _CONSOLE:
+                stream = self.stream or sys.stdout
+                stream.write("\n".join(batch) + "\n")
+                stream.flush()
+            else:
+                f = self._capture_file(target)
+                f.write("\n".join(batch) + "\n")
+                f.flush()
+            self.written += len(batch)
+
+    def _capture_file(self, name):
+        f = self._capture_files.get(name)
+        if f is None:
+            os.makedirs(self.capture_dir, exist_ok=True)
+            file_name = re.sub(r"[^A-Za-z0-9_.-]+", "_", name) + ".txt"
+            f = open(os.path.join(self.capture_dir, file_name), "a")
+            self._capture_files[name] = f
+        return f
+
+
+# Shared instance used by the receivers and the MIDI handler.
+LOG = LogWriter()
+atexit.register(LOG.stop)
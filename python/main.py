@@ -1,78 +1,71 @@
+import os
 import tkinter as tk
-import threading
 import time
 from tkinter import ttk
 from serial_receiver import SerialReceiver
 from midi_handler import MidiHandler
+from async_core import ReceiverHub, TkBridge
+from connection_manager import ConnectionManager
+from monitor import MonitorPanel
+from latency import LATENCY, SEND, TOTAL
+from routing import NOTE_NAME_TO_MIDI, compute_scale
+from scales import MIDI_NOTE_NAMES, MODE_NAMES, OCTAVES, ROOTS, SCALE_DEGREES
+from lazy_imports import lazy_import
+from log_writer import LOG
+from calibration_profile import load_profile
+from clock import QUANTIZE_GRIDS, ClockEngine
+from curves import CURVE_NAMES
+from network_output import NetworkOutput, NetworkSender
+from strike_detector import StrikeDetector
+
+gestures = lazy_import("gestures")  # pulls in NumPy
+
+# Sensor sources served by the receiver hub; add gloves, pedals or replays here.
+# "worker": True reads and parses that glove in its own process (frame_ring.py);
+# only helps with a spare CPU core, check with benchmarks/bench_worker.py.
+# "network": {"host": ..., "port": ..., "protocol": "osc" or "rtpmidi"} sends that
+# glove over UDP instead of to the MIDI port (network_output.py).
+# "gestures": "gestures_example.json" matches that glove's motion against a
+# gesture library (gestures.py).
+# "calibration": "glove1_calibration.json" maps that glove's CC sensors over the
+# ranges measured by calibration.py instead of the default +/-R.
+# "strikes": {"note": 38} triggers a drum note on IMU strikes, with the given
+# StrikeDetector parameters ({} for the defaults; strike_detector.py).
+GLOVES = [
+    {"name": "Glove 1", "port": "COM5", "worker": False, "network": None, "gestures": None, "calibration": None,
+     "strikes": None},
+    {"name": "Glove 2", "port": "COM4", "worker": False, "network": None, "gestures": None, "calibration": None,
+     "strikes": None},
+]
 
 # -------------------------------
 # Note and MIDI mappings
 # -------------------------------
-NOTES = [
-    "None",
-    "C3", "C#3", "D3", "D#3", "E3", "F3", "F#3", "G3", "G#3", "A3", "A#3", "B3",
-    "C4", "C#4", "D4", "D#4", "E4", "F4", "F#4", "G4", "G#4", "A4", "A#4", "B4",
-    "C5", "C#5", "D5", "D#5", "E5", "F5"
-]
-
-NOTE_NAME_TO_MIDI = {
-    "None": None,
-    "C3": 48,  "C#3": 49,  "D3": 50,  "D#3": 51,  "E3": 52,  "F3": 53,
-    "F#3": 54, "G3": 55,   "G#3": 56, "A3": 57,   "A#3": 58,  "B3": 59,
-    "C4": 60,  "C#4": 61,  "D4": 62,  "D#4": 63,  "E4": 64,  "F4": 65,
-    "F#4": 66, "G4": 67,   "G#4": 68, "A4": 69,   "A#4": 70,  "B4": 71,
-    "C5": 72,  "C#5": 73,  "D5": 74,  "D#5": 75,  "E5": 76,  "F5": 77
-}
-# Reverse mapping (for the MIDI numbers we cover)
-MIDI_TO_NOTE = {midi: name for name, midi in NOTE_NAME_TO_MIDI.items() if midi is not None}
+# Every MIDI note, so any root, mode and octave of the scale selectors fits.
+NOTES = ["None", *MIDI_NOTE_NAMES]
 
 def note_name_to_midi_func(note_name: str):
     """Utility function to convert a note name to a MIDI number."""
     return NOTE_NAME_TO_MIDI.get(note_name, None)
 
-# -------------------------------
-# Scale Computation
-# -------------------------------
-def compute_scale(root, mode):
-    """
-    Compute an 8-note diatonic scale based on the given root and mode.
-    For Major scale, intervals are: 0, 2, 4, 5, 7, 9, 11, 12 semitones.
-    For Minor (natural minor), intervals are: 0, 2, 3, 5, 7, 8, 10, 12.
-    The function assumes a default octave 3 for the root.
-    Returns a list of note names (if available in our mapping).
-    """
-    base = root + "3"  # e.g., "C3"
-    if base not in NOTE_NAME_TO_MIDI:
-        base = root + "3"
-    base_midi = NOTE_NAME_TO_MIDI[base]
-    if mode == "Major":
-        intervals = [0, 2, 4, 5, 7, 9, 11, 12]
-    else:  # Minor
-        intervals = [0, 2, 3, 5, 7, 8, 10, 12]
-    scale_midi = [base_midi + i for i in intervals]
-    scale_notes = []
-    for midi in scale_midi:
-        if midi in MIDI_TO_NOTE:
-            scale_notes.append(MIDI_TO_NOTE[midi])
-        else:
-            # Fallback to numeric representation if not found
-            scale_notes.append(str(midi))
-    return scale_notes
-
 # -------------------------------
 # Config UI (unchanged)
 # -------------------------------
 CONTROL_NUMBERS = ["None"] + [str(i) for i in range(1, 128)]
+# Custom (drawn) curves need points and are only available from a config file.
+UI_CURVES = [name for name in CURVE_NAMES if name != "custom"]
 
 class ConfigUI(tk.Frame):
     """
     A frame containing dropdowns to configure each sensor’s musical role:
        - Pressure sensors (P1-P4) => Note name
-       - Flex, Accelerometer, and Gyroscope sensors => CC Number
+       - Flex, Accelerometer, and Gyroscope sensors => CC Number and response curve
     """
-    def __init__(self, master, config_dict, *args, **kwargs):
+    def __init__(self, master, config_dict, *args, curves=None, on_change=None, **kwargs):
         super().__init__(master, *args, **kwargs)
         self.config_dict = config_dict
+        self.curves = curves if curves is not None else {}  # sensor -> curve spec
+        self.on_change = on_change  # called after every configuration change
         self.pressure_sensors = ["P1", "P2", "P3", "P4"]
         self.sensor_comboboxes = {}
         self.init_ui()
@@ -105,6 +98,7 @@ class ConfigUI(tk.Frame):
             combo.grid(row=row, column=1, padx=5, pady=2, sticky="w")
             self.config_dict[sensor] = "None"
             combo.bind("<<ComboboxSelected>>", lambda e, s=sensor, c=combo: self.on_cc_change(s, c))
+            self.add_curve_selector(sensor, row)
             row += 1
 
         # Accelerometers (AccX, AccY, AccZ)
@@ -119,6 +113,7 @@ class ConfigUI(tk.Frame):
             combo.grid(row=row, column=1, padx=5, pady=2, sticky="w")
             self.config_dict[sensor] = "None"
             combo.bind("<<ComboboxSelected>>", lambda e, s=sensor, c=combo: self.on_cc_change(s, c))
+            self.add_curve_selector(sensor, row)
             row += 1
 
         # Gyroscopes (GyrX, GyrY, GyrZ)
@@ -133,15 +128,35 @@ class ConfigUI(tk.Frame):
             combo.grid(row=row, column=1, padx=5, pady=2, sticky="w")
             self.config_dict[sensor] = "None"
             combo.bind("<<ComboboxSelected>>", lambda e, s=sensor, c=combo: self.on_cc_change(s, c))
+            self.add_curve_selector(sensor, row)
             row += 1
 
+    def add_curve_selector(self, sensor_name, row):
+        combo = ttk.Combobox(self, values=UI_CURVES, state="readonly", width=7)
+        combo.set(self.curves.get(sensor_name, {}).get("curve", "linear"))
+        combo.grid(row=row, column=2, padx=5, pady=2, sticky="w")
+        combo.bind("<<ComboboxSelected>>", lambda e, s=sensor_name, c=combo: self.on_curve_change(s, c))
+
+    def on_curve_change(self, sensor_name, combo):
+        spec = dict(self.curves.get(sensor_name, {}))
+        spec["curve"] = combo.get()
+        spec.pop("amount", None)  # each curve has its own default amount
+        self.curves[sensor_name] = spec
+        self.notify_change()
+
     def on_note_change(self, sensor_name, combo):
         selected = combo.get()
         self.config_dict[sensor_name] = selected
+        self.notify_change()
 
     def on_cc_change(self, sensor_name, combo):
         selected = combo.get()
         self.config_dict[sensor_name] = selected
+        self.notify_change()
+
+    def notify_change(self):
+        if self.on_change is not None:
+            self.on_change()
 
     def set_pressure_notes(self, chord_notes):
         """
@@ -151,6 +166,7 @@ class ConfigUI(tk.Frame):
             note_name = chord_notes[i]
             self.sensor_comboboxes[sensor].set(note_name)
             self.config_dict[sensor] = note_name
+        self.notify_change()
 
 # -------------------------------
 # Glove Panel (without chord preset buttons)
@@ -159,18 +175,32 @@ class GlovePanel(tk.Frame):
     """
     A panel for a single glove: shows sensor configuration and serial control.
     """
-    def __init__(self, master, glove_name, port, midi_handler, *args, **kwargs):
+    def __init__(self, master, glove_name, port, midi_handler, *args, protocol="text", hub=None, bridge=None,
+                 worker=False, clock=None, network=None, gesture_library=None, calibration=None, strikes=None,
+                 **kwargs):
         super().__init__(master, *args, **kwargs)
         self.glove_name = glove_name
         self.port = port
+        self.protocol = protocol  # "text" or "binary" (see binary_protocol.py)
+        self.hub = hub            # shared ReceiverHub; None starts a reader thread per glove
+        self.bridge = bridge      # TkBridge for status updates from the hub
+        self.worker = worker      # read/parse in a worker process (needs a hub)
+        self.clock = clock        # ClockEngine quantizing this glove's notes
+        self.network = network    # NetworkOutput replacing the MIDI port for this glove
+        self.gesture_library = gesture_library  # gesture library file, loaded on start
+        self.held_notes = "retune"  # what a key change does to held notes (App.update_held_notes)
+        self.calibration = calibration  # calibration profile file, loaded on start
+        self.strikes = strikes    # StrikeDetector parameters, or None for no strike detection
         self.config_dict = {}
+        self.curves = {}
         self.serial_receiver = None
         self.shared_midi_handler = midi_handler  # store the shared MIDI handler
 
         # Left: Sensor configuration (using ConfigUI)
         self.config_frame = tk.LabelFrame(self, text=f"{self.glove_name} Sensor Configuration")
         self.config_frame.pack(fill="both", expand=True, padx=5, pady=5)
-        self.config_ui = ConfigUI(self.config_frame, self.config_dict)
+        self.config_ui = ConfigUI(self.config_frame, self.config_dict, curves=self.curves,
+                                  on_change=self.on_config_change)
         self.config_ui.pack(fill="both", expand=True)
 
         # Right: Control buttons (Start/Stop & status)
@@ -184,19 +214,70 @@ class GlovePanel(tk.Frame):
         self.status_label = tk.Label(self.control_frame, text="Serial not running.")
         self.status_label.pack(pady=5)
 
+        # Live sensor monitor (redrawn at a fixed rate from the receiver's snapshot)
+        self.monitor_frame = tk.LabelFrame(self, text=f"{self.glove_name} Live Sensors")
+        self.monitor_frame.pack(fill="x", padx=5, pady=5)
+        self.monitor = MonitorPanel(self.monitor_frame, self.get_snapshot)
+        self.monitor.pack(fill="x")
+
     def start_serial(self):
         if self.serial_receiver is None:
+            recognizer = None
+            if self.gesture_library:
+                script_dir = os.path.dirname(os.path.realpath(__file__))
+                try:
+                    templates, options = gestures.load_library(os.path.join(script_dir, self.gesture_library))
+                    recognizer = gestures.GestureRecognizer(templates, **options)
+                except (OSError, ValueError) as e:
+                    LOG.error(f"{self.glove_name}: gestures ignored: {e}")
+            profile = None
+            if self.calibration:
+                script_dir = os.path.dirname(os.path.realpath(__file__))
+                try:
+                    profile = load_profile(os.path.join(script_dir, self.calibration))
+                except (OSError, ValueError) as e:
+                    LOG.error(f"{self.glove_name}: calibration ignored: {e}")
+            detector = None
+            if self.strikes is not None:
+                try:
+                    detector = StrikeDetector(**self.strikes)
+                except TypeError as e:
+                    LOG.error(f"{self.glove_name}: strike detection ignored: {e}")
             self.serial_receiver = SerialReceiver(
                 port=self.port, 
                 baud_rate=115200,
                 config_dict=self.config_dict, 
+                curves=self.curves,
+                calibration=profile,
                 glove_name=self.glove_name, 
-                midi_handler=self.shared_midi_handler  # pass the shared instance
+                midi_handler=self.shared_midi_handler,  # pass the shared instance
+                protocol=self.protocol,
+                hub=self.hub,
+                on_status=self.bridge.callback(self.set_status) if self.bridge else None,
+                worker=self.worker,
+                clock=self.clock,
+                network=self.network,
+                gestures=recognizer,
+                strike_detector=detector,
+                held_notes=self.held_notes
             )
             self.status_label.config(text="Serial running...")
             self.start_button.config(state="disabled")
             self.stop_button.config(state="normal")
 
+    def get_snapshot(self):
+        receiver = self.serial_receiver
+        return receiver.snapshot if receiver is not None else None
+
+    def set_status(self, text):
+        if self.serial_receiver:
+            self.status_label.config(text=text)
+
+    def on_config_change(self):
+        # Compile a new routing plan; the receiver swaps it in atomically.
+        if self.serial_receiver:
+            self.serial_receiver.update_plan()
+
     def stop_serial(self):
         if self.serial_receiver:
             self.serial_receiver.stop()
@@ -206,6 +287,7 @@ class GlovePanel(tk.Frame):
             self.stop_button.config(state="disabled")
 
     def on_close(self):
+        self.monitor.close()
         self.stop_serial()
 
 class App:
@@ -213,8 +295,10 @@ class App:
         self.root = root
         self.root.title("Music Maker Configuration")
 
-        # Create a single shared MidiHandler.
-        self.shared_midi_handler = MidiHandler(default_velocity=100)
+        # Create a single shared MidiHandler; its dispatcher thread serializes
+        # output from both gloves (notes ahead of CCs). The port itself is opened
+        # (and reopened after unplugging) in the background.
+        self.shared_midi_handler = MidiHandler(default_velocity=100, dispatcher=True, open_port=False)
 
         # Global Scale Selection Panel at the top
         self.scale_frame = tk.LabelFrame(root, text="Scale Selection")
@@ -225,45 +309,166 @@ class App:
 
         root_label = tk.Label(self.scale_frame, text="Root Note:")
         root_label.pack(side="left", padx=5)
-        for note in ["A", "B", "C", "D", "E", "F", "G"]:
+        for note in ROOTS:
             btn = tk.Radiobutton(self.scale_frame, text=note, variable=self.selected_root, value=note, command=self.update_scale)
             btn.pack(side="left", padx=2)
 
         mode_label = tk.Label(self.scale_frame, text="Mode:")
         mode_label.pack(side="left", padx=10)
-        for mode in ["Major", "Minor"]:
-            btn = tk.Radiobutton(self.scale_frame, text=mode, variable=self.selected_mode, value=mode, command=self.update_scale)
-            btn.pack(side="left", padx=2)
+        self.mode_combo = ttk.Combobox(self.scale_frame, values=MODE_NAMES, textvariable=self.selected_mode,
+                                       state="readonly", width=16)
+        self.mode_combo.pack(side="left", padx=2)
+        self.mode_combo.bind("<<ComboboxSelected>>", lambda e: self.update_scale())
+        tk.Label(self.scale_frame, text="Octave:").pack(side="left", padx=10)
+        self.octave_var = tk.StringVar(value="3")
+        tk.Spinbox(self.scale_frame, from_=OCTAVES[0], to=OCTAVES[-1], width=3, textvariable=self.octave_var,
+                   command=self.update_scale).pack(side="left", padx=2)
+        # Held notes follow a key change to their new pitch, or are released.
+        self.retune_var = tk.BooleanVar(value=True)
+        tk.Checkbutton(self.scale_frame, text="Retune held notes", variable=self.retune_var,
+                       command=self.update_held_notes).pack(side="left", padx=10)
+
+        # MIDI clock and note quantization
+        self.clock = ClockEngine(self.shared_midi_handler)
+        self.clock_frame = tk.LabelFrame(root, text="Clock")
+        self.clock_frame.pack(fill="x", padx=5, pady=5)
+        tk.Label(self.clock_frame, text="BPM:").pack(side="left", padx=5)
+        self.bpm_var = tk.StringVar(value="120")
+        tk.Spinbox(self.clock_frame, from_=20, to=300, width=5, textvariable=self.bpm_var,
+                   command=self.update_bpm).pack(side="left", padx=2)
+        tk.Label(self.clock_frame, text="Quantize:").pack(side="left", padx=10)
+        self.quantize_combo = ttk.Combobox(self.clock_frame, values=list(QUANTIZE_GRIDS), state="readonly", width=6)
+        self.quantize_combo.set("off")
+        self.quantize_combo.pack(side="left", padx=2)
+        self.quantize_combo.bind("<<ComboboxSelected>>", lambda e: self.update_quantize())
+        self.clock_button = tk.Button(self.clock_frame, text="Start Clock", command=self.toggle_clock)
+        self.clock_button.pack(side="left", padx=10)
+        self.clock_label = tk.Label(self.clock_frame, text="", anchor="w")
+        self.clock_label.pack(side="left", fill="x", padx=5)
+
+        # One event loop thread reads every glove; the bridge brings status back to Tk.
+        self.hub = ReceiverHub()
+        self.hub.start()
+        self.bridge = TkBridge(root)
+
+        self.midi_status_label = tk.Label(root, text="MIDI: connecting...", anchor="w")
+        self.midi_status_label.pack(side="bottom", fill="x", padx=5)
+        self.midi_connection = ConnectionManager(
+            self.shared_midi_handler, on_status=self.bridge.callback(self.set_midi_status))
+        self.midi_connection.start()
+
+        # Latency percentiles, shown only when instrumentation is enabled
+        self.latency_label = None
+        if LATENCY.enabled:
+            self.latency_label = tk.Label(root, text="Latency: no samples", anchor="w", font=("TkFixedFont", 9))
+            self.latency_label.pack(side="bottom", fill="x", padx=5)
+            self.root.after(1000, self.update_latency)
 
         self.glove_container = tk.Frame(root)
         self.glove_container.pack(fill="both", expand=True, padx=5, pady=5)
 
-        self.glove1_panel = GlovePanel(self.glove_container, glove_name="Glove 1", port="COM5", midi_handler=self.shared_midi_handler)
-        self.glove1_panel.pack(side="left", fill="both", expand=True, padx=5, pady=5)
-
-        self.glove2_panel = GlovePanel(self.glove_container, glove_name="Glove 2", port="COM4", midi_handler=self.shared_midi_handler)
-        self.glove2_panel.pack(side="left", fill="both", expand=True, padx=5, pady=5)
+        self.network_sender = None  # one UDP socket for every networked glove
+        self.glove_panels = []
+        for glove in GLOVES:
+            network = None
+            if glove.get("network"):
+                if self.network_sender is None:
+                    self.network_sender = NetworkSender()
+                network = NetworkOutput(self.network_sender, **glove["network"])
+            panel = GlovePanel(self.glove_container, glove_name=glove["name"], port=glove["port"],
+                               midi_handler=self.shared_midi_handler, hub=self.hub, bridge=self.bridge,
+                               worker=glove.get("worker", False), clock=self.clock, network=network,
+                               gesture_library=glove.get("gestures"), calibration=glove.get("calibration"),
+                               strikes=glove.get("strikes"))
+            panel.pack(side="left", fill="both", expand=True, padx=5, pady=5)
+            self.glove_panels.append(panel)
 
         self.update_scale()
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
 
     def update_scale(self):
-        scale = compute_scale(self.selected_root.get(), self.selected_mode.get())
-        if len(scale) >= 8:
-            self.glove1_panel.config_ui.set_pressure_notes(scale[0:4])
-            self.glove2_panel.config_ui.set_pressure_notes(scale[4:8])
-        print("Updated scale:", scale)
+        try:
+            octave = int(self.octave_var.get())
+            count = min(4 * len(self.glove_panels), SCALE_DEGREES)
+            scale = compute_scale(self.selected_root.get(), self.selected_mode.get(), octave, count)
+        except ValueError:
+            return
+        # Four scale notes per glove: Glove 1 gets notes 1-4, Glove 2 notes 5-8.
+        # Receivers move held notes to the new key on their next frame.
+        for i, panel in enumerate(self.glove_panels):
+            notes = scale[4 * i:4 * i + 4]
+            if len(notes) == 4:
+                panel.config_ui.set_pressure_notes(notes)
+        LOG.info(f"Updated scale: {scale}")
+
+    def update_latency(self):
+        parts = []
+        for stage in (TOTAL, SEND):
+            hist = LATENCY.histograms[stage]
+            if hist.count:
+                stat = hist.as_dict()
+                parts.append(f"{stage} p50 {stat['p50_us']:.0f} / p99 {stat['p99_us']:.0f} / "
+                             f"max {stat['max_us']:.0f} us")
+        self.latency_label.config(text="Latency: " + ("; ".join(parts) or "no samples"))
+        self.root.after(1000, self.update_latency)
+
+    def update_held_notes(self):
+        held_notes = "retune" if self.retune_var.get() else "release"
+        for panel in self.glove_panels:
+            panel.held_notes = held_notes
+            if panel.serial_receiver is not None:
+                panel.serial_receiver.held_notes = held_notes
+
+    def update_bpm(self):
+        try:
+            bpm = float(self.bpm_var.get())
+        except ValueError:
+            return
+        if 20 <= bpm <= 300:
+            self.clock.set_bpm(bpm)
+
+    def update_quantize(self):
+        self.clock.set_quantize(QUANTIZE_GRIDS[self.quantize_combo.get()])
+
+    def toggle_clock(self):
+        if self.clock.running:
+            self.clock.stop()
+            self.clock_button.config(text="Start Clock")
+        else:
+            self.update_bpm()
+            self.clock.reset_stats()
+            self.clock.start()
+            self.clock_button.config(text="Stop Clock")
+            self.root.after(1000, self.update_clock_stats)
+
+    def update_clock_stats(self):
+        if not self.clock.running:
+            return
+        self.clock_label.config(text=self.clock.summary())
+        self.root.after(1000, self.update_clock_stats)
+
+    def set_midi_status(self, text):
+        self.midi_status_label.config(text=f"MIDI: {text}")
 
     def on_closing(self):
-        self.glove1_panel.on_close()
-        self.glove2_panel.on_close()
+        for panel in self.glove_panels:
+            panel.on_close()
+        self.clock.stop()
+        self.hub.stop()
+        self.midi_connection.stop()
+        self.bridge.close()
+        self.shared_midi_handler.close()
+        if self.network_sender is not None:
+            self.network_sender.close()
         self.root.destroy()
 
 if __name__ == "__main__":
+    # GLOVE_LATENCY_LOG=latency.log enables latency instrumentation and dumps
+    # the per-stage percentiles to that file every 10 seconds.
+    latency_log = os.environ.get("GLOVE_LATENCY_LOG")
+    if latency_log:
+        LATENCY.enable(dump_path=latency_log)
     root = tk.Tk()
     app = App(root)
     root.mainloop()
-if __name__ == "__main__":
-    root = tk.Tk()
-    app = App(root)
-    root.mainloop()
+    LATENCY.disable()
@@ -1,47 +1,453 @@
-import mido
+import os
+import threading
+import time
+from collections import deque
+
+from lazy_imports import lazy_import
+from log_writer import LOG, DEBUG
+from latency import LATENCY, SEND
+
+mido = lazy_import("mido")  # loaded when a port is opened or a message built
+
+NOTE_OFF = 0x80
+NOTE_ON = 0x90
+CONTROL_CHANGE = 0xB0
+PROGRAM_CHANGE = 0xC0
+
+# System real-time messages; they may interleave anything and leave running status alone.
+REALTIME = {"clock": b"\xf8", "start": b"\xfa", "continue": b"\xfb", "stop": b"\xfc"}
+
+# Port names "raw:<device path>" write straight to a raw MIDI device node.
+RAW_PREFIX = "raw:"
+# Module of mido's rtmidi output ports, whose MidiOut takes encoded messages.
+RTMIDI_BACKEND = "mido.backends.rtmidi"
+
+DATA_BYTES = tuple(bytes((value,)) for value in range(128))
+
+_templates = {}
+
+
+def template(status, channel=0) -> tuple:
+    """
+    Encoded message prefixes (status | channel, number) for numbers 0-127,
+    built once per (type, channel). A note-on is template(NOTE_ON)[note] +
+    DATA_BYTES[velocity]; for program change the prefix is the whole message.
+    """
+    key = status | channel
+    prefixes = _templates.get(key)
+    if prefixes is None:
+        prefixes = _templates[key] = tuple(bytes((key, number)) for number in range(128))
+    return prefixes
+
+
+def running_status(messages, status=None):
+    """
+    Joins encoded messages into one byte stream, omitting status bytes that
+    repeat the previous channel message's. Returns (stream, status in effect
+    afterwards).
+    """
+    parts = []
+    for data in messages:
+        first = data[0]
+        if first == status:
+            parts.append(data[1:])
+        else:
+            parts.append(data)
+            if first < 0xF0:
+                status = first
+            elif first < 0xF8:
+                status = None  # system common messages cancel running status
+    return b"".join(parts), status
+
+
+class RawMidiPort:
+    """
+    Output to a raw MIDI device node, e.g. ALSA's /dev/snd/midiC1D0. It is a
+    byte stream, so MidiHandler uses running status and writes whole batches.
+    """
+    closed = False
+
+    def __init__(self, path):
+        self.name = RAW_PREFIX + path
+        self.fd = os.open(path, os.O_WRONLY)
+
+    def write(self, data):
+        written = os.write(self.fd, data)
+        while written < len(data):
+            data = data[written:]
+            written = os.write(self.fd, data)
+
+    def send(self, msg):
+        self.write(bytes(msg.bytes()))
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            os.close(self.fd)
+
+
+def port_writer(port):
+    """
+    Fastest way to hand encoded messages to an output port. Returns
+    (write(data), is_stream): byte-stream ports take any number of messages
+    per write, rtmidi takes exactly one, and other mido ports get a
+    mido.Message per message.
+    """
+    if port is None:
+        return None, False
+    write = getattr(port, "write", None)
+    if write is not None:
+        return write, True
+    if type(port).__module__ == RTMIDI_BACKEND:
+        # The backend's private rtmidi.MidiOut; anything unexpected there
+        # (another mido version) falls back to port.send.
+        send_message = getattr(getattr(port, "_rt", None), "send_message", None)
+        if callable(send_message):
+            return send_message, False
+    from_bytes = mido.Message.from_bytes
+    send = port.send
+    return lambda data: send(from_bytes(data)), False
+
+
+class LatencyStat:
+    """
+    Fixed-memory running latency statistics (nanoseconds).
+    """
+    __slots__ = ("count", "total_ns", "max_ns", "last_ns")
+
+    def __init__(self):
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+        self.last_ns = 0
+
+    def add(self, latency_ns):
+        self.count += 1
+        self.total_ns += latency_ns
+        self.last_ns = latency_ns
+        if latency_ns > self.max_ns:
+            self.max_ns = latency_ns
+
+    def as_dict(self) -> dict:
+        mean_us = self.total_ns / self.count / 1000 if self.count else 0.0
+        return {"count": self.count, "mean_us": mean_us, "max_us": self.max_ns / 1000,
+                "last_us": self.last_ns / 1000}
+
+
+class MidiDispatcher:
+    """
+    Single output thread for a MidiHandler shared by several receivers.
+
+    Producers only enqueue encoded messages (bytes). The dispatcher thread
+    sends note on/off events first, in arrival order, and control changes once
+    per tick: pending CCs for the same (channel, controller) are coalesced to
+    the latest value, so a burst of motion data can't delay note-ons on a slow
+    DIN link. Whatever is due at once goes out as one batch (a single write on
+    byte-stream ports).
+    """
+    def __init__(self, send_many, tick_interval=0.002):
+        """
+        :param send_many: Callable sending a list of encoded messages to the port.
+        :param tick_interval: Seconds between CC flushes.
+        """
+        self._send_many = send_many
+        self.tick_interval = tick_interval
+        self._notes = deque()           # (message, enqueue time ns)
+        self._ccs = {}                  # (channel, control) -> (latest message, first enqueue time ns)
+        self._cc_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._note_wake = threading.Event()
+        self._running = True
+        self.coalesced = 0
+        self.note_latency = LatencyStat()
+        self.cc_latency = LatencyStat()
+        self.thread = threading.Thread(target=self._run, name="MidiDispatcher", daemon=True)
+        self.thread.start()
+
+    def put_note(self, msg):
+        self._notes.append((msg, time.perf_counter_ns()))
+        self._note_wake.set()
+        self._wake.set()
+
+    def put_control_change(self, channel, control, msg):
+        key = (channel, control)
+        with self._cc_lock:
+            pending = self._ccs.get(key)
+            if pending is None:
+                self._ccs[key] = (msg, time.perf_counter_ns())
+            else:
+                # Keep the original enqueue time so latency reflects the wait.
+                self._ccs[key] = (msg, pending[1])
+                self.coalesced += 1
+        self._wake.set()
+
+    def queue_depth(self) -> int:
+        return len(self._notes) + len(self._ccs)
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self.queue_depth(),
+            "coalesced": self.coalesced,
+            "note_latency": self.note_latency.as_dict(),
+            "cc_latency": self.cc_latency.as_dict(),
+        }
+
+    def stop(self):
+        self._running = False
+        self._wake.set()
+        self._note_wake.set()
+        self.thread.join(timeout=1)
+
+    def _send_timed(self, batch, stat):
+        self._send_many([msg for msg, _ in batch])
+        sent_ns = time.perf_counter_ns()
+        for _, enqueued_ns in batch:
+            latency_ns = sent_ns - enqueued_ns
+            stat.add(latency_ns)
+            if LATENCY.enabled:
+                LATENCY.add(SEND, latency_ns)
+
+    def _drain_notes(self):
+        notes = self._notes
+        batch = []
+        while notes:
+            batch.append(notes.popleft())
+        if batch:
+            self._send_timed(batch, self.note_latency)
+
+    def _run(self):
+        tick_ns = int(self.tick_interval * 1e9)
+        next_cc_tick = 0
+        while self._running:
+            self._wake.wait(0.1)
+            self._wake.clear()
+            self._note_wake.clear()
+            self._drain_notes()
+            if not self._ccs:
+                continue
+            now = time.perf_counter_ns()
+            if now < next_cc_tick:
+                # Let CCs coalesce until the tick, but wake up for notes.
+                self._note_wake.wait((next_cc_tick - now) / 1e9)
+                self._wake.set()
+                continue
+            next_cc_tick = now + tick_ns
+            with self._cc_lock:
+                ccs, self._ccs = self._ccs, {}
+            self._drain_notes()
+            self._send_timed(list(ccs.values()), self.cc_latency)
+        self._drain()
+
+    def _drain(self):
+        """
+        Sends what is still queued when the dispatcher stops, notes first, so
+        the last note-offs and CC values reach the port.
+        """
+        self._drain_notes()
+        with self._cc_lock:
+            ccs, self._ccs = self._ccs, {}
+        if ccs:
+            self._send_timed(list(ccs.values()), self.cc_latency)
+
+
+# Output port opened by default; adjust to your MIDI interface.
+DEFAULT_PORT_NAME = "ESI MIDIMATE eX 2"
+
 
 class MidiHandler:
-    def __init__(self, default_velocity=100):
+    def __init__(self, default_velocity=100, dispatcher=False, tick_interval=0.002,
+                 port_name=DEFAULT_PORT_NAME, open_port=True, channel=0, use_running_status=True):
         """
         default_velocity is an integer between 0-127 (standard MIDI velocity range).
+        dispatcher: if True, send_* calls only enqueue and a single MidiDispatcher
+        thread does the output (notes before CCs, CCs coalesced per tick).
+        open_port: if False, the port is left closed so a ConnectionManager can
+        open it in the background (sends are dropped until then).
+        channel: MIDI channel (0-15) of every message.
+        use_running_status: omit repeated status bytes on byte-stream ports.
         """
-        print(mido.get_output_names())
-        ports = mido.get_output_names()
-        print("Available ports:", ports)
-        
         self.default_velocity = default_velocity
+        self.port_name = port_name
+        self.channel = channel
+        self.use_running_status = use_running_status
+        self._note_on = template(NOTE_ON, channel)
+        self._note_off = template(NOTE_OFF, channel)
+        self._control_change = template(CONTROL_CHANGE, channel)
+        self._program_change = template(PROGRAM_CHANGE, channel)
+        self._send_lock = threading.Lock()
+        self.midi_out = None
+        self.send_errors_since_open = 0
+        self.on_send_error = None  # set by ConnectionManager
+        if open_port:
+            ports = mido.get_output_names()
+            LOG.info(f"Available ports: {ports}")
+            try:
+                self.open(port_name)
+            except Exception as e:
+                LOG.error(f"MIDI initialization failed: {e}")
+        self.dispatcher = MidiDispatcher(self._send_many, tick_interval) if dispatcher else None
+
+    @property
+    def midi_out(self):
+        return self._midi_out
+
+    @midi_out.setter
+    def midi_out(self, port):
+        self._midi_out = port
+        self._write, self._stream = port_writer(port)
+        self._stream = self._stream and self.use_running_status
+        self._status = None  # running status on the port
+
+    def open(self, port_name):
+        """
+        Opens (or reopens) the output port. Raises on failure.
+        """
+        if port_name.startswith(RAW_PREFIX):
+            midi_out = RawMidiPort(port_name[len(RAW_PREFIX):])
+        else:
+            midi_out = mido.open_output(port_name)
+        with self._send_lock:
+            old, self.midi_out = self.midi_out, midi_out
+            self.send_errors_since_open = 0
+        if old is not None:
+            old.close()
+
+    def close_port(self):
+        with self._send_lock:
+            midi_out, self.midi_out = self.midi_out, None
+        if midi_out is not None:
+            try:
+                midi_out.close()
+            except Exception as e:
+                LOG.error(f"MIDI close error: {e}")
+
+    def _send_failed(self, data, e):
+        LOG.error(f"MIDI send error ({data.hex(' ')}): {e}")
+        self.send_errors_since_open += 1
+        if self.on_send_error is not None:
+            self.on_send_error()
+
+    def _send(self, data):
         try:
-            self.midi_out = mido.open_output("ESI MIDIMATE eX 2")  # Adjust your MIDI port as needed
+            with self._send_lock:
+                write = self._write
+                if write is None:
+                    return
+                if self._stream:
+                    first = data[0]
+                    if first == self._status:
+                        write(data[1:])
+                        return
+                    if first < 0xF0:
+                        self._status = first
+                    elif first < 0xF8:
+                        self._status = None
+                write(data)
         except Exception as e:
-            print("MIDI initialization failed:", e)
-            self.midi_out = None
+            self._status = None
+            self._send_failed(data, e)
+
+    def _send_many(self, messages):
+        """
+        Sends a batch of encoded messages: one write with running status on
+        byte-stream ports, one call per message otherwise.
+        """
+        try:
+            with self._send_lock:
+                write = self._write
+                if write is None:
+                    return
+                if self._stream:
+                    data, self._status = running_status(messages, self._status)
+                    write(data)
+                else:
+                    for data in messages:
+                        write(data)
+        except Exception as e:
+            self._status = None
+            self._send_failed(b"".join(messages), e)
+
+    def _send_direct(self, data):
+        """
+        Sends without a dispatcher, timing the port write when instrumented.
+        """
+        if LATENCY.enabled:
+            start_ns = time.perf_counter_ns()
+            self._send(data)
+            LATENCY.add(SEND, time.perf_counter_ns() - start_ns)
+        else:
+            self._send(data)
+
+    def send_midi_realtime(self, message_type):
+        """
+        Sends a system real-time message ("clock", "start", "stop", "continue")
+        straight to the port, ahead of anything queued in the dispatcher.
+        """
+        if self._write is None:
+            return
+        data = REALTIME.get(message_type)
+        if data is None:
+            LOG.error(f"MIDI send error: unknown real-time message {message_type!r}")
+            return
+        self._send(data)
 
     def send_midi_note_on(self, note: int, velocity=None):
         """
         Sends a MIDI note_on message. velocity defaults to self.default_velocity if not provided.
         """
-        if not self.midi_out:
+        if self._write is None:
             return
         if velocity is None:
             velocity = self.default_velocity
         try:
-            msg = mido.Message('note_on', note=note, velocity=velocity)
-            self.midi_out.send(msg)
-            print("SINGAL SENT")
-        except Exception as e:
-            print("MIDI send error (note_on):", e)
+            if not (0 <= note <= 127 and 0 <= velocity <= 127):
+                raise ValueError("data byte must be in range 0..127")
+            msg = self._note_on[note] + DATA_BYTES[velocity]
+        except (TypeError, ValueError) as e:
+            LOG.error(f"MIDI send error (note_on): {e}")
+            return
+        if self.dispatcher is not None:
+            self.dispatcher.put_note(msg)
+        else:
+            self._send_direct(msg)
+        if LOG.verbosity >= DEBUG:
+            LOG.debug(f"MIDI note_on sent: {note} ({velocity})")
 
     def send_midi_note_off(self, note: int):
         """
         Sends a MIDI note_off message (velocity=0).
         """
-        if not self.midi_out:
+        if self._write is None:
             return
         try:
-            msg = mido.Message('note_off', note=note, velocity=0)
-            self.midi_out.send(msg)
-        except Exception as e:
-            print("MIDI send error (note_off):", e)
+            if not 0 <= note <= 127:
+                raise ValueError("data byte must be in range 0..127")
+            msg = self._note_off[note] + DATA_BYTES[0]
+        except (TypeError, ValueError) as e:
+            LOG.error(f"MIDI send error (note_off): {e}")
+            return
+        if self.dispatcher is not None:
+            self.dispatcher.put_note(msg)
+        else:
+            self._send_direct(msg)
+
+    def send_midi_program_change(self, program: int):
+        """
+        Sends a MIDI program_change (program 0-127), in order with the notes.
+        """
+        if self._write is None:
+            return
+        try:
+            if not 0 <= program <= 127:
+                raise ValueError("data byte must be in range 0..127")
+            msg = self._program_change[program]
+        except (TypeError, ValueError) as e:
+            LOG.error(f"MIDI send error (program_change): {e}")
+            return
+        if self.dispatcher is not None:
+            self.dispatcher.put_note(msg)
+        else:
+            self._send_direct(msg)
 
     def send_midi_control_change(self, controller: int, value: int):
         """
@@ -49,10 +455,34 @@ class MidiHandler:
             controller is e.g. 1 for Mod Wheel, 7 for Volume, etc.
             value is 0-127
         """
-        if not self.midi_out:
+        if self._write is None:
             return
         try:
-            msg = mido.Message('control_change', control=controller, value=value)
-            self.midi_out.send(msg)
-        except Exception as e:
-            print("MIDI send error (control_change):", e)
+            if not (0 <= controller <= 127 and 0 <= value <= 127):
+                raise ValueError(f"invalid CC {controller}={value}")
+            msg = self._control_change[controller] + DATA_BYTES[value]
+        except (TypeError, ValueError) as e:
+            LOG.error(f"MIDI send error (control_change): {e}")
+            return
+        if self.dispatcher is not None:
+            self.dispatcher.put_control_change(self.channel, controller, msg)
+        else:
+            self._send_direct(msg)
+
+    def queue_depth(self) -> int:
+        """
+        Number of events waiting in the dispatcher (0 without a dispatcher).
+        """
+        return self.dispatcher.queue_depth() if self.dispatcher is not None else 0
+
+    def stats(self) -> dict:
+        """
+        Dispatcher queue depth, coalesced CC count and per-event dispatch latency.
+        """
+        return self.dispatcher.stats() if self.dispatcher is not None else {"queue_depth": 0}
+
+    def close(self):
+        if self.dispatcher is not None:
+            self.dispatcher.stop()
+            self.dispatcher = None
+        self.close_port()
@@ -0,0 +1,114 @@
+# monitor.py
+"""
+Live sensor monitor.
+
+Each SerialReceiver publishes every frame into its FrameSnapshot
+(data_parser.py), a lock-free double buffer. MonitorPanel reads the latest
+snapshot on a fixed root.after cadence (30 Hz by default) regardless of the
+sensor rate, and only moves existing canvas items, so it neither slows the
+receiver nor floods the Tk event queue.
+"""
+import tkinter as tk
+from array import array
+
+from data_parser import FIELD_INDEX, NUM_FIELDS
+
+MONITOR_FIELDS = ("F1", "F2", "F3", "F4", "AccX", "AccY", "AccZ", "GyroX", "GyroY", "GyroZ")
+
+# Displayed range (lo, hi) by field name prefix
+DISPLAY_RANGES = (
+    ("F", (0.0, 1.0)),
+    ("P", (0.0, 1.0)),
+    ("Acc", (-2.0, 2.0)),
+    ("Gyro", (-500.0, 500.0)),
+)
+
+
+def display_range(field):
+    for prefix, value in DISPLAY_RANGES:
+        if field.startswith(prefix):
+            return value
+    return (-1.0, 1.0)
+
+
+class MonitorPanel(tk.Frame):
+    """
+    Bars and sparklines for each sensor plus the active notes of one glove.
+    """
+    def __init__(self, master, get_snapshot, *args, rate_hz=30, history=90, width=260, **kwargs):
+        """
+        :param get_snapshot: Callable returning the FrameSnapshot to show, or None.
+        :param rate_hz: Redraw rate.
+        :param history: Sparkline length in redraws.
+        """
+        super().__init__(master, *args, **kwargs)
+        self.get_snapshot = get_snapshot
+        self.interval_ms = int(1000 / rate_hz)
+        self.history = history
+        self.row_height = 16
+        self.label_width = 44
+        self.bar_width = 70
+        self.spark_x = self.label_width + self.bar_width + 8
+        self.spark_width = width - self.spark_x - 4
+        self.values = array('d', bytes(8 * NUM_FIELDS))
+        self.last_seq = -1
+        self._after_id = None
+
+        height = self.row_height * len(MONITOR_FIELDS) + 4
+        self.canvas = tk.Canvas(self, width=width, height=height, highlightthickness=0)
+        self.canvas.pack(fill="x")
+        self.notes_label = tk.Label(self, text="Notes: -", anchor="w")
+        self.notes_label.pack(fill="x")
+
+        self.rows = []
+        for row, field in enumerate(MONITOR_FIELDS):
+            y = row * self.row_height + 2
+            self.canvas.create_text(2, y + self.row_height / 2, text=field, anchor="w", font=("TkDefaultFont", 8))
+            self.canvas.create_rectangle(self.label_width, y + 2, self.label_width + self.bar_width,
+                                         y + self.row_height - 2, outline="#999")
+            bar = self.canvas.create_rectangle(self.label_width, y + 3, self.label_width, y + self.row_height - 3,
+                                               fill="#4a90d9", width=0)
+            spark = self.canvas.create_line(self.spark_x, y + self.row_height / 2,
+                                            self.spark_x + 1, y + self.row_height / 2, fill="#2a7a2a")
+            lo, hi = display_range(field)
+            self.rows.append((FIELD_INDEX[field], y, lo, hi, bar, spark, [0.5] * history))
+
+        self.schedule()
+
+    def schedule(self):
+        self._after_id = self.after(self.interval_ms, self.redraw)
+
+    def redraw(self):
+        try:
+            snapshot = self.get_snapshot()
+            if snapshot is not None:
+                seq = snapshot.read(self.values)
+                if seq != self.last_seq:
+                    self.last_seq = seq
+                    self._draw(snapshot)
+        finally:
+            # One failed redraw must not stop the monitor.
+            self.schedule()
+
+    def _draw(self, snapshot):
+        canvas = self.canvas
+        h = self.row_height
+        step = self.spark_width / (self.history - 1)
+        for index, y, lo, hi, bar, spark, history in self.rows:
+            level = (self.values[index] - lo) / (hi - lo)
+            level = 0.0 if level < 0.0 else 1.0 if level > 1.0 else level
+            canvas.coords(bar, self.label_width, y + 3, self.label_width + level * self.bar_width, y + h - 3)
+            history.pop(0)
+            history.append(level)
+            points = []
+            for i, value in enumerate(history):
+                points.append(self.spark_x + i * step)
+                points.append(y + h - 2 - value * (h - 4))
+            canvas.coords(spark, *points)
+        notes = snapshot.active_notes()
+        self.notes_label.config(text="Notes: " + (" ".join(str(n) for n in notes) if notes else "-"))
+
+    def close(self):
+        if self._after_id is not None:
+            self.after_cancel(self._after_id)
+            self._after_id = None
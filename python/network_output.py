@@ -0,0 +1,268 @@
+# network_output.py
+"""
+MIDI over UDP, for software instruments on other machines.
+
+A NetworkOutput stands in for a glove's MidiHandler (SerialReceiver(network=...)):
+send_* calls only append the MIDI bytes to a buffer, and SerialReceiver calls
+flush() once per frame, so everything one frame produces leaves as a single
+datagram. Two packet formats:
+
+    "osc"      an OSC bundle (immediate time tag) of messages
+               <address> ,m <port 0, status, data1, data2>
+    "rtpmidi"  an RTP packet (payload type 97) whose MIDI command section holds
+               the frame's messages with zero delta times and running status,
+               as in RFC 6295. There is no recovery journal and no AppleMIDI
+               session handshake: receivers must accept plain RTP-MIDI streams.
+
+All outputs share one NetworkSender, i.e. one UDP socket for every glove and
+destination. Large frames are split at MAX_DATAGRAM bytes. batch=False sends
+one datagram per message (for comparison, see benchmarks/bench_network.py).
+"""
+import os
+import socket
+import struct
+import threading
+import time
+
+from latency import LATENCY, SEND
+from log_writer import LOG
+
+PROTOCOLS = ("osc", "rtpmidi")
+
+# Stay below a typical Ethernet MTU minus IP/UDP headers.
+MAX_DATAGRAM = 1400
+
+NOTE_OFF = 0x80
+NOTE_ON = 0x90
+CONTROL_CHANGE = 0xB0
+PROGRAM_CHANGE = 0xC0
+
+_OSC_BUNDLE = b"#bundle\x00" + struct.pack(">Q", 1)  # time tag 1 = immediately
+_OSC_MIDI_TAGS = b",m\x00\x00"
+
+_RTP_PAYLOAD_TYPE = 97
+_RTP_CLOCK_HZ = 10000  # RTP timestamp units per second
+
+
+def message_length(status) -> int:
+    """
+    Length of a channel message: program change and channel pressure have one
+    data byte, the others two.
+    """
+    return 2 if status & 0xE0 == 0xC0 else 3
+
+
+def _osc_string(text) -> bytes:
+    data = text.encode("ascii") + b"\x00"
+    return data + b"\x00" * (-len(data) % 4)
+
+
+class NetworkSender:
+    """
+    One UDP socket shared by every NetworkOutput, with send counters.
+    """
+    def __init__(self):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setblocking(False)
+        self.packets = 0
+        self.bytes = 0
+        self.errors = 0
+        self.dropped = 0
+        self._failing = False
+
+    def send(self, data, address):
+        try:
+            self.sock.sendto(data, address)
+        except BlockingIOError:
+            # Socket buffer full: drop rather than stall the receive path.
+            self.dropped += 1
+            return
+        except OSError as e:
+            self.errors += 1
+            if not self._failing:
+                LOG.error(f"[Network] Send to {address[0]}:{address[1]} failed: {e}")
+                self._failing = True
+            return
+        if self._failing:
+            LOG.info(f"[Network] Sending to {address[0]}:{address[1]} again")
+            self._failing = False
+        self.packets += 1
+        self.bytes += len(data)
+
+    def stats(self) -> dict:
+        return {"packets": self.packets, "bytes": self.bytes, "errors": self.errors, "dropped": self.dropped}
+
+    def close(self):
+        self.sock.close()
+
+
+class NetworkOutput:
+    def __init__(self, sender, host, port, protocol="osc", address="/midi", channel=0,
+                 default_velocity=100, batch=True):
+        """
+        :param sender: Shared NetworkSender.
+        :param host: Destination host name or IP address.
+        :param port: Destination UDP port.
+        :param protocol: "osc" or "rtpmidi".
+        :param address: OSC address pattern of each message.
+        :param channel: MIDI channel (0-15) of notes and CCs.
+        :param default_velocity: Note-on velocity when none is given.
+        :param batch: Send each frame's messages as one datagram (flush());
+                      False sends every message at once.
+        """
+        if protocol not in PROTOCOLS:
+            raise ValueError(f"Unknown network protocol {protocol!r}; expected one of {PROTOCOLS}")
+        self.sender = sender
+        self.destination = (socket.gethostbyname(host), port)
+        self.protocol = protocol
+        self.channel = channel
+        self.default_velocity = default_velocity
+        self.batch = batch
+        self.messages = 0
+        self._pending = bytearray()  # raw MIDI messages
+        self._flush_lock = threading.Lock()
+        if protocol == "osc":
+            element = _osc_string(address) + _OSC_MIDI_TAGS
+            self._osc_element = struct.pack(">i", len(element) + 4) + element
+            self._osc_message = element  # without the bundle's size prefix
+            self._encode = self._encode_osc
+            self._per_packet = (MAX_DATAGRAM - len(_OSC_BUNDLE)) // (len(self._osc_element) + 4)
+        else:
+            self._rtp_seq = int.from_bytes(os.urandom(2), "big")
+            self._rtp_ssrc = int.from_bytes(os.urandom(4), "big")
+            self._encode = self._encode_rtp
+            self._per_packet = (MAX_DATAGRAM - 14) // 4  # 1 delta time + 3 bytes each, at most
+
+    @property
+    def midi_out(self):
+        """
+        The socket; lets readiness checks written for MidiHandler treat the
+        network output as always open.
+        """
+        return self.sender.sock
+
+    # -------------------------------
+    # MidiHandler interface
+    # -------------------------------
+    def send_midi_note_on(self, note: int, velocity=None):
+        if velocity is None:
+            velocity = self.default_velocity
+        try:
+            if not (0 <= note <= 127 and 0 <= velocity <= 127):
+                raise ValueError("data byte must be in range 0..127")
+            msg = bytes((NOTE_ON | self.channel, note, velocity))
+        except (TypeError, ValueError) as e:
+            LOG.error(f"Network send error (note_on): {e}")
+            return
+        self._add(msg)
+
+    def send_midi_note_off(self, note: int):
+        try:
+            if not 0 <= note <= 127:
+                raise ValueError("data byte must be in range 0..127")
+            msg = bytes((NOTE_OFF | self.channel, note, 0))
+        except (TypeError, ValueError) as e:
+            LOG.error(f"Network send error (note_off): {e}")
+            return
+        self._add(msg)
+
+    def send_midi_control_change(self, controller: int, value: int):
+        try:
+            if not (0 <= controller <= 127 and 0 <= value <= 127):
+                raise ValueError(f"invalid CC {controller}={value}")
+            msg = bytes((CONTROL_CHANGE | self.channel, controller, value))
+        except (TypeError, ValueError) as e:
+            LOG.error(f"Network send error (control_change): {e}")
+            return
+        self._add(msg)
+
+    def send_midi_program_change(self, program: int):
+        try:
+            if not 0 <= program <= 127:
+                raise ValueError("data byte must be in range 0..127")
+            msg = bytes((PROGRAM_CHANGE | self.channel, program))
+        except (TypeError, ValueError) as e:
+            LOG.error(f"Network send error (program_change): {e}")
+            return
+        self._add(msg)
+
+    def _add(self, msg):
+        # flush() may run on another thread (the hub's timer, a sequencer);
+        # appending under its lock keeps a message from landing in the buffer
+        # it is swapping out.
+        with self._flush_lock:
+            self._pending += msg
+            self.messages += 1
+        if not self.batch:
+            self.flush()
+
+    def flush(self):
+        """
+        Sends the messages collected since the last flush as one datagram
+        (several if they exceed MAX_DATAGRAM).
+        """
+        with self._flush_lock:
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, bytearray()
+            start_ns = time.perf_counter_ns() if LATENCY.enabled else 0
+            limit = self._per_packet * 2  # 2-3 bytes per message
+            start = 0
+            while len(pending) - start > limit:
+                # Split on a message boundary.
+                end = start
+                while end - start < limit:
+                    end += message_length(pending[end])
+                self.sender.send(self._encode(pending[start:end]), self.destination)
+                start = end
+            self.sender.send(self._encode(pending[start:]), self.destination)
+            if LATENCY.enabled:
+                LATENCY.add(SEND, time.perf_counter_ns() - start_ns)
+
+    # -------------------------------
+    # Packet formats
+    # -------------------------------
+    def _encode_osc(self, midi):
+        if not self.batch and len(midi) == message_length(midi[0]):
+            return self._osc_message + (b"\x00" + midi).ljust(4, b"\x00")
+        element = self._osc_element
+        parts = [_OSC_BUNDLE]
+        i = 0
+        while i < len(midi):
+            length = message_length(midi[i])
+            parts.append(element)
+            parts.append(b"\x00")
+            parts.append(midi[i:i + length])
+            if length == 2:
+                parts.append(b"\x00")
+            i += length
+        return b"".join(parts)
+
+    def _encode_rtp(self, midi):
+        commands = bytearray()
+        running = None
+        i = 0
+        while i < len(midi):
+            status = midi[i]
+            length = message_length(status)
+            if i:
+                commands.append(0)  # delta time
+            if status != running:
+                commands.append(status)
+                running = status
+            commands += midi[i + 1:i + length]
+            i += length
+        length = len(commands)
+        # B flag set: 12-bit length in two bytes. Z (first delta time) and J clear.
+        header = bytes((length,)) if length <= 15 else bytes((0x80 | length >> 8, length & 0xFF))
+        self._rtp_seq = (self._rtp_seq + 1) & 0xFFFF
+        timestamp = (time.perf_counter_ns() * _RTP_CLOCK_HZ // 1_000_000_000) & 0xFFFFFFFF
+        return struct.pack(">BBHII", 0x80, _RTP_PAYLOAD_TYPE, self._rtp_seq, timestamp,
+                           self._rtp_ssrc) + header + commands
+
+    def stats(self) -> dict:
+        return {"messages": self.messages, "destination": f"{self.destination[0]}:{self.destination[1]}",
+                "protocol": self.protocol, **self.sender.stats()}
+
+    def close(self):
+        self.flush()
@@ -0,0 +1,308 @@
+# offline_render.py
+"""
+Headless offline renderer: sensor captures -> Standard MIDI Files.
+
+Runs the same mapping as SerialReceiver.process_data (routing plan, note
+on/off edges, CC mapping through the plan's curve tables), vectorized with
+NumPy over whole capture chunks, and writes the result with mido.MidiFile.
+CC values go through the receiver's ControllerFilter (deadband, rate limit and
+settling, see cc_filter.py) with the capture's timestamps as the clock; only
+the first frames of each run of equal values reach it. No glove
+or MIDI port is needed. A directory of captures is rendered in parallel with a
+process pool, so rendering time scales with cores, not with playback length.
+
+    python offline_render.py fingers.txt square.txt -o renders/
+    python offline_render.py captures/ --config mapping.json --workers 8
+
+The config file is a JSON object in the same form as GlovePanel's config
+dict, e.g. {"P1": "C4", "F1": "1", "GyrX": "74"}, plus an optional "curves"
+entry of per-sensor response curves (see curves.py). --calibration applies a
+glove's calibration profile (see calibration.py) as SerialReceiver does, and
+--cc-deadband, --cc-max-rate and --cc-settle-frames its CC filter settings.
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import mido
+import numpy as np
+
+from cc_filter import ControllerFilter
+from data_parser import FIELD_INDEX, NUM_FIELDS, SENSOR_FIELDS, FrameParser, SensorFrame
+from recording import Recording
+from curves import LUT_LAST
+from calibration_profile import load_profile, profile_ranges
+from routing import ACTION_NOTE, CC_SENSORS, compile_plan, frame_from_dict
+
+CHUNK_FRAMES = 65536
+TICKS_PER_BEAT = 480
+TEMPO = 500000  # microseconds per beat (120 BPM)
+TEXT_INTERVAL = 0.1  # seconds between lines of a text capture
+CAPTURE_EXTENSIONS = (".txt", ".mmrec")
+
+# Used when no config file is given: every CC sensor on CC 20, 21, ...
+DEFAULT_CONFIG = {sensor: str(cc) for cc, sensor in enumerate(CC_SENSORS, start=20)}
+
+
+# -------------------------------
+# Capture readers (chunks of timestamps + values)
+# -------------------------------
+def read_text_chunks(path, interval_s=TEXT_INTERVAL, chunk_frames=CHUNK_FRAMES):
+    """
+    Yields (times_s, values) chunks from a text capture. values has one row per
+    frame in SENSOR_FIELDS order.
+    """
+    parser = FrameParser()
+    values = np.zeros((chunk_frames, NUM_FIELDS))
+    frame = SensorFrame()
+    row = 0
+    total = 0
+    with open(path, "r") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                parsed = parser.parse(line, frame)
+            except ValueError:
+                continue
+            if not isinstance(parsed, SensorFrame):
+                parsed = frame_from_dict(parsed)
+            values[row] = parsed.values
+            row += 1
+            if row == chunk_frames:
+                yield (np.arange(total, total + row) * interval_s, values[:row].copy())
+                total += row
+                row = 0
+    if row:
+        yield np.arange(total, total + row) * interval_s, values[:row].copy()
+
+
+def read_recording_chunks(path, chunk_frames=CHUNK_FRAMES):
+    """
+    Yields (times_s, values) chunks from a recording through a NumPy memmap.
+    """
+    with Recording(path) as recording:
+        fields, count, offset = recording.fields, recording.count, recording.data_offset
+    dtype = np.dtype([("t", "<i8"), ("v", "<f8", (len(fields),))])
+    records = np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=(count,))
+    columns = [(column, FIELD_INDEX[name]) for column, name in enumerate(fields) if name in FIELD_INDEX]
+    for start in range(0, count, chunk_frames):
+        chunk = records[start:start + chunk_frames]
+        if fields == SENSOR_FIELDS:
+            values = np.array(chunk["v"])
+        else:
+            values = np.zeros((len(chunk), NUM_FIELDS))
+            for column, index in columns:
+                values[:, index] = chunk["v"][:, column]
+        yield chunk["t"] / 1e9, values
+
+
+def read_chunks(path, interval_s=TEXT_INTERVAL):
+    if path.endswith(".mmrec"):
+        return read_recording_chunks(path)
+    return read_text_chunks(path, interval_s)
+
+
+# -------------------------------
+# Vectorized mapping
+# -------------------------------
+class ChunkRenderer:
+    """
+    Applies a routing plan to consecutive chunks, carrying note and CC state
+    across chunk boundaries. Produces events as (time_s, order, kind, number, value)
+    where `order` is the plan position, so events of one frame keep the order
+    process_data would send them in.
+    """
+    def __init__(self, plan, velocity=100, cc_options=None):
+        """
+        :param plan: Routing plan from compile_plan().
+        :param velocity: Note-on velocity.
+        :param cc_options: ControllerFilter keyword arguments (deadband,
+                           max_rate_hz, settle_frames); its defaults match
+                           SerialReceiver's.
+        """
+        self.plan = plan
+        self.velocity = velocity
+        self.note_state = {entry: False for entry in plan if entry[1] == ACTION_NOTE}
+        self.cc_filter = ControllerFilter(**(cc_options or {}))
+        self.last_cc = {}  # plan position -> last value sent
+        self.tables = {order: np.frombuffer(entry[6], dtype=np.float64)
+                       for order, entry in enumerate(plan) if entry[6] is not None}
+
+    def render(self, times, values):
+        events = []
+        times_ns = None
+        for order, entry in enumerate(self.plan):
+            index, action, number, scale, offset, _, table = entry
+            raw = values[:, index]
+            if action == ACTION_NOTE:
+                if not number:
+                    continue
+                on = raw != 0
+                previous = np.empty_like(on)
+                previous[0] = self.note_state[entry]
+                previous[1:] = on[:-1]
+                self.note_state[entry] = bool(on[-1])
+                for frame in np.flatnonzero(on & ~previous):
+                    events.append((times[frame], order, "note_on", number, self.velocity))
+                for frame in np.flatnonzero(~on & previous):
+                    events.append((times[frame], order, "note_off", number, 0))
+            else:
+                level = raw * scale + offset
+                if table is not None:
+                    level = self.tables[order][np.clip(np.trunc(level), 0, LUT_LAST).astype(np.intp)]
+                mapped = np.clip(np.trunc(level), 0, 127).astype(np.int16)
+                if times_ns is None:
+                    times_ns = (times * 1e9).astype(np.int64).tolist()
+                bounds = [0, *(np.flatnonzero(mapped[1:] != mapped[:-1]) + 1).tolist(), len(mapped)]
+                events.extend(self._filter_runs(order, entry, bounds, mapped.tolist(), level.tolist(),
+                                                times, times_ns))
+        return events
+
+    def _filter_runs(self, order, entry, bounds, mapped, levels, times, times_ns):
+        """
+        Passes each run of equal mapped values through the CC filter frame by
+        frame until it is sent. Once a run's value is the last one sent, the
+        rest of the run would only be suppressed as unchanged, so it is skipped.
+        """
+        number = entry[2]
+        key = (entry[5], number)
+        allow = self.cc_filter.allow
+        events = []
+        for start, end in zip(bounds, bounds[1:]):
+            value = mapped[start]
+            for frame in range(start, end):
+                if allow(key, value, levels[frame], times_ns[frame]):
+                    events.append((times[frame], order, "control_change", number, value))
+                    self.last_cc[order] = value
+                    break
+                if value == self.last_cc.get(order):
+                    break
+        return events
+
+    def finish(self, end_time):
+        """
+        Note-offs for notes still held at the end of the capture, and the CC
+        values the filter still holds back (as SerialReceiver.stop() sends them).
+        """
+        events = [(end_time, order, "note_off", entry[2], 0)
+                  for order, entry in enumerate(self.plan)
+                  if entry[1] == ACTION_NOTE and entry[2] and self.note_state.get(entry)]
+        # Ordered after the last frame's events, as stop() sends them.
+        for order, ((_, number), value) in enumerate(self.cc_filter.flush(int(end_time * 1e9)), len(self.plan)):
+            events.append((end_time, order, "control_change", number, value))
+        return events
+
+
+def events_to_midi(events, path):
+    events.sort(key=lambda event: (event[0], event[1]))
+    midi_file = mido.MidiFile(ticks_per_beat=TICKS_PER_BEAT)
+    track = mido.MidiTrack()
+    midi_file.tracks.append(track)
+    track.append(mido.MetaMessage("set_tempo", tempo=TEMPO, time=0))
+    ticks_per_second = TICKS_PER_BEAT * 1e6 / TEMPO
+    last_tick = 0
+    for time_s, _, kind, number, value in events:
+        tick = int(round(time_s * ticks_per_second))
+        delta = tick - last_tick
+        last_tick = tick
+        if kind == "control_change":
+            track.append(mido.Message(kind, control=number, value=value, time=delta))
+        else:
+            track.append(mido.Message(kind, note=number, velocity=value, time=delta))
+    track.append(mido.MetaMessage("end_of_track", time=0))
+    midi_file.save(path)
+
+
+def render_file(path, out_path, config=None, interval_s=TEXT_INTERVAL, cc_options=None):
+    """
+    Renders one capture to a .mid file. Returns (path, frames, events, seconds).
+    """
+    start = time.perf_counter()
+    config = dict(config if config is not None else DEFAULT_CONFIG)
+    ranges = profile_ranges(config.pop("calibration", None))
+    renderer = ChunkRenderer(compile_plan(config, config.pop("curves", None), ranges), cc_options=cc_options)
+    events = []
+    frames = 0
+    end_time = 0.0
+    for times, values in read_chunks(path, interval_s):
+        events.extend(renderer.render(times, values))
+        frames += len(values)
+        end_time = float(times[-1])
+    events.extend(renderer.finish(end_time))
+    events_to_midi(events, out_path)
+    return path, frames, len(events), time.perf_counter() - start
+
+
+def _render_job(job):
+    return render_file(*job)
+
+
+def render_many(paths, out_dir, config=None, interval_s=TEXT_INTERVAL, workers=None, cc_options=None):
+    """
+    Renders captures in parallel with a process pool. Yields render_file results.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    jobs = [(path, os.path.join(out_dir, os.path.splitext(os.path.basename(path))[0] + ".mid"),
+             config, interval_s, cc_options) for path in paths]
+    if workers == 1 or len(jobs) == 1:
+        for job in jobs:
+            yield _render_job(job)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(_render_job, jobs)
+
+
+def collect_captures(inputs):
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            paths.extend(sorted(os.path.join(item, name) for name in os.listdir(item)
+                                if name.endswith(CAPTURE_EXTENSIONS)))
+        else:
+            paths.append(item)
+    return paths
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Render sensor captures to MIDI files")
+    arg_parser.add_argument("inputs", nargs="+", help="capture files or directories")
+    arg_parser.add_argument("-o", "--out-dir", default="renders")
+    arg_parser.add_argument("--config", help="JSON sensor config (defaults to all CCs on 20..29)")
+    arg_parser.add_argument("--calibration", help="calibration profile of the glove (see calibration.py)")
+    arg_parser.add_argument("--interval", type=float, default=TEXT_INTERVAL,
+                            help="seconds between lines of text captures")
+    arg_parser.add_argument("--workers", type=int, default=None, help="process pool size")
+    arg_parser.add_argument("--cc-deadband", type=float, default=1.0,
+                            help="CC hysteresis in CC steps, as SerialReceiver (0 disables)")
+    arg_parser.add_argument("--cc-max-rate", type=float, default=100.0,
+                            help="maximum CCs per second per controller, as SerialReceiver (0 disables)")
+    arg_parser.add_argument("--cc-settle-frames", type=int, default=5,
+                            help="frames after which a CC held back by the deadband is sent (0 disables)")
+    args = arg_parser.parse_args()
+    cc_options = {"deadband": args.cc_deadband, "max_rate_hz": args.cc_max_rate,
+                  "settle_frames": args.cc_settle_frames}
+
+    config = None
+    if args.config:
+        with open(args.config, "r") as f:
+            config = json.load(f)
+    if args.calibration:
+        config = dict(config if config is not None else DEFAULT_CONFIG)
+        config["calibration"] = load_profile(args.calibration)
+    paths = collect_captures(args.inputs)
+    start = time.perf_counter()
+    total_frames = 0
+    results = render_many(paths, args.out_dir, config, args.interval, args.workers, cc_options)
+    for path, frames, events, seconds in results:
+        total_frames += frames
+        print(f"{path}: {frames} frames -> {events} events in {seconds:.2f} s")
+    elapsed = time.perf_counter() - start
+    print(f"Rendered {len(paths)} captures ({total_frames} frames) in {elapsed:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+# recording.py
+"""
+Binary session recordings with timestamp-accurate, seekable replay.
+
+File layout (little-endian):
+
+    header   "MMREC" + version (B), num_columns (H), names_length (I),
+             comma-separated column names, zero padding to 8 bytes
+    records  num_records x (timestamp_ns: int64, num_columns x float64)
+    index    index_count x (timestamp_ns: int64, record: uint64)   [on close]
+    footer   index_offset (Q), index_count (Q), INDEX_MAGIC          [on close]
+
+Timestamps are monotonic nanoseconds relative to the first record. Records are
+fixed-width, so a Recording memory-maps the file and reads record i at a fixed
+offset without loading the session into memory. The sparse index (one entry
+every INDEX_STRIDE records) makes seeking to a time offset touch only a few
+pages. A file whose writer never closed (e.g. a crash) has no footer; it is
+still readable, seeking then bisects the records directly.
+
+Convert an existing text capture:
+    python recording.py convert fingers.txt fingers.mmrec --interval 0.1
+"""
+import argparse
+import bisect
+import mmap
+import os
+import struct
+import time
+
+from data_parser import FIELD_INDEX, SENSOR_FIELDS, FrameParser, SensorFrame
+
+MAGIC = b"MMREC"
+VERSION = 1
+INDEX_MAGIC = b"MMRINDEX"
+INDEX_STRIDE = 256
+
+_HEADER = struct.Struct("<5sBHI")
+_INDEX_ENTRY = struct.Struct("<qQ")
+_FOOTER = struct.Struct("<QQ8s")
+
+
+class RecordingWriter:
+    """
+    Appends timestamped frames to a recording file.
+
+        with RecordingWriter("session.mmrec") as writer:
+            writer.write(frame)                 # stamped with time.perf_counter_ns()
+            writer.write(frame, timestamp_ns)   # or with an explicit timestamp
+    """
+    def __init__(self, path, fields=SENSOR_FIELDS):
+        self.path = path
+        self.fields = tuple(fields)
+        self._record = struct.Struct(f"<q{len(self.fields)}d")
+        self._same_layout = self.fields == SENSOR_FIELDS
+        self._file = open(path, "wb")
+        names = ",".join(self.fields).encode("ascii")
+        header = _HEADER.pack(MAGIC, VERSION, len(self.fields), len(names)) + names
+        self._file.write(header + b"\x00" * (-len(header) % 8))
+        self._first_ns = None
+        self._index = []
+        self.count = 0
+
+    def write(self, frame, timestamp_ns=None):
+        """
+        Appends a SensorFrame (or dict). Timestamps must not decrease.
+        """
+        if timestamp_ns is None:
+            timestamp_ns = time.perf_counter_ns()
+        if self._first_ns is None:
+            self._first_ns = timestamp_ns
+        relative_ns = timestamp_ns - self._first_ns
+        if isinstance(frame, SensorFrame) and self._same_layout:
+            values = frame.values
+        else:
+            values = [float(frame.get(name, 0.0)) for name in self.fields]
+        if self.count % INDEX_STRIDE == 0:
+            self._index.append((relative_ns, self.count))
+        self._file.write(self._record.pack(relative_ns, *values))
+        self.count += 1
+
+    def close(self):
+        if self._file is None:
+            return
+        index_offset = self._file.tell()
+        for entry in self._index:
+            self._file.write(_INDEX_ENTRY.pack(*entry))
+        self._file.write(_FOOTER.pack(index_offset, len(self._index), INDEX_MAGIC))
+        self._file.close()
+        self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class Recording:
+    """
+    Read-only, memory-mapped view of a recording file.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        if size < _HEADER.size:
+            self._file.close()
+            raise ValueError(f"{path} is not a recording")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, num_columns, names_length = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{path} is not a version {VERSION} recording")
+        names = bytes(self._mm[_HEADER.size:_HEADER.size + names_length]).decode("ascii")
+        self.fields = tuple(names.split(",")) if names else ()
+        header_size = _HEADER.size + names_length
+        self.data_offset = header_size + (-header_size % 8)
+        self.record_size = 8 * (num_columns + 1)
+
+        data_end = size
+        self._index_ts = []
+        self._index_records = []
+        if size >= self.data_offset + _FOOTER.size:
+            index_offset, index_count, index_magic = _FOOTER.unpack_from(self._mm, size - _FOOTER.size)
+            if index_magic == INDEX_MAGIC:
+                data_end = index_offset
+                for i in range(index_count):
+                    ts, record = _INDEX_ENTRY.unpack_from(self._mm, index_offset + i * _INDEX_ENTRY.size)
+                    self._index_ts.append(ts)
+                    self._index_records.append(record)
+        self.count = (data_end - self.data_offset) // self.record_size
+
+        # Zero-copy views over the record area.
+        self._data = memoryview(self._mm)[self.data_offset:self.data_offset + self.count * self.record_size]
+        self._columns = self._data.cast("d")
+        self._timestamps = self._data.cast("q")
+        self._stride = num_columns + 1
+        self._same_layout = self.fields == SENSOR_FIELDS
+        self._indices = tuple(FIELD_INDEX.get(name) for name in self.fields)
+
+    @property
+    def duration_s(self) -> float:
+        if not self.count:
+            return 0.0
+        return self.timestamp_ns(self.count - 1) / 1e9
+
+    def timestamp_ns(self, record: int) -> int:
+        return self._timestamps[record * self._stride]
+
+    def read_into(self, record: int, frame: SensorFrame) -> SensorFrame:
+        """
+        Copies record `record` into `frame` and returns it.
+        """
+        start = record * self._stride + 1
+        if self._same_layout:
+            memoryview(frame.values)[:] = self._columns[start:start + self._stride - 1]
+        else:
+            values = frame.values
+            columns = self._columns
+            for column, index in enumerate(self._indices):
+                if index is not None:
+                    values[index] = columns[start + column]
+        return frame
+
+    def find(self, offset_s: float) -> int:
+        """
+        Returns the first record at or after `offset_s` seconds into the session.
+        """
+        target = int(offset_s * 1e9)
+        if self._index_ts:
+            block = max(0, bisect.bisect_right(self._index_ts, target) - 1)
+            lo = self._index_records[block]
+            hi = self._index_records[block + 1] if block + 1 < len(self._index_records) else self.count
+        else:
+            lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.timestamp_ns(mid) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def close(self):
+        for view in ("_columns", "_timestamps", "_data"):
+            if hasattr(self, view):
+                getattr(self, view).release()
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class RecordingPlayer:
+    """
+    Streams frames from a Recording with their original inter-frame timing.
+
+    speed: 1.0 plays in real time, 2.0 twice as fast, 0 or None as fast as
+    possible (for load tests).
+    """
+    def __init__(self, recording, speed=1.0):
+        self.recording = recording
+        self.speed = speed
+        self.frame = SensorFrame()
+        self.running = True
+
+    def frames(self, start_s=0.0):
+        """
+        Yields (timestamp_s, frame) from `start_s` on. The frame object is reused.
+        """
+        recording = self.recording
+        record = recording.find(start_s)
+        if record >= recording.count:
+            return
+        origin_ns = recording.timestamp_ns(record)
+        wall_start_ns = time.perf_counter_ns()
+        while self.running and record < recording.count:
+            ts_ns = recording.timestamp_ns(record)
+            if self.speed:
+                due_ns = wall_start_ns + (ts_ns - origin_ns) / self.speed
+                remaining = (due_ns - time.perf_counter_ns()) / 1e9
+                if remaining > 0:
+                    time.sleep(remaining)
+            yield ts_ns / 1e9, recording.read_into(record, self.frame)
+            record += 1
+
+    def stop(self):
+        self.running = False
+
+
+def convert_text_capture(text_path, out_path, interval_s=0.1):
+    """
+    Converts a text capture (one glove line per row, no timestamps) into a
+    recording, spacing the frames `interval_s` apart. Streams the file line by
+    line. Returns the number of frames written.
+    """
+    parser = FrameParser()
+    interval_ns = int(interval_s * 1e9)
+    frame = SensorFrame()
+    with open(text_path, "r") as f, RecordingWriter(out_path) as writer:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                parsed = parser.parse(line)
+            except ValueError:
+                continue
+            if not isinstance(parsed, SensorFrame):
+                frame.clear()
+                for key, value in parsed.items():
+                    if key in FIELD_INDEX:
+                        frame.values[FIELD_INDEX[key]] = value
+                parsed = frame
+            writer.write(parsed, writer.count * interval_ns)
+        return writer.count
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Glove session recordings")
+    commands = arg_parser.add_subparsers(dest="command", required=True)
+    convert = commands.add_parser("convert", help="convert a .txt capture to a recording")
+    convert.add_argument("text_path")
+    convert.add_argument("out_path", nargs="?")
+    convert.add_argument("--interval", type=float, default=0.1, help="seconds between lines")
+    info = commands.add_parser("info", help="print recording details")
+    info.add_argument("path")
+    args = arg_parser.parse_args()
+
+    if args.command == "convert":
+        out_path = args.out_path or os.path.splitext(args.text_path)[0] + ".mmrec"
+        count = convert_text_capture(args.text_path, out_path, args.interval)
+        print(f"Wrote {count} frames to {out_path}")
+    else:
+        with Recording(args.path) as recording:
+            print(f"{args.path}: {recording.count} frames, {recording.duration_s:.2f} s")
+            print("Columns:", ", ".join(recording.fields))
+
+
+if __name__ == "__main__":
+    main()
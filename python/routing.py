@@ -0,0 +1,149 @@
+# routing.py
+"""
+Compiles the UI's sensor configuration into an immutable routing plan.
+
+The plan is a flat tuple of entries
+    (field index, action, MIDI number, scale, offset, sensor, table)
+where `field index` points into SensorFrame.values and `action` is ACTION_NOTE
+or ACTION_CC. For a linear CC, `table` is None and the CC level is
+`raw * scale + offset`; for any other response curve (curves.py), that
+expression is an index into `table`, which holds the CC levels. The Tk thread
+compiles a new plan whenever the configuration changes and hands it to the
+receiver, which swaps it in with a single reference assignment; the receiver
+never reads the mutable config dict per frame.
+"""
+from curves import LUT_LAST, curve_name, curve_range, curve_table
+from data_parser import FIELD_INDEX, SensorFrame
+from log_writer import LOG
+from scales import MIDI_NOTE_NAMES, NOTE_NUMBERS, key_index, note_name, scale_notes
+
+ACTION_NOTE = 0
+ACTION_CC = 1
+
+NOTE_SENSORS = ("P1", "P2", "P3", "P4")
+CC_SENSORS = ("F1", "F2", "F3", "F4", "AccX", "AccY", "AccZ", "GyrX", "GyrY", "GyrZ")
+
+# UI sensor name -> field name sent by the firmware
+SENSOR_ALIASES = {
+    "GyrX": "GyroX",
+    "GyrY": "GyroY",
+    "GyrZ": "GyroZ",
+}
+
+# Raw input range (+/-R) mapped onto 0-127, by sensor name prefix
+SENSOR_RANGES = (
+    ("F", 2.0),
+    ("Acc", 2.0),
+    ("Gyr", 500.0),
+)
+
+# Mapping for note names used by pressure sensors (P1-P4): "C-1" .. "G9"
+NOTE_NAME_TO_MIDI = {"None": None, **NOTE_NUMBERS}
+
+# Reverse mapping
+MIDI_TO_NOTE = dict(enumerate(MIDI_NOTE_NAMES))
+
+EMPTY_PLAN = ()
+
+
+def field_index(sensor: str) -> int:
+    """
+    Returns the SensorFrame index for a UI sensor name (resolving aliases).
+    """
+    return FIELD_INDEX[SENSOR_ALIASES.get(sensor, sensor)]
+
+
+def sensor_range(sensor: str) -> float:
+    for prefix, value in SENSOR_RANGES:
+        if sensor.startswith(prefix):
+            return value
+    return 1.0
+
+
+def cc_mapping(sensor, spec=None, default_range=None) -> tuple:
+    """
+    Returns (scale, offset, table) for a CC sensor and its curve spec. An
+    invalid spec is logged and the sensor falls back to the linear default.
+
+    :param default_range: Raw (low, high) used when the spec has no "range",
+                          e.g. from a calibration profile; defaults to +/-R.
+    """
+    r = sensor_range(sensor)
+    default = default_range if default_range is not None else (-r, r)
+    try:
+        low, high = curve_range(spec, default)
+        table = None if curve_name(spec) == "linear" else curve_table(spec)
+    except (TypeError, ValueError) as e:
+        LOG.error(f"Curve for {sensor} ignored: {e}")
+        (low, high), table = default, None
+    if table is None:
+        # ((raw - low) / (high - low)) * 127  ==  raw * scale + offset
+        scale = 127 / (high - low)
+        return scale, -low * scale, None
+    # Nearest table entry: int(raw * scale + offset), clamped to the table.
+    scale = LUT_LAST / (high - low)
+    return scale, -low * scale + 0.5, table
+
+
+def compile_plan(config_dict, curves=None, ranges=None) -> tuple:
+    """
+    Compiles a config dict ({"P1": "C4", "AccX": "7", ...}) into a routing plan.
+    Note sensors also accept MIDI note numbers (e.g. from scales.scale_notes).
+
+    Note sensors are always part of the plan, with MIDI number None when
+    unassigned, so a held note is still released after its sensor is unmapped.
+    CC sensors without a valid controller number are left out.
+
+    :param curves: Optional {sensor: curve spec} (see curves.py); sensors
+                   without one map their +/-R range linearly.
+    :param ranges: Optional {sensor: (low, high)} raw ranges replacing +/-R,
+                   from a calibration profile (see calibration.py).
+    """
+    config = dict(config_dict)  # snapshot; the Tk thread may keep editing
+    curves = dict(curves) if curves else {}
+    ranges = ranges or {}
+    plan = []
+    for sensor in NOTE_SENSORS:
+        note = config.get(sensor, "None")
+        if not isinstance(note, int):
+            note = NOTE_NAME_TO_MIDI.get(note)
+        elif not 0 <= note <= 127:
+            note = None
+        plan.append((field_index(sensor), ACTION_NOTE, note, 1.0, 0.0, sensor, None))
+    for sensor in CC_SENSORS:
+        try:
+            cc_number = int(config.get(sensor, "None"))
+        except ValueError:
+            continue
+        if not 0 <= cc_number <= 127:
+            continue
+        scale, offset, table = cc_mapping(sensor, curves.get(sensor), ranges.get(sensor))
+        plan.append((field_index(sensor), ACTION_CC, cc_number, scale, offset, sensor, table))
+    return tuple(plan)
+
+
+def frame_from_dict(data_dict) -> SensorFrame:
+    """
+    Converts a dict from the fallback parser into a SensorFrame, accepting both
+    firmware field names and UI aliases (e.g. "GyrZ" from older firmware).
+    """
+    frame = SensorFrame()
+    values = frame.values
+    for key, value in data_dict.items():
+        index = FIELD_INDEX.get(SENSOR_ALIASES.get(key, key))
+        if index is not None:
+            try:
+                values[index] = value
+            except TypeError:
+                pass
+    return frame
+
+
+def compute_scale(root, mode, octave=3, count=8):
+    """
+    Returns the first `count` note names of a scale (see scales.py for the
+    modes), rising from the root in the given octave; "None" past MIDI 127.
+    Raises ValueError for an unknown root, mode or octave. Where no names are
+    displayed, scales.scale_notes() gives the MIDI numbers compile_plan takes.
+    """
+    return [note_name(note) for note in scale_notes(key_index(root, mode, octave), count)]
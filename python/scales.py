@@ -0,0 +1,104 @@
+# scales.py
+"""
+Precomputed scale table for the pressure-sensor notes.
+
+Every mode (MODES) on every root (ROOTS, sharps included; flats are accepted as
+aliases) and starting octave (OCTAVES) is computed once at import into
+SCALE_TABLE: SCALE_DEGREES ascending MIDI notes per key, in a flat bytes
+object indexed by a single int per key (key_index). Looking up a key's notes
+costs the same whatever the mode; it isn't faster than computing the two modes
+the GUI used to offer (a few microseconds either way, see
+benchmarks/bench_scales.py), the table is there to cover every mode and root
+uniformly. Notes above 127 are stored as NO_NOTE.
+"""
+NOTE_NAMES = ("C", "C#", "D", "D#", "E", "F", "F#", "G", "G#", "A", "A#", "B")
+ROOTS = NOTE_NAMES
+ROOT_ALIASES = {"Db": "C#", "Eb": "D#", "Gb": "F#", "Ab": "G#", "Bb": "A#",
+                "Cb": "B", "Fb": "E", "E#": "F", "B#": "C"}
+
+# Semitones above the root, one octave.
+MODES = {
+    "Major": (0, 2, 4, 5, 7, 9, 11),
+    "Minor": (0, 2, 3, 5, 7, 8, 10),
+    "Dorian": (0, 2, 3, 5, 7, 9, 10),
+    "Phrygian": (0, 1, 3, 5, 7, 8, 10),
+    "Lydian": (0, 2, 4, 6, 7, 9, 11),
+    "Mixolydian": (0, 2, 4, 5, 7, 9, 10),
+    "Locrian": (0, 1, 3, 5, 6, 8, 10),
+    "Harmonic Minor": (0, 2, 3, 5, 7, 8, 11),
+    "Melodic Minor": (0, 2, 3, 5, 7, 9, 11),
+    "Major Pentatonic": (0, 2, 4, 7, 9),
+    "Minor Pentatonic": (0, 3, 5, 7, 10),
+}
+MODE_NAMES = tuple(MODES)
+MODE_ALIASES = {"Ionian": "Major", "Aeolian": "Minor", "Natural Minor": "Minor"}
+
+OCTAVES = range(-1, 9)  # MIDI octave numbers, C4 = 60
+SCALE_DEGREES = 16      # four notes for each of four gloves
+NO_NOTE = 255
+
+# "C-1" .. "G9" for MIDI notes 0-127, and back.
+MIDI_NOTE_NAMES = tuple(f"{NOTE_NAMES[n % 12]}{n // 12 - 1}" for n in range(128))
+NOTE_NUMBERS = {name: n for n, name in enumerate(MIDI_NOTE_NAMES)}
+
+_MODE_INDEX = {name: i for i, name in enumerate(MODE_NAMES)}
+_KEYS_PER_MODE = len(ROOTS) * len(OCTAVES)
+
+
+def _build_table():
+    """
+    Each mode's notes are laid out once as semitone offsets from the key's
+    root; bytes.translate then adds a root note to all of them at C speed.
+    """
+    # root note -> translation table: offset -> root + offset, or NO_NOTE past 127
+    shifted = [bytes(range(base, 128)) + bytes((NO_NOTE,)) * (128 + base) for base in range(128)]
+    scales = []
+    for intervals in MODES.values():
+        size = len(intervals)
+        pattern = bytes(12 * (degree // size) + intervals[degree % size] for degree in range(SCALE_DEGREES))
+        for root in range(len(ROOTS)):
+            for octave in OCTAVES:
+                scales.append(pattern.translate(shifted[12 * (octave + 1) + root]))
+    return b"".join(scales)
+
+
+SCALE_TABLE = _build_table()
+
+
+def pitch_class(root) -> int:
+    """
+    0-11 for a root name ("C", "F#", "Bb", ...). Raises ValueError.
+    """
+    name = ROOT_ALIASES.get(root, root)
+    try:
+        return NOTE_NAMES.index(name)
+    except ValueError:
+        raise ValueError(f"unknown root {root!r}; expected one of {ROOTS}") from None
+
+
+def key_index(root, mode="Major", octave=3) -> int:
+    """
+    The table index of a key: root name, mode name and the root's octave.
+    Raises ValueError for an unknown root, mode or octave.
+    """
+    mode = MODE_ALIASES.get(mode, mode)
+    if mode not in _MODE_INDEX:
+        raise ValueError(f"unknown mode {mode!r}; expected one of {MODE_NAMES}")
+    if octave not in OCTAVES:
+        raise ValueError(f"octave {octave} out of range {OCTAVES[0]}..{OCTAVES[-1]}")
+    return _MODE_INDEX[mode] * _KEYS_PER_MODE + pitch_class(root) * len(OCTAVES) + octave - OCTAVES[0]
+
+
+def scale_notes(key, count=SCALE_DEGREES) -> tuple:
+    """
+    The first `count` notes of a key's scale, None where above MIDI 127.
+    """
+    start = key * SCALE_DEGREES
+    return tuple(None if note == NO_NOTE else note for note in SCALE_TABLE[start:start + count])
+
+
+def note_name(note) -> str:
+    """
+    "C4" for 60; "None" for None.
+    """
+    return "None" if note is None else MIDI_NOTE_NAMES[note]
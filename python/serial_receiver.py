@@ -1,142 +1,399 @@
 # serial_receiver.py
-import serial
 import time
 import threading
-from data_parser import parse_line_to_dict
+from data_parser import FrameParser
+from binary_protocol import BinaryFrameDecoder
 from midi_handler import MidiHandler
+from log_writer import LOG, DEBUG
+from latency import LATENCY
+from recording import Recording, RecordingPlayer, RecordingWriter
+from cc_filter import ControllerFilter
+from data_parser import FrameSnapshot, SensorFrame
+from curves import LUT_LAST
+from routing import ACTION_NOTE, NOTE_NAME_TO_MIDI, compile_plan, frame_from_dict
+from calibration_profile import profile_ranges
+from lazy_imports import lazy_import
 import os
 
-# Mapping for note names used by pressure sensors (P1-P4)
-NOTE_NAME_TO_MIDI = {
-    "None": None,
-    "C3": 48,  "C#3": 49,  "D3": 50,  "D#3": 51,  "E3": 52,  "F3": 53,
-    "F#3": 54, "G3": 55,   "G#3": 56, "A3": 57,   "A#3": 58,  "B3": 59,
-    "C4": 60,  "C#4": 61,  "D4": 62,  "D#4": 63,  "E4": 64,  "F4": 65,
-    "F#4": 66, "G4": 67,   "G#4": 68, "A4": 69,   "A#4": 70,  "B4": 71,
-    "C5": 72,  "C#5": 73,  "D5": 74,  "D#5": 75,  "E5": 76,  "F5": 77
-}
+serial = lazy_import("serial")  # only the thread-per-glove mode opens ports here
+
+# Spacing of lines when replaying a text capture (they carry no timestamps)
+TEXT_REPLAY_INTERVAL = 0.1
+
+# What a new routing plan does to a held note whose sensor now has another note
+HELD_NOTE_POLICIES = ("retune", "release")
 
 def note_name_to_midi(note_name: str):
     return NOTE_NAME_TO_MIDI.get(note_name, None)
 
 class SerialReceiver:
-    def __init__(self, port="COM4", baud_rate=115200, config_dict=None, glove_name="Glove 1", midi_handler=None):
+    def __init__(self, port="COM4", baud_rate=115200, config_dict=None, glove_name="Glove 1", midi_handler=None,
+                 protocol="text", capture=False, replay_path=None, replay_speed=1.0, record_path=None,
+                 cc_deadband=1.0, cc_max_rate=100.0, cc_settle_frames=5, strike_detector=None, hub=None,
+                 on_status=None, worker=False, clock=None, network=None, curves=None, gestures=None,
+                 calibration=None, held_notes="retune"):
         """
         :param port: Serial port (e.g., "COM4")
         :param baud_rate: baud rate (e.g., 115200)
         :param config_dict: Shared sensor configuration dictionary.
         :param glove_name: Identifier for the glove (used in logging).
         :param midi_handler: Shared MidiHandler instance; if None, a new one is created.
+        :param protocol: "text" for ASCII lines, "binary" for COBS-framed binary records
+                         (see binary_protocol.py).
+        :param capture: Append every received text line to captures/<glove_name>.txt.
+        :param replay_path: Replay a recording (.mmrec) or text capture (.txt) instead of
+                            opening the serial port.
+        :param replay_speed: Replay speed multiplier; 0 replays as fast as possible.
+        :param record_path: Write every received frame to this recording file.
+        :param cc_deadband: Hysteresis for CC sensors, in CC steps (see cc_filter.py).
+        :param cc_max_rate: Maximum CC messages per second per controller.
+        :param cc_settle_frames: Frames in a row after which a CC value held back by the
+                                 deadband is sent anyway (0 disables).
+        :param strike_detector: Optional StrikeDetector triggering drum notes from IMU spikes.
+        :param hub: Optional ReceiverHub (async_core.py); the port or replay is then served
+                    by the hub's event loop instead of a thread of its own.
+        :param on_status: Callback(text) for status changes reported by the hub.
+        :param worker: With a hub, read and parse the port in a separate process that
+                       passes frames through shared memory (frame_ring.py). Text
+                       capture is not available in this mode.
+        :param clock: Optional ClockEngine (clock.py); note on/off then go through it
+                      and are quantized to its grid.
+        :param network: Optional NetworkOutput (network_output.py) used instead of
+                        midi_handler; each frame's notes and CCs leave as one UDP
+                        datagram. The clock does not apply to it.
+        :param curves: Optional {sensor: curve spec} of CC response curves and
+                       ranges (see curves.py); compiled into the routing plan.
+        :param gestures: Optional GestureRecognizer (gestures.py) matching the IMU
+                         stream against recorded gesture templates.
+        :param calibration: Optional calibration profile (calibration_profile.load_profile);
+                            its per-sensor raw ranges replace the default +/-R
+                            when the routing plan is compiled.
+        :param held_notes: When a new plan (e.g. a key change) gives a held note's
+                           sensor another note: "retune" releases the old note and
+                           starts the new one if the sensor is still pressed,
+                           "release" only releases it.
         """
+        if held_notes not in HELD_NOTE_POLICIES:
+            raise ValueError(f"held_notes must be one of {HELD_NOTE_POLICIES}, got {held_notes!r}")
         self.glove_name = glove_name
         self.config_dict = config_dict if config_dict else {}
+        self.curves = curves if curves is not None else {}
+        self.ranges = profile_ranges(calibration)
         self.running = True
         
         # Use the shared MidiHandler if provided.
-        if midi_handler is not None:
+        self.network = network
+        if network is not None:
+            self.midi_handler = network
+        elif midi_handler is not None:
             self.midi_handler = midi_handler
         else:
             self.midi_handler = MidiHandler(default_velocity=100)
         
-        self.simulate_file = False
         script_dir = os.path.dirname(os.path.realpath(__file__))
-        file_name = "fingers.txt"
-        self.file_path = os.path.join(script_dir, file_name)
-        
+        self.simulate_file = replay_path is not None
+        self.file_path = os.path.join(script_dir, replay_path) if replay_path else None
+        self.replay_speed = replay_speed
+        self.player = None
+        self.ser = None
+
         self.current_notes = {}
+        self.note_out = clock if clock is not None and network is None else self.midi_handler
+        self.snapshot = FrameSnapshot(self.current_notes)  # read by the monitor panel
+        self.plan = compile_plan(self.config_dict, self.curves, self.ranges)
+        self.held_notes = held_notes
+        self._notes_plan = self.plan  # the plan current_notes were played with
+        self.cc_filter = ControllerFilter(deadband=cc_deadband, max_rate_hz=cc_max_rate,
+                                          settle_frames=cc_settle_frames)
+        self.strike_detector = strike_detector
+        if strike_detector is not None and strike_detector.midi_handler is None:
+            strike_detector.midi_handler = self.midi_handler
+        self.gestures = gestures
+        if gestures is not None and gestures.midi_handler is None:
+            gestures.midi_handler = self.midi_handler
+        self.parser = FrameParser()
+        self.protocol = protocol
+        self.decoder = BinaryFrameDecoder() if protocol == "binary" else None
+        self.capture = capture
+        if capture and LOG.capture_dir is None:
+            LOG.capture_dir = os.path.join(script_dir, "captures")
+        self.recorder = RecordingWriter(record_path) if record_path else None
+        self._record_lock = threading.Lock()  # stop() closes the recorder while the reader may write
+        self.thread = None
+        self.source = None
+
+        if hub is not None:
+            if self.simulate_file:
+                self.source = hub.add_replay(self, self.file_path, replay_speed, on_status=on_status)
+            elif worker:
+                self.source = hub.add_worker(self, port, baud_rate, protocol, on_status=on_status)
+            else:
+                self.source = hub.add_serial(self, port, baud_rate, on_status=on_status)
+            return
 
         if not self.simulate_file:
             try:
                 self.ser = serial.Serial(port, baud_rate, timeout=1)
-                print(f"[{self.glove_name}] Connected to {port} at {baud_rate} baud.")
+                LOG.info(f"[{self.glove_name}] Connected to {port} at {baud_rate} baud.")
             except Exception as e:
-                print(f"[{self.glove_name}] Error opening serial port {port}: {e}")
+                LOG.error(f"[{self.glove_name}] Error opening serial port {port}: {e}")
                 raise e
 
             time.sleep(2)
-            self.thread = threading.Thread(target=self.serial_loop, daemon=True)
-            self.thread.start()
+            loop = self.binary_loop if self.decoder is not None else self.serial_loop
+        elif self.file_path.endswith(".txt"):
+            if not os.path.isfile(self.file_path):
+                LOG.error(f"[{self.glove_name}] Error opening file {self.file_path}: not found")
+                raise FileNotFoundError(self.file_path)
+            LOG.info(f"[{self.glove_name}] Simulating input from file: {self.file_path}")
+            loop = self.file_loop
         else:
             try:
-                self.file = open(self.file_path, "r")
-                print(f"[{self.glove_name}] Simulating input from file: {self.file_path}")
+                self.player = RecordingPlayer(Recording(self.file_path), speed=replay_speed)
+                LOG.info(f"[{self.glove_name}] Replaying recording: {self.file_path}")
             except Exception as e:
-                print(f"[{self.glove_name}] Error opening file {self.file_path}: {e}")
+                LOG.error(f"[{self.glove_name}] Error opening recording {self.file_path}: {e}")
                 raise e
+            loop = self.replay_loop
+        self.thread = threading.Thread(target=loop, daemon=True)
+        self.thread.start()
+
+    def handle_line(self, line, start_ns=None):
+        """
+        Processes one received text line (stripped). Shared by the reader
+        thread and the ReceiverHub.
+
+        :param start_ns: perf_counter_ns() when the line's bytes were taken from
+                         the port (latency instrumentation only).
+        """
+        if LATENCY.enabled:
+            self._handle_line_timed(line, start_ns)
+            return
+        if LOG.verbosity >= DEBUG:
+            LOG.debug(f"[{self.glove_name}] {line}")
+        if line:
+            if self.capture:
+                LOG.capture(self.glove_name, line)
+            frame = self.parser.parse(line)
+            if self.recorder is not None:
+                self._record(frame)
+            self.process_data(frame)
+
+    def handle_frame(self, frame, start_ns=None):
+        """
+        Processes one already-decoded frame (binary protocol or replay).
+        """
+        if LATENCY.enabled:
+            read_ns = time.perf_counter_ns()
+            if self.recorder is not None:
+                self._record(frame)
+            self.process_data(frame)
+            LATENCY.add_frame(read_ns, read_ns, time.perf_counter_ns(), start_ns)
+            return
+        if self.recorder is not None:
+            self._record(frame)
+        self.process_data(frame)
+
+    def _handle_line_timed(self, line, start_ns):
+        read_ns = time.perf_counter_ns()
+        if LOG.verbosity >= DEBUG:
+            LOG.debug(f"[{self.glove_name}] {line}")
+        if line:
+            if self.capture:
+                LOG.capture(self.glove_name, line)
+            frame = self.parser.parse(line)
+            parsed_ns = time.perf_counter_ns()
+            if self.recorder is not None:
+                self._record(frame)
+            self.process_data(frame)
+            LATENCY.add_frame(read_ns, parsed_ns, time.perf_counter_ns(), start_ns)
 
-            self.lines = self.file.readlines()
-            if not self.lines:
-                print(f"[{self.glove_name}] No data found in {self.file_path}!")
-                self.lines = []
-            self.file.close()
-            self.thread = threading.Thread(target=self.file_loop, daemon=True)
-            self.thread.start()
+    def _record(self, frame):
+        with self._record_lock:
+            if self.recorder is not None:
+                self.recorder.write(frame)
 
     def serial_loop(self):
         while self.running:
             try:
-                line = self.ser.readline().decode('utf-8').strip()
-                print(f"[{self.glove_name}] {line}")
-                if line:
-                    data_dict = parse_line_to_dict(line)
-                    self.process_data(data_dict)
+                raw = self.ser.readline()
+                start_ns = time.perf_counter_ns() if LATENCY.enabled else None
+                self.handle_line(raw.decode('utf-8').strip(), start_ns)
+            except Exception as e:
+                LOG.error(f"[{self.glove_name}] Serial read error: {e}")
+
+    def binary_loop(self):
+        """
+        Reads whatever is waiting in bulk and decodes every complete binary frame
+        in it. Blocks for at most the port timeout when nothing is waiting.
+        """
+        while self.running:
+            try:
+                chunk = self.ser.read(self.ser.in_waiting or 1)
+                if chunk:
+                    start_ns = time.perf_counter_ns() if LATENCY.enabled else None
+                    for frame in self.decoder.feed(chunk):
+                        self.handle_frame(frame, start_ns)
             except Exception as e:
-                print(f"[{self.glove_name}] Serial read error: {e}")
-                
+                LOG.error(f"[{self.glove_name}] Serial read error: {e}")
+
     def file_loop(self):
-        index = 0
-        while self.running and index < len(self.lines):
-            line = self.lines[index].strip()
-            if line:
-                data_dict = parse_line_to_dict(line)
-                print(f"[{self.glove_name} File] {data_dict}")
-                self.process_data(data_dict)
-            index += 1
-            time.sleep(0.1)
-
-    def process_data(self, data_dict: dict):
-        # Process pressure sensors (P1-P4)
-        for sensor in ["P1", "P2", "P3", "P4"]:
-            raw_value = data_dict.get(sensor, 0)
-            chosen_note_name = self.config_dict.get(sensor, "None")
-            midi_note = note_name_to_midi(chosen_note_name)
-            is_on = bool(raw_value)
-            currently_playing = sensor in self.current_notes
-            
-            if is_on and midi_note and not currently_playing:
-                self.midi_handler.send_midi_note_on(midi_note)
-                self.current_notes[sensor] = midi_note
-            elif not is_on and currently_playing:
-                old_note = self.current_notes[sensor]
-                self.midi_handler.send_midi_note_off(old_note)
-                del self.current_notes[sensor]
-        
-        # Process other sensors as continuous controllers (CC)
-        sensors_cc = ["F1", "F2", "F3", "F4", "AccX", "AccY", "AccZ", "GyrX", "GyrY", "GyrZ"]
-        for sensor in sensors_cc:
-            cc_config = self.config_dict.get(sensor, "None")
-            if cc_config == "None":
+        """
+        Replays a text capture line by line. Text captures carry no timestamps,
+        so lines are spaced TEXT_REPLAY_INTERVAL apart (scaled by replay_speed).
+        """
+        interval = TEXT_REPLAY_INTERVAL / self.replay_speed if self.replay_speed else 0
+        with open(self.file_path, "r") as f:
+            for line in f:
+                if not self.running:
+                    break
+                line = line.strip()
+                if line:
+                    frame = self.parser.parse(line)
+                    if LOG.verbosity >= DEBUG:
+                        LOG.debug(f"[{self.glove_name} File] {frame}")
+                    self.process_data(frame)
+                if interval:
+                    time.sleep(interval)
+        if self.running:
+            LOG.info(f"[{self.glove_name}] End of {self.file_path}")
+
+    def replay_loop(self):
+        """
+        Replays a recording with its original inter-frame timing.
+        """
+        try:
+            for _, frame in self.player.frames():
+                if not self.running:
+                    break
+                if LOG.verbosity >= DEBUG:
+                    LOG.debug(f"[{self.glove_name} Replay] {frame}")
+                self.process_data(frame)
+        finally:
+            self.player.recording.close()
+        if self.running:
+            LOG.info(f"[{self.glove_name}] End of {self.file_path}")
+
+    def all_notes_off(self):
+        """
+        Releases every note this glove holds (e.g. when its device is unplugged).
+        """
+        for sensor, note in list(self.current_notes.items()):
+            if note is not None:
+                self.note_out.send_midi_note_off(note)
+            self.current_notes.pop(sensor, None)
+        if self.network is not None:
+            self.network.flush()
+
+    def update_plan(self, config_dict=None, curves=None, calibration=None):
+        """
+        Recompiles the routing plan from config_dict, curves and calibration
+        profile (or the current ones) and swaps it in. Safe to call from the Tk
+        thread while frames are processed; curve tables are built here, not per
+        frame.
+        """
+        if config_dict is not None:
+            self.config_dict = config_dict
+        if curves is not None:
+            self.curves = curves
+        if calibration is not None:
+            self.ranges = profile_ranges(calibration)
+        self.plan = compile_plan(self.config_dict, self.curves, self.ranges)
+
+    def process_data(self, data_dict):
+        """
+        Maps one parsed frame to MIDI through the current routing plan. data_dict
+        is a SensorFrame from the compiled parser, or a plain dict for lines that
+        took the fallback path.
+        """
+        if not isinstance(data_dict, SensorFrame):
+            data_dict = frame_from_dict(data_dict)
+        values = data_dict.values
+        plan = self.plan  # one read; update_plan() may swap it meanwhile
+        if plan is not self._notes_plan:
+            self._follow_plan(plan, values)
+        now_ns = time.perf_counter_ns()
+        for index, action, number, scale, offset, sensor, table in plan:
+            raw_value = values[index]
+            if action == ACTION_NOTE:
+                # Pressure sensors (P1-P4)
+                is_on = bool(raw_value)
+                currently_playing = sensor in self.current_notes
+                if is_on and number and not currently_playing:
+                    self.note_out.send_midi_note_on(number)
+                    self.current_notes[sensor] = number
+                elif not is_on and currently_playing:
+                    old_note = self.current_notes.pop(sensor)
+                    if old_note is not None:  # None: released by _follow_plan
+                        self.note_out.send_midi_note_off(old_note)
+            else:
+                # Continuous controllers (CC)
+                level = raw_value * scale + offset
+                if table is not None:
+                    level = table[max(0, min(LUT_LAST, int(level)))]
+                mapped_val = max(0, min(127, int(level)))
+                if self.cc_filter.allow((sensor, number), mapped_val, level, now_ns):
+                    self.midi_handler.send_midi_control_change(controller=number, value=mapped_val)
+
+        if self.strike_detector is not None:
+            self.strike_detector.update(values, now_ns)
+        if self.gestures is not None:
+            self.gestures.update(values, now_ns)
+        if self.network is not None:
+            self.network.flush()
+        self.snapshot.publish(values)
+
+    def _follow_plan(self, plan, values):
+        """
+        Moves held notes onto a newly swapped-in plan before the frame is
+        mapped. Runs on the receiving thread, so no frame is mapped with a held
+        note and a plan that disagree: a note whose sensor now has another note
+        (or none) is released, and with held_notes="retune" the new note starts
+        if the sensor is still pressed in this frame. Otherwise a still-pressed
+        sensor stays in current_notes as None, so it doesn't retrigger until it
+        is pressed again.
+        """
+        self._notes_plan = plan
+        if not self.current_notes:
+            return
+        retune = self.held_notes == "retune"
+        for index, action, number, _, _, sensor, _ in plan:
+            if action != ACTION_NOTE:
                 continue
-            try:
-                cc_number = int(cc_config)
-            except ValueError:
+            held = self.current_notes.get(sensor)
+            if held is None or held == number:
                 continue
-            raw_val = data_dict.get(sensor, 0.0)
-            if sensor.startswith("F"):
-                R = 2.0
-            elif sensor.startswith("Acc"):
-                R = 2.0
-            elif sensor.startswith("Gyr"):
-                R = 500.0
+            self.note_out.send_midi_note_off(held)
+            if not values[index]:
+                del self.current_notes[sensor]
+            elif retune and number:
+                self.note_out.send_midi_note_on(number)
+                self.current_notes[sensor] = number
             else:
-                R = 1.0
-            mapped_val = int(((raw_val + R) / (2 * R)) * 127)
-            mapped_val = max(0, min(127, mapped_val))
-            self.midi_handler.send_midi_control_change(controller=cc_number, value=mapped_val)
+                self.current_notes[sensor] = None
 
     def stop(self):
         self.running = False
+        if self.source is not None:
+            self.source.stop()
+            self.source = None
+        if self.player is not None:
+            self.player.stop()
+        if self.strike_detector is not None:
+            self.strike_detector.flush()
+        if self.gestures is not None:
+            self.gestures.flush()
+        for (_, number), value in self.cc_filter.flush(time.perf_counter_ns()):
+            self.midi_handler.send_midi_control_change(controller=number, value=value)
+        if self.network is not None:
+            self.network.flush()
+        with self._record_lock:
+            recorder, self.recorder = self.recorder, None
+        if recorder is not None:
+            recorder.close()
+        if self.ser is None:
+            return
         try:
             self.ser.close()
         except Exception as e:
-            print(f"[{self.glove_name}] Error closing serial port:", e)
+            LOG.error(f"[{self.glove_name}] Error closing serial port: {e}")
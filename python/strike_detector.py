@@ -0,0 +1,149 @@
+# strike_detector.py
+"""
+Low-latency percussion strike detection on the IMU stream.
+
+Per frame, the detector computes an onset value from the accelerometer
+(the rise in |acc| since the previous frame, in g) plus a smaller gyro term,
+and keeps the last `window` onset values in a fixed-size ring buffer with a
+running sum and sum of squares. A strike is a local maximum above an adaptive
+threshold (mean + k * std of the window, never below `min_threshold`); it is
+confirmed one frame after the peak, when the onset value falls again. After a
+strike the detector ignores the stream for a refractory window. Everything is
+O(1) per frame.
+
+A confirmed strike sends note_on with a velocity scaled from the peak onset
+value, and the matching note_off `note_length` seconds later (or just before
+the next strike on the same note).
+"""
+import math
+from array import array
+
+from data_parser import FIELD_INDEX
+
+_ACC_X = FIELD_INDEX["AccX"]
+_ACC_Y = FIELD_INDEX["AccY"]
+_ACC_Z = FIELD_INDEX["AccZ"]
+_GYRO_X = FIELD_INDEX["GyroX"]
+_GYRO_Y = FIELD_INDEX["GyroY"]
+_GYRO_Z = FIELD_INDEX["GyroZ"]
+
+
+class StrikeDetector:
+    def __init__(self, midi_handler=None, note=38, window=32, k=3.0, min_threshold=0.35,
+                 full_scale=2.0, gyro_weight=0.001, refractory=0.08, note_length=0.1,
+                 min_velocity=20):
+        """
+        :param midi_handler: MidiHandler to send to (SerialReceiver fills it in if None).
+        :param note: MIDI note to trigger (38 = acoustic snare).
+        :param window: Ring buffer length (frames) for the adaptive threshold.
+        :param k: Threshold in standard deviations above the window mean.
+        :param min_threshold: Lower bound of the threshold (onset units, ~g).
+        :param full_scale: Peak onset value mapped to velocity 127.
+        :param gyro_weight: Contribution of |gyro| (deg/s) to the onset value.
+        :param refractory: Seconds after a strike during which no new strike fires.
+        :param note_length: Seconds until the note_off.
+        :param min_velocity: Velocity for a peak right at the threshold.
+        """
+        self.midi_handler = midi_handler
+        self.note = note
+        self.window = window
+        self.k = k
+        self.min_threshold = min_threshold
+        self.full_scale = full_scale
+        self.gyro_weight = gyro_weight
+        self.refractory_ns = int(refractory * 1e9)
+        self.note_length_ns = int(note_length * 1e9)
+        self.min_velocity = min_velocity
+
+        self._ring = array('d', bytes(8 * window))
+        self._pos = 0
+        self._filled = 0
+        self._sum = 0.0
+        self._sum_sq = 0.0
+        self._last_acc = None
+        self._last_onset = 0.0
+        self._candidate = 0.0     # onset value of the rising peak being tracked
+        self._threshold = min_threshold
+        self._quiet_until_ns = 0
+        self._note_off_at_ns = None
+
+        self.strikes = 0
+        self.last_velocity = 0
+
+    def update(self, values, now_ns) -> int:
+        """
+        Feeds one frame (SensorFrame.values). Returns the velocity of a strike
+        confirmed on this frame, or 0.
+        """
+        if self._note_off_at_ns is not None and now_ns >= self._note_off_at_ns:
+            self._release()
+
+        ax, ay, az = values[_ACC_X], values[_ACC_Y], values[_ACC_Z]
+        acc = math.sqrt(ax * ax + ay * ay + az * az)
+        gx, gy, gz = values[_GYRO_X], values[_GYRO_Y], values[_GYRO_Z]
+        gyro = math.sqrt(gx * gx + gy * gy + gz * gz)
+        last_acc = self._last_acc
+        self._last_acc = acc
+        if last_acc is None:
+            return 0
+        onset = acc - last_acc
+        if onset < 0.0:
+            onset = 0.0
+        onset += self.gyro_weight * gyro
+
+        velocity = 0
+        last_onset = self._last_onset
+        if self._candidate:
+            if onset < last_onset:
+                # The previous frame was the peak.
+                velocity = self._strike(self._candidate, now_ns)
+                self._candidate = 0.0
+            else:
+                self._candidate = onset
+        elif onset > self._threshold and onset > last_onset and now_ns >= self._quiet_until_ns:
+            self._candidate = onset
+
+        # Adaptive threshold over the ring buffer (running sums, O(1)).
+        ring = self._ring
+        old = ring[self._pos]
+        ring[self._pos] = onset
+        self._pos = (self._pos + 1) % self.window
+        if self._filled < self.window:
+            self._filled += 1
+        self._sum += onset - old
+        self._sum_sq += onset * onset - old * old
+        n = self._filled
+        mean = self._sum / n
+        variance = self._sum_sq / n - mean * mean
+        threshold = mean + self.k * math.sqrt(variance) if variance > 0.0 else mean
+        self._threshold = threshold if threshold > self.min_threshold else self.min_threshold
+
+        self._last_onset = onset
+        return velocity
+
+    def _strike(self, peak, now_ns) -> int:
+        span = self.full_scale - self.min_threshold
+        scaled = (peak - self.min_threshold) / span if span > 0 else 1.0
+        velocity = int(self.min_velocity + scaled * (127 - self.min_velocity))
+        velocity = max(1, min(127, velocity))
+        self._quiet_until_ns = now_ns + self.refractory_ns
+        if self._note_off_at_ns is not None:
+            self._release()
+        if self.midi_handler is not None:
+            self.midi_handler.send_midi_note_on(self.note, velocity)
+        self._note_off_at_ns = now_ns + self.note_length_ns
+        self.strikes += 1
+        self.last_velocity = velocity
+        return velocity
+
+    def _release(self):
+        self._note_off_at_ns = None
+        if self.midi_handler is not None:
+            self.midi_handler.send_midi_note_off(self.note)
+
+    def flush(self):
+        """
+        Sends the pending note_off, if any (e.g. when the receiver stops).
+        """
+        if self._note_off_at_ns is not None:
+            self._release()